@@ -0,0 +1,180 @@
+"""Benchmark: gunicorn + gevent (Flask) against uvicorn (Quart) under a room of participants.
+
+Starts each server with one worker and an in-memory session, then every
+participant opens an `/api/events` stream and, once all streams are open,
+submits one answer while the streams stay connected. Reports how long the
+streams took to open, submission latency, how long the last stream took to
+hear about a change, and the worker's memory.
+
+Usage:
+    python benchmarks/asgi_vs_wsgi.py [--sizes 100 500] [--modes wsgi asgi]
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+COMMANDS = {
+    "wsgi": ["gunicorn", "-c", "gunicorn.conf.py", "event_server.app:app"],
+    "asgi": ["uvicorn", "event_server.asgi:app", "--host", "127.0.0.1", "--log-level", "warning"],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode: str, port: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        WEB_CONCURRENCY="1",
+        GUNICORN_WORKER_CONNECTIONS="10000",
+        SESSION_STORE="memory",
+        SESSION_ID="bench",
+        SSE_HEARTBEAT_SECONDS="15",
+    )
+    command = COMMANDS[mode] + (["--port", str(port)] if mode == "asgi" else [])
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    # A graceful shutdown would wait for the open streams to time out
+    process.terminate()
+    try:
+        process.wait(5)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def rss_mb(pid: int) -> float:
+    """Resident memory of `pid` and its children (gunicorn forks its worker)."""
+    total = 0
+    pids = [pid]
+    while pids:
+        current = pids.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith("VmRSS"))
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, StopIteration):
+            continue
+    return total / 1024
+
+
+async def request(port: int, method: str, path: str, body: dict | None = None) -> int:
+    """Send one HTTP/1.1 request and return the status code."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = json.dumps(body).encode() if body is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n".encode()
+        + payload
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    await reader.read()
+    writer.close()
+    return status
+
+
+async def open_stream(port: int) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /api/events HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n\r\n")
+    await writer.drain()
+    # Wait for the first event, so the stream is registered with the watcher
+    while not (await reader.readline()).startswith(b"event:"):
+        pass
+    return reader, writer
+
+
+async def wait_for_event(reader: asyncio.StreamReader, event: bytes) -> float:
+    while not (await reader.readline()).startswith(event):
+        pass
+    return time.perf_counter()
+
+
+async def run_room(port: int, participants: int) -> dict[str, float]:
+    assert await request(port, "POST", "/api/questions", {"questions": ["How was it?"]}) == 200
+
+    started = time.perf_counter()
+    streams = await asyncio.gather(*(open_stream(port) for _ in range(participants)))
+    connect = time.perf_counter() - started
+
+    async def submit(n: int) -> float:
+        sent = time.perf_counter()
+        status = await request(
+            port, "POST", "/api/submit-feedback", {"items": [{"question": "How was it?", "answer": f"Fine {n}"}]}
+        )
+        assert status in (200, 202), status
+        return time.perf_counter() - sent
+
+    latencies = sorted(await asyncio.gather(*(submit(n) for n in range(participants))))
+
+    # Every open stream should hear that collection closed
+    closed = time.perf_counter()
+    heard = asyncio.gather(*(wait_for_event(reader, b"event: collection-closed") for reader, _ in streams))
+    assert await request(port, "POST", "/api/close-collection") == 200
+    fanout = max(await heard) - closed
+    for _, writer in streams:
+        writer.close()
+    return {
+        "connect": connect,
+        "p50": latencies[len(latencies) // 2],
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "fanout": fanout,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500], help="Participants")
+    parser.add_argument("--modes", nargs="+", choices=sorted(COMMANDS), default=["wsgi", "asgi"])
+    args = parser.parse_args()
+
+    # Each participant holds a stream plus a submission socket, on both ends
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, 8 * max(args.sizes))), hard))
+
+    print("=" * 60)
+    print("BENCHMARK: gunicorn + gevent vs uvicorn, one worker")
+    print("=" * 60)
+    print(f"{'mode':>5} {'people':>7} {'connect s':>10} {'p50 ms':>8} {'p99 ms':>8} {'fanout ms':>10} {'RSS MB':>7}")
+    for size in args.sizes:
+        for mode in args.modes:
+            port = free_port()
+            server = start_server(mode, port)
+            try:
+                result = asyncio.run(run_room(port, size))
+                memory = rss_mb(server.pid)
+            finally:
+                stop_server(server)
+            print(
+                f"{mode:>5} {size:>7} {result['connect']:>10.2f} {result['p50'] * 1000:>8.1f} "
+                f"{result['p99'] * 1000:>8.1f} {result['fanout'] * 1000:>10.1f} {memory:>7.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
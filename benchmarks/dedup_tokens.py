@@ -0,0 +1,47 @@
+"""Benchmark: prompt tokens saved by merging near-duplicate answers.
+
+Answers are merged within each `REPORT_CHUNK_TOKENS` chunk, as reports do.
+
+Usage:
+    python benchmarks/dedup_tokens.py [--sizes 10000 100000] [--threshold 0.6]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.extractive_speed import make_feedback
+from event_server.dedup import compress_feedback
+from event_server.llm import CHUNK_TOKENS, chunk_feedback
+from event_server.prompts import feedback_tokens
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--threshold", type=float, default=0.6)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BENCHMARK: Near-duplicate merging before the LLM")
+    print("=" * 60)
+    print(f"{'answers':>10} {'groups':>8} {'tokens':>12} {'merged':>10} {'seconds':>9}")
+    for size in args.sizes:
+        feedback = make_feedback(size)
+        started = time.perf_counter()
+        compressed = [
+            item
+            for chunk in chunk_feedback(feedback, CHUNK_TOKENS)
+            for item in compress_feedback(chunk, args.threshold)
+        ]
+        elapsed = time.perf_counter() - started
+        print(
+            f"{size:>10,} {len(compressed):>8,} {feedback_tokens(feedback):>12,} "
+            f"{feedback_tokens(compressed):>10,} {elapsed:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Speed benchmark: offline extractive report for large sessions.
+
+Usage:
+    python benchmarks/extractive_speed.py [--sizes 10000 100000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_server.extractive import summarize
+
+QUESTIONS = [
+    "What did you think about the session?",
+    "What improvements would you suggest?",
+    "What was the most valuable part of today?",
+    "Anything else you would like to share?",
+]
+POINTS = [
+    "more time for discussion at the end",
+    "the audio quality was poor at the back",
+    "great speakers and really clear content",
+    "the room was too cold all afternoon",
+    "loved the real world examples and case studies",
+    "slides were hard to read from far away",
+    "we needed more breaks between talks",
+    "the networking session was the most valuable part",
+    "q&a felt rushed and cut short",
+    "the venue was hard to find",
+]
+OPENERS = ["", "I think ", "Honestly, ", "Overall ", "For me "]
+
+
+def make_feedback(size: int, seed: int = 1) -> list[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "question": QUESTIONS[n % len(QUESTIONS)],
+            "answer": rng.choice(OPENERS) + rng.choice(POINTS) + f" (#{rng.randint(0, 5000)})",
+            "timestamp": "2025-11-05T20:00:00",
+        }
+        for n in range(size)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BENCHMARK: Extractive report speed")
+    print("=" * 60)
+    print(f"{'answers':>10} {'seconds':>10} {'answers/s':>12}")
+    for size in args.sizes:
+        feedback = make_feedback(size)
+        started = time.perf_counter()
+        summarize(feedback)
+        elapsed = time.perf_counter() - started
+        print(f"{size:>10,} {elapsed:>10.2f} {size / elapsed:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Memory benchmark: list-of-dicts feedback vs the columnar FeedbackLog.
+
+Usage:
+    python benchmarks/feedback_memory.py [--sizes 10000 100000 1000000]
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_server.feedback import FeedbackLog
+
+QUESTIONS = [
+    "What did you think about the session?",
+    "What improvements would you suggest?",
+    "What was the most valuable part of today?",
+    "Anything else you would like to share?",
+]
+ANSWER = "More time for discussion at the end would help, the content itself was great. #{n}"
+START = datetime(2025, 11, 5, 20, 0, 0)
+
+
+def make_items(start: int, count: int) -> list[dict]:
+    """Items as they arrive from JSON: fresh strings, one timestamp per 4-answer submission."""
+    return [
+        {
+            "question": "".join(QUESTIONS[n % len(QUESTIONS)]),  # a new object, as after json.loads
+            "answer": ANSWER.format(n=n),
+            "timestamp": (START + timedelta(seconds=n // len(QUESTIONS))).isoformat(),
+        }
+        for n in range(start, start + count)
+    ]
+
+
+def build_dicts(size: int) -> list[dict]:
+    return make_items(0, size)
+
+
+def build_log(size: int, batch: int = 1000) -> FeedbackLog:
+    # Fed in batches, like the ingest queue, so the input list is not counted
+    log = FeedbackLog()
+    for start in range(0, size, batch):
+        log.extend(make_items(start, min(batch, size - start)))
+    return log
+
+
+def measure(build) -> int:
+    """Bytes still allocated by whatever `build()` returns."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BENCHMARK: Feedback memory (list of dicts vs FeedbackLog)")
+    print("=" * 60)
+    print(f"{'answers':>10} {'dicts':>12} {'columnar':>12} {'saved':>8}")
+    for size in args.sizes:
+        dict_bytes = measure(lambda: build_dicts(size))
+        log_bytes = measure(lambda: build_log(size))
+        saved = 1 - log_bytes / dict_bytes
+        print(f"{size:>10,} {dict_bytes / 2**20:>10.1f}MB {log_bytes / 2**20:>10.1f}MB {saved:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+"""Load test: a whole live session against a real event server, no external services.
+
+Starts the event server (gunicorn by default, or uvicorn with `--server asgi`)
+and a fake Anthropic Messages API on localhost that the server is pointed at
+with ANTHROPIC_BASE_URL. Then, for `--duration` seconds:
+
+- every participant polls `/api/state` (sending its ETag back) and submits
+  `--submissions` times, half of them in the `items` format and half in
+  the `answers` format;
+- one admin polls `/api/state?since=<version>` and, at the end, asks for a
+  report with `/api/generate-report` and polls the job until it is done.
+
+Prints throughput, p50/p95/p99 latency and errors per endpoint, and the
+server's memory (RSS) before, during and after. `--json` writes the same
+numbers for tracking; `--baseline` compares p95s with an earlier `--json`
+file and exits 1 if any endpoint is slower than `--max-regression` allows.
+
+Usage:
+    python benchmarks/load_session.py [--participants 200] [--duration 30] [--json results.json]
+    python benchmarks/load_session.py --baseline results.json --max-regression 0.25
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TIMEOUT = 30.0
+MIN_SAMPLES = 20
+QUESTIONS = ["What did you think about the session?", "What would you improve?"]
+COMMANDS = {
+    "wsgi": ["gunicorn", "-c", "gunicorn.conf.py", "event_server.app:app"],
+    "asgi": ["uvicorn", "event_server.asgi:app", "--host", "127.0.0.1", "--log-level", "warning"],
+}
+
+
+class FakeAnthropic(BaseHTTPRequestHandler):
+    """Answers POST /v1/messages like the Messages API, after `delay` seconds."""
+
+    delay = 0.5
+    calls = 0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][0]["content"]
+        time.sleep(self.delay)
+        type(self).calls += 1
+        payload = json.dumps({
+            "id": f"msg_load_{self.calls}",
+            "type": "message",
+            "role": "assistant",
+            "model": body["model"],
+            "content": [{"type": "text", "text": f"Summary of a {len(prompt)}-character prompt."}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": len(prompt) // 4, "output_tokens": 8},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args: argparse.Namespace, port: int, llm_port: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        WEB_CONCURRENCY=str(args.workers),
+        GUNICORN_WORKER_CONNECTIONS="10000",
+        SESSION_STORE=args.store,
+        SESSION_ID="load-test",
+        REPORT_BACKEND="anthropic",
+        ANTHROPIC_API_KEY="load-test",
+        ANTHROPIC_BASE_URL=f"http://127.0.0.1:{llm_port}",
+        REPORT_CACHE="memory",
+    )
+    command = COMMANDS[args.server]
+    if args.server == "asgi":
+        command = command + ["--port", str(port), "--workers", str(args.workers)]
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{args.server} server did not start")
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(5)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def rss_mb(pid: int) -> float:
+    """Resident memory of `pid` and its children (gunicorn forks its workers)."""
+    total = 0
+    pids = [pid]
+    while pids:
+        current = pids.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith("VmRSS"))
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, StopIteration):
+            continue
+    return total / 1024
+
+
+class Recorder:
+    """Latencies and statuses per endpoint label."""
+
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+
+    def add(self, label: str, seconds: float, ok: bool) -> None:
+        self.latencies.setdefault(label, []).append(seconds)
+        self.errors.setdefault(label, 0)
+        if not ok:
+            self.errors[label] += 1
+
+    def summary(self, elapsed: float) -> dict[str, dict[str, float]]:
+        results = {}
+        for label, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            results[label] = {
+                "requests": len(values),
+                "errors": self.errors[label],
+                "throughput": len(values) / elapsed,
+                "p50_ms": percentile(values, 0.50) * 1000,
+                "p95_ms": percentile(values, 0.95) * 1000,
+                "p99_ms": percentile(values, 0.99) * 1000,
+            }
+        return results
+
+
+def percentile(values: list[float], q: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def request(
+    port: int, method: str, path: str, body: dict | None = None, headers: dict[str, str] | None = None
+) -> tuple[int, dict[str, str], bytes]:
+    """Send one HTTP/1.1 request; return status, headers (lowercased) and body."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = json.dumps(body).encode() if body is not None else b""
+    lines = [f"{method} {path} HTTP/1.1", "Host: load-test", "Connection: close",
+             "Content-Type: application/json", f"Content-Length: {len(payload)}"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write("\r\n".join(lines).encode() + b"\r\n\r\n" + payload)
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    head, _, content = data.partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    response_headers = dict(
+        (name.strip().lower(), value.strip()) for name, value in (line.split(":", 1) for line in header_lines)
+    )
+    if response_headers.get("transfer-encoding") == "chunked":
+        content = dechunk(content)
+    return int(status_line.split()[1]), response_headers, content
+
+
+def dechunk(data: bytes) -> bytes:
+    body = b""
+    while data:
+        size_line, _, data = data.partition(b"\r\n")
+        size = int(size_line.split(b";")[0], 16)
+        if size == 0:
+            break
+        body, data = body + data[:size], data[size + 2:]
+    return body
+
+
+async def timed(recorder: Recorder, label: str, port: int, method: str, path: str, **kwargs):
+    """`request()`, recorded under `label`; failures and timeouts count as errors."""
+    started = time.perf_counter()
+    try:
+        status, headers, content = await asyncio.wait_for(request(port, method, path, **kwargs), TIMEOUT)
+    except (OSError, asyncio.TimeoutError):
+        recorder.add(label, time.perf_counter() - started, False)
+        return None
+    recorder.add(label, time.perf_counter() - started, status < 400)
+    return status, headers, content
+
+
+async def participant(n: int, args: argparse.Namespace, port: int, recorder: Recorder, stop: float) -> None:
+    # Spread the first polls so the room does not arrive in one burst
+    await asyncio.sleep(args.poll_interval * n / args.participants)
+    interval = args.duration / (args.submissions + 1)
+    next_submit = time.monotonic() + interval * (1 + n / args.participants) / 2
+    submitted = 0
+    etag = None
+    while time.monotonic() < stop:
+        result = await timed(
+            recorder, "GET /api/state", port, "GET", "/api/state",
+            headers={"If-None-Match": etag} if etag else None,
+        )
+        if result and result[0] == 200:
+            etag = result[1].get("etag")
+        if submitted < args.submissions and time.monotonic() >= next_submit:
+            answers = [f"Participant {n}, answer {submitted}: more time for questions, please" for _ in QUESTIONS]
+            if (n + submitted) % 2:
+                label, body = "POST /api/submit-feedback (answers)", {"answers": answers}
+            else:
+                label = "POST /api/submit-feedback (items)"
+                body = {"items": [{"question": q, "answer": a} for q, a in zip(QUESTIONS, answers)]}
+            await timed(recorder, label, port, "POST", "/api/submit-feedback", body=body)
+            submitted += 1
+            next_submit += interval
+        await asyncio.sleep(args.poll_interval)
+
+
+async def admin(args: argparse.Namespace, port: int, recorder: Recorder, stop: float) -> None:
+    version = 0
+    while time.monotonic() < stop:
+        result = await timed(recorder, "GET /api/state?since", port, "GET", f"/api/state?since={version}")
+        if result and result[0] == 200:
+            version = json.loads(result[2])["version"]
+        await asyncio.sleep(1.0)
+
+    result = await timed(recorder, "POST /api/generate-report", port, "POST", "/api/generate-report")
+    if not result or result[0] != 202:
+        return
+    job_id = json.loads(result[2])["job"]["id"]
+    started = time.perf_counter()
+    while time.perf_counter() - started < TIMEOUT:
+        result = await timed(recorder, "GET /api/report-jobs/<id>", port, "GET", f"/api/report-jobs/{job_id}")
+        if not result or json.loads(result[2])["job"]["status"] != "running":
+            break
+        await asyncio.sleep(0.1)
+    ok = bool(result) and json.loads(result[2])["job"]["status"] == "done"
+    recorder.add("report (submit to done)", time.perf_counter() - started, ok)
+
+
+async def run_session(args: argparse.Namespace, port: int, server: subprocess.Popen) -> dict:
+    status, _, _ = await request(port, "POST", "/api/questions", body={"questions": QUESTIONS})
+    assert status == 200, status
+
+    recorder = Recorder()
+    memory = [rss_mb(server.pid)]
+
+    async def sample_memory():
+        while True:
+            await asyncio.sleep(1.0)
+            memory.append(rss_mb(server.pid))
+
+    sampler = asyncio.create_task(sample_memory())
+    started = time.perf_counter()
+    stop = time.monotonic() + args.duration
+    await asyncio.gather(
+        admin(args, port, recorder, stop),
+        *(participant(n, args, port, recorder, stop) for n in range(args.participants)),
+    )
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+    memory.append(rss_mb(server.pid))
+
+    _, _, content = await request(port, "GET", "/api/admin-summary")
+    return {
+        "config": {
+            "server": args.server, "workers": args.workers, "store": args.store,
+            "participants": args.participants, "duration": args.duration,
+            "submissions": args.submissions, "poll_interval": args.poll_interval,
+            "llm_delay": args.llm_delay, "python": platform.python_version(),
+        },
+        "elapsed": elapsed,
+        "responses": json.loads(content)["response_count"],
+        "llm_calls": FakeAnthropic.calls,
+        "endpoints": recorder.summary(elapsed),
+        "memory_mb": {
+            "start": memory[0], "peak": max(memory), "end": memory[-1], "growth": memory[-1] - memory[0],
+        },
+    }
+
+
+def print_results(results: dict) -> None:
+    print(f"{'endpoint':<38} {'req':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for label, row in results["endpoints"].items():
+        print(
+            f"{label:<38} {row['requests']:>7} {row['errors']:>5} {row['throughput']:>8.1f} "
+            f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}"
+        )
+    memory = results["memory_mb"]
+    print()
+    print(f"Answers stored: {results['responses']}, LLM calls: {results['llm_calls']}")
+    print(f"Server RSS MB: start {memory['start']:.1f}, peak {memory['peak']:.1f}, "
+          f"end {memory['end']:.1f}, growth {memory['growth']:+.1f}")
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list[str]:
+    """Endpoints whose p95 grew by more than `max_regression` over the baseline."""
+    regressions = []
+    print()
+    print(f"{'endpoint':<38} {'base p95':>9} {'p95':>8} {'change':>7}")
+    for label, row in results["endpoints"].items():
+        before = baseline["endpoints"].get(label)
+        # The p95 of a handful of requests (the report itself) is noise
+        if not before or min(before["requests"], row["requests"]) < MIN_SAMPLES:
+            continue
+        change = row["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        print(f"{label:<38} {before['p95_ms']:>9.1f} {row['p95_ms']:>8.1f} {change:>+7.0%}")
+        if change > max_regression:
+            regressions.append(label)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--participants", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of collection")
+    parser.add_argument("--submissions", type=int, default=3, help="Submissions per participant")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between participant polls")
+    parser.add_argument("--server", choices=sorted(COMMANDS), default="wsgi")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--store", default="memory", help="SESSION_STORE for the server")
+    parser.add_argument("--llm-delay", type=float, default=0.5, help="Fake LLM response time in seconds")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Earlier --json results to compare p95 latencies with")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed p95 growth (0.25 = 25%%)")
+    args = parser.parse_args()
+    if args.workers > 1 and args.store == "memory":
+        parser.error("several workers need a shared --store, e.g. sqlite:///dev/shm/load-test.db")
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, 8 * args.participants)), hard))
+
+    FakeAnthropic.delay = args.llm_delay
+    llm = ThreadingHTTPServer(("127.0.0.1", 0), FakeAnthropic)
+    threading.Thread(target=llm.serve_forever, daemon=True).start()
+
+    print("=" * 60)
+    print(f"LOAD TEST: {args.participants} participants for {args.duration:.0f}s ({args.server}, "
+          f"{args.workers} worker{'s' if args.workers > 1 else ''}, {args.store} store)")
+    print("=" * 60)
+    port = free_port()
+    server = start_server(args, port, llm.server_address[1])
+    try:
+        results = asyncio.run(run_session(args, port, server))
+    finally:
+        stop_server(server)
+        llm.shutdown()
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        if regressions:
+            print(f"p95 regressed by more than {args.max_regression:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
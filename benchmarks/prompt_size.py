@@ -0,0 +1,55 @@
+"""Benchmark: report prompt size before and after the compact prompt builder.
+
+Compares the old per-answer `Q:`/`A:`/`Timestamp:` layout with answers
+grouped under their question, on the sample data from
+event_server/tests/test_sample_data.py repeated to each size.
+
+Usage:
+    python benchmarks/prompt_size.py [--sizes 4 1000 100000] [--budget 60000]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_server.llm import REPORT_PROMPT
+from event_server.prompts import estimate_tokens, format_feedback, sample_feedback
+from event_server.tests.test_sample_data import SAMPLE_FEEDBACK
+
+
+def legacy_prompt(feedback: list[dict]) -> str:
+    """The prompt as built before event_server/prompts.py."""
+    feedback_text = "\n\n".join(
+        f"Q: {item['question']}\nA: {item['answer']}\nTimestamp: {item['timestamp']}"
+        for item in feedback
+    )
+    return REPORT_PROMPT.format(feedback_text=feedback_text)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4, 1_000, 100_000])
+    parser.add_argument("--budget", type=int, default=60_000, help="REPORT_TOKEN_BUDGET to apply")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BENCHMARK: Report prompt size (estimated tokens)")
+    print("=" * 60)
+    print(f"{'answers':>10} {'before':>12} {'after':>12} {'saved':>7} {'budgeted':>10}")
+    for size in args.sizes:
+        feedback = [SAMPLE_FEEDBACK[n % len(SAMPLE_FEEDBACK)] for n in range(size)]
+        before = estimate_tokens(legacy_prompt(feedback))
+        after = estimate_tokens(REPORT_PROMPT.format(feedback_text=format_feedback(feedback)))
+        sampled = sample_feedback(feedback, args.budget)
+        budgeted = estimate_tokens(REPORT_PROMPT.format(feedback_text=format_feedback(sampled)))
+        print(f"{size:>10,} {before:>12,} {after:>12,} {1 - after / before:>7.0%} {budgeted:>10,}")
+
+    print()
+    text = legacy_prompt(SAMPLE_FEEDBACK)
+    print(f"Sample prompt: {len(text)} characters, {len(text) // 4 + 1} tokens at 4 characters "
+          f"per token, {estimate_tokens(text)} by estimate_tokens()")
+
+
+if __name__ == "__main__":
+    main()
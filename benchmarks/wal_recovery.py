@@ -0,0 +1,67 @@
+"""Benchmark: write-ahead log throughput and recovery time.
+
+Writes feedback to a `WALStore` in batches (as the ingest queue does), then
+times how long a new store takes to recover it, once from the log alone
+and once from a snapshot.
+
+Usage:
+    python benchmarks/wal_recovery.py [--sizes 10000 100000] [--batch 64] [--dir /dev/shm]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_server.store import WALStore
+
+NO_SNAPSHOT = 1 << 62
+
+
+def timed_recovery(directory: str, snapshot_bytes: int) -> float:
+    started = time.perf_counter()
+    store = WALStore(directory, "bench", snapshot_bytes=snapshot_bytes)
+    elapsed = time.perf_counter() - started
+    store.wal.close()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--batch", type=int, default=64, help="Items per append")
+    parser.add_argument("--dir", default=None, help="Where to put the log (default: a temp dir)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BENCHMARK: Write-ahead log")
+    print("=" * 60)
+    print(f"{'answers':>10} {'log MB':>8} {'writes/s':>10} {'replay s':>9} {'snapshot s':>11}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+            store = WALStore(directory, "bench", snapshot_bytes=NO_SNAPSHOT)
+            store.set(questions=["What did you think about the session?"])
+            started = time.perf_counter()
+            for start in range(0, size, args.batch):
+                store.append_feedback([
+                    {
+                        "question": "What did you think about the session?",
+                        "answer": f"Answer {n}: more time for discussion at the end, please",
+                        "timestamp": "2025-11-05T20:00:00",
+                    }
+                    for n in range(start, min(size, start + args.batch))
+                ])
+            writes = size / (time.perf_counter() - started)
+            log_mb = os.path.getsize(store.wal.log_path) / 1e6
+            store.wal.close()
+
+            # The first recovery replays the log and then compacts it into a snapshot
+            replay = timed_recovery(directory, NO_SNAPSHOT)
+            from_snapshot = timed_recovery(directory, NO_SNAPSHOT)
+        print(f"{size:>10,} {log_mb:>8.1f} {writes:>10,.0f} {replay:>9.2f} {from_snapshot:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
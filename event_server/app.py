@@ -1,17 +1,81 @@
-from flask import Flask, send_from_directory, render_template_string, render_template, request, jsonify
-from event_server.models import SessionData
-from event_server.llm import generate_report
+from flask import Flask, Response, g, send_from_directory, render_template_string, render_template, request, jsonify
+from event_server import tenants
+from event_server.backends import create_backend
+from event_server.events import format_event, stream_events
+from event_server.ingest import QueueFull, SubmissionError, parse_submission
+from event_server.metrics import metrics
+from event_server.store import WALStore, create_store
+from event_server.tenants import SessionRegistry, Tenant
+from event_server.tracing import tracer
 from datetime import datetime, timedelta
+from werkzeug.exceptions import NotFound
+from werkzeug.local import LocalProxy
+import hashlib
+import hmac
 import json
 import os
+import time
 import uuid
 
 app = Flask(__name__, template_folder="templates", static_folder="static")
+# Per-request limits for feedback submissions
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_REQUEST_BYTES", 64 * 1024))
+MAX_ITEMS_PER_REQUEST = int(os.environ.get("MAX_ITEMS_PER_REQUEST", "50"))
 
-# Session data stored in memory (dies when container stops)
-session_data = SessionData(
-    session_id=os.environ.get("SESSION_ID", "test-session-" + str(uuid.uuid4())[:8])
-)
+def default_session_id(store_url: str) -> str:
+    """The session id when `SESSION_ID` is not set.
+
+    Random for the in-process store. Any other store is shared between
+    workers or outlives them, so each worker must arrive at the same id: it is
+    derived from the store URL.
+    """
+    if not store_url or store_url == "memory":
+        return "test-session-" + str(uuid.uuid4())[:8]
+    return "session-" + hashlib.sha256(store_url.encode()).hexdigest()[:8]
+
+SESSION_STORE = os.environ.get("SESSION_STORE", "memory")
+SESSION_ID = os.environ.get("SESSION_ID") or default_session_id(SESSION_STORE)
+# Set on warm pool containers, which boot before their session exists: the
+# landing page assigns the session id through /api/claim
+CLAIM_TOKEN = os.environ.get("CLAIM_TOKEN")
+
+# Writes reports: Claude, or offline extractive summaries (REPORT_BACKEND)
+report_backend = create_backend()
+
+# The container's own session. Session data is stored in memory or a
+# container-local shared store (dies when container stops). Alongside it:
+# - an ingest queue that group-commits submitted feedback into the store
+# - optionally, a rolling summarizer, so less is left for the final report
+# - report jobs, run in the background, one LLM call per feedback snapshot
+# - a version watcher that pushes session changes to /api/events streams
+# - an expiry scheduler that closes collection at the expire time
+default_tenant = Tenant.create(SESSION_ID, create_store(SESSION_STORE, SESSION_ID), report_backend)
+
+# MULTI_TENANT=1: sessions are created at run time and served under
+# /s/<session_id>/ instead (see event_server/tenants.py)
+MULTI_TENANT = os.environ.get("MULTI_TENANT", "") not in ("", "0")
+sessions = SessionRegistry.from_env(report_backend)
+
+def end_session() -> None:
+    """Stop the container's session and shred its `wal://` files, at server shutdown.
+
+    For servers whose process ends with the session (uvicorn, the Flask dev
+    server). gunicorn restarts workers, so its master does this instead, in
+    `on_exit` (gunicorn.conf.py).
+    """
+    if isinstance(default_tenant.session.store, WALStore):
+        default_tenant.close()
+
+def current_tenant() -> Tenant:
+    return tenants.active.get() or default_tenant
+
+# The session the current request is for
+session_data = LocalProxy(lambda: current_tenant().session)
+ingest_queue = LocalProxy(lambda: current_tenant().ingest)
+rolling_summarizer = LocalProxy(lambda: current_tenant().rolling)
+report_jobs = LocalProxy(lambda: current_tenant().jobs)
+version_watcher = LocalProxy(lambda: current_tenant().watcher)
+expiry_scheduler = LocalProxy(lambda: current_tenant().expiry)
 
 admin_html = """<!DOCTYPE html>
 <html>
@@ -209,10 +273,11 @@ admin_html = """<!DOCTYPE html>
 
     <script>
         const SESSION_ID = "{{ session_id }}";
+        const BASE_PATH = "{{ base_path }}";
         
         function generateShareLink() {
             const baseUrl = window.location.origin;
-            return baseUrl + "/participant?session=" + SESSION_ID;
+            return baseUrl + BASE_PATH + "/participant?session=" + SESSION_ID;
         }
 
         function generateQRCode() {
@@ -228,34 +293,56 @@ admin_html = """<!DOCTYPE html>
             }
         }
 
+        // Last summary and its ETag; the server answers 304 until something changes
+        let summary = null;
+        let summaryEtag = null;
+
         function loadState() {
-            fetch("/api/state")
-                .then(r => r.json())
+            fetch(BASE_PATH + "/api/admin-summary", {headers: summaryEtag ? {"If-None-Match": summaryEtag} : {}})
+                .then(r => {
+                    if (r.status === 304) {
+                        return null;
+                    }
+                    summaryEtag = r.headers.get("ETag");
+                    return r.json();
+                })
                 .then(data => {
-                    document.getElementById("shareLink").textContent = generateShareLink();
-                    document.getElementById("status").textContent = data.is_collecting ? "Data collection: ACTIVE" : "Data collection: CLOSED";
-                    document.getElementById("status").className = data.is_collecting ? "status active" : "status closed";
-                    
-                    renderQuestions(data.questions);
-                    renderFeedback(data.feedback);
-                    
-                    // Show report if it exists
-                    if (data.generated_report) {
-                        document.getElementById("reportCard").style.display = "block";
-                        document.getElementById("reportContent").textContent = data.generated_report;
-                    } else {
-                        document.getElementById("reportCard").style.display = "none";
+                    // null means nothing changed; still re-render so the expiry countdown ticks
+                    if (data) {
+                        summary = data;
                     }
-                    
-                    if (data.expire_time) {
-                        const expireDate = new Date(data.expire_time);
-                        const now = new Date();
-                        const minutes = Math.round((expireDate - now) / 60000);
-                        document.getElementById("expireDisplay").textContent = "Expires in: " + (minutes > 0 ? minutes + " minutes" : "Expired");
+                    if (summary) {
+                        renderState(summary);
                     }
                 });
         }
 
+        function renderState(data) {
+            document.getElementById("shareLink").textContent = generateShareLink();
+            document.getElementById("status").textContent = data.is_collecting ? "Data collection: ACTIVE" : "Data collection: CLOSED";
+            document.getElementById("status").className = data.is_collecting ? "status active" : "status closed";
+            
+            renderQuestions(data.questions);
+            renderResponseCount(data.response_count);
+            
+            // Show report if it exists (a report being streamed in is drawn by streamReport)
+            if (reportStreaming) {
+                // Leave the partial report alone
+            } else if (data.generated_report) {
+                document.getElementById("reportCard").style.display = "block";
+                document.getElementById("reportContent").textContent = data.generated_report;
+            } else {
+                document.getElementById("reportCard").style.display = "none";
+            }
+            
+            if (data.expire_time) {
+                const expireDate = new Date(data.expire_time);
+                const now = new Date();
+                const minutes = Math.round((expireDate - now) / 60000);
+                document.getElementById("expireDisplay").textContent = "Expires in: " + (minutes > 0 ? minutes + " minutes" : "Expired");
+            }
+        }
+
         function renderQuestions(questions) {
             const list = document.getElementById("questionsList");
             
@@ -281,19 +368,19 @@ admin_html = """<!DOCTYPE html>
             `).join("");
         }
 
-        function renderFeedback(feedback) {
+        function renderResponseCount(count) {
             const list = document.getElementById("feedbackList");
-            if (feedback.length === 0) {
+            if (count === 0) {
                 list.innerHTML = "<p style='color: #999; font-size: 14px;'>No responses yet</p>";
                 return;
             }
             list.innerHTML = `
                 <div class="feedback-item" style="text-align: center; padding: 30px;">
                     <div style="font-size: 48px; font-weight: bold; color: #0066cc; margin-bottom: 10px;">
-                        ${feedback.length}
+                        ${count}
                     </div>
                     <div style="font-size: 18px; color: #666;">
-                        ${feedback.length === 1 ? 'response' : 'responses'} received
+                        ${count === 1 ? 'response' : 'responses'} received
                     </div>
                 </div>
             `;
@@ -311,7 +398,7 @@ admin_html = """<!DOCTYPE html>
             const questions = Array.from(document.querySelectorAll("#questionsList input")).map(i => i.value);
             questions.push(newQuestion);
             
-            fetch("/api/questions", {
+            fetch(BASE_PATH + "/api/questions", {
                 method: "POST",
                 headers: {"Content-Type": "application/json"},
                 body: JSON.stringify({questions})
@@ -324,7 +411,7 @@ admin_html = """<!DOCTYPE html>
         function deleteQuestion(idx) {
             const questions = Array.from(document.querySelectorAll("#questionsList input")).map(i => i.value);
             questions.splice(idx, 1);
-            fetch("/api/questions", {
+            fetch(BASE_PATH + "/api/questions", {
                 method: "POST",
                 headers: {"Content-Type": "application/json"},
                 body: JSON.stringify({questions})
@@ -339,7 +426,7 @@ admin_html = """<!DOCTYPE html>
 
         function updateQuestions() {
             const questions = Array.from(document.querySelectorAll("#questionsList input")).map(i => i.value).filter(q => q.trim());
-            fetch("/api/questions", {
+            fetch(BASE_PATH + "/api/questions", {
                 method: "POST",
                 headers: {"Content-Type": "application/json"},
                 body: JSON.stringify({questions})
@@ -355,7 +442,7 @@ admin_html = """<!DOCTYPE html>
                 alert("Please enter a valid number of minutes");
                 return;
             }
-            fetch("/api/expire-time", {
+            fetch(BASE_PATH + "/api/expire-time", {
                 method: "POST",
                 headers: {"Content-Type": "application/json"},
                 body: JSON.stringify({minutes})
@@ -375,19 +462,13 @@ admin_html = """<!DOCTYPE html>
             
             try {
                 // Close collection
-                await fetch("/api/close-collection", {method: "POST"});
+                await fetch(BASE_PATH + "/api/close-collection", {method: "POST"});
                 
-                // Generate report
-                const response = await fetch("/api/generate-report", {method: "POST"});
-                const data = await response.json();
-                
-                if (data.success) {
-                    btn.textContent = "✓ Report Generated!";
-                    btn.style.background = "#4caf50";
-                } else {
-                    btn.textContent = "Error: " + (data.error || "Unknown");
-                    btn.style.background = "#f44336";
-                }
+                // Generate report, drawing it as it is written
+                const report = await streamReport();
+                // null: another tab is already generating it; report-ready will show it
+                btn.textContent = report === null ? "Report in progress..." : "✓ Report Generated!";
+                btn.style.background = "#4caf50";
                 
                 loadState();
             } catch (error) {
@@ -397,6 +478,60 @@ admin_html = """<!DOCTYPE html>
             }
         }
 
+        let reportStreaming = false;
+        // SSE messages end with a blank line. Spelled without backslashes because
+        // this page is embedded in a Python string in app.py.
+        const MESSAGE_END = String.fromCharCode(10).repeat(2);
+
+        // POST to the streaming endpoint and render Server-Sent Events from the response body.
+        // Resolves to the report, or null if a report for this feedback is already being generated.
+        async function streamReport() {
+            const response = await fetch(BASE_PATH + "/api/generate-report/stream", {method: "POST"});
+            if (response.status === 409) {
+                return null;
+            }
+            if (!response.ok) {
+                const data = await response.json();
+                throw new Error(data.error || "Unknown");
+            }
+            
+            const reportCard = document.getElementById("reportCard");
+            const reportContent = document.getElementById("reportContent");
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = "";
+            let report = "";
+            reportStreaming = true;
+            reportCard.style.display = "block";
+            reportContent.textContent = "";
+            
+            try {
+                while (true) {
+                    const {done, value} = await reader.read();
+                    if (done) {
+                        break;
+                    }
+                    buffer += decoder.decode(value, {stream: true});
+                    let end;
+                    while ((end = buffer.indexOf(MESSAGE_END)) >= 0) {
+                        const message = buffer.slice(0, end);
+                        buffer = buffer.slice(end + MESSAGE_END.length);
+                        const type = (message.match(/^event: (.*)$/m) || [])[1];
+                        const data = JSON.parse((message.match(/^data: (.*)$/m) || [, "{}"])[1]);
+                        if (type === "chunk") {
+                            report += data.text;
+                            reportContent.textContent = report;
+                        } else if (type === "error") {
+                            throw new Error(data.error);
+                        }
+                    }
+                }
+            } finally {
+                reportStreaming = false;
+            }
+            return report;
+        }
+
         async function publishToQuartz() {
             const statusDiv = document.getElementById("publishStatus");
             const btn = event.target;
@@ -408,7 +543,7 @@ admin_html = """<!DOCTYPE html>
             statusDiv.style.display = "none";
             
             try {
-                const response = await fetch("/api/publish-to-quartz", {method: "POST"});
+                const response = await fetch(BASE_PATH + "/api/publish-to-quartz", {method: "POST"});
                 const data = await response.json();
                 
                 if (data.success) {
@@ -448,165 +583,274 @@ admin_html = """<!DOCTYPE html>
             }
         }
 
-        // Load state on page load and refresh every 2 seconds
+        // Push updates over Server-Sent Events; poll every 2 seconds while the stream is down
+        let pollTimer = null;
+
+        function startPolling() {
+            if (!pollTimer) {
+                pollTimer = setInterval(loadState, 2000);
+            }
+        }
+
+        function stopPolling() {
+            clearInterval(pollTimer);
+            pollTimer = null;
+        }
+
+        function connectEvents() {
+            if (!window.EventSource) {
+                startPolling();
+                return;
+            }
+            const events = new EventSource(BASE_PATH + "/api/events?view=admin");
+            events.onopen = () => {
+                stopPolling();
+                loadState();
+            };
+            events.onerror = () => startPolling();  // EventSource reconnects by itself
+            ["questions", "collection-closed", "responses", "report-ready"].forEach(name => {
+                events.addEventListener(name, loadState);
+            });
+        }
+
         generateQRCode();
         loadState();
-        setInterval(loadState, 2000);
+        connectEvents();
+        // Re-render locally so the expiry countdown keeps ticking without a request
+        setInterval(() => summary && renderState(summary), 10000);
     </script>
 </body>
 </html>"""
 
-participant_html = """
-<!DOCTYPE html>
-<html>
-<head>
-    <title>Feedback Form - Structured Transparency</title>
-    <style>
-        * { margin: 0; padding: 0; box-sizing: border-box; }
-        body {
-            font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif;
-            background: #f5f5f5;
-            padding: 20px;
-        }
-        .container {
-            max-width: 600px;
-            margin: 0 auto;
-            background: white;
-            border-radius: 8px;
-            padding: 30px;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-        }
-        h1 {
-            margin-bottom: 20px;
-            color: #333;
-            font-size: 24px;
-        }
-        .question-block {
-            margin-bottom: 25px;
-        }
-        label {
-            display: block;
-            margin-bottom: 8px;
-            color: #333;
-            font-weight: 500;
-        }
-        textarea {
-            width: 100%;
-            padding: 12px;
-            border: 1px solid #ddd;
-            border-radius: 4px;
-            font-family: inherit;
-            font-size: 14px;
-            resize: vertical;
-            min-height: 80px;
-        }
-        button {
-            background: #0066cc;
-            color: white;
-            border: none;
-            padding: 12px 30px;
-            border-radius: 4px;
-            cursor: pointer;
-            font-size: 16px;
-            width: 100%;
-        }
-        button:hover {
-            background: #0052a3;
-        }
-        button:disabled {
-            background: #ccc;
-            cursor: not-allowed;
-        }
-        .status {
-            padding: 10px;
-            border-radius: 4px;
-            margin-bottom: 20px;
-            text-align: center;
-            font-size: 14px;
-        }
-        .status.closed {
-            background: #ffccbc;
-            color: #d84315;
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>Feedback Form</h1>
-        <div id="status"></div>
-        <form id="feedbackForm">
-            <div id="questionsList"></div>
-            <button type="submit" id="submitBtn">Submit Responses</button>
-        </form>
-    </div>
+# Routes whose response size is recorded as state payload bytes
+STATE_ROUTES = {"/api/state", "/api/participant-state", "/api/admin-summary"}
 
-    <script>
-        const SESSION_ID = "{{ session_id }}";
+# Every other endpoint is also served per session under this prefix
+SESSION_PREFIX = "/s/<session_id>"
+GLOBAL_ENDPOINTS = {"static", "health", "metrics_endpoint", "debug_profile", "claim_session"}
 
-        function loadQuestions() {
-            fetch("/api/state")
-                .then(r => r.json())
-                .then(data => {
-                    const statusDiv = document.getElementById("status");
-                    if (!data.is_collecting) {
-                        statusDiv.className = "status closed";
-                        statusDiv.textContent = "Data collection has closed. No new responses are being accepted.";
-                        document.getElementById("submitBtn").disabled = true;
-                        return;
-                    }
-                    
-                    const list = document.getElementById("questionsList");
-                    if (data.questions.length === 0) {
-                        list.innerHTML = "<p style='color: #999;'>No questions yet. Check back soon.</p>";
-                        return;
-                    }
-                    
-                    list.innerHTML = data.questions.map((q, idx) => `
-                        <div class="question-block">
-                            <label>${q}</label>
-                            <textarea name="answer_${idx}" placeholder="Your response..."></textarea>
-                        </div>
-                    `).join("");
-                });
-        }
+def add_session_routes(target) -> None:
+    """Serve each session endpoint of `target` (this app or the ASGI one) under SESSION_PREFIX."""
+    for rule in list(target.url_map.iter_rules()):
+        if rule.endpoint not in GLOBAL_ENDPOINTS:
+            target.add_url_rule(
+                SESSION_PREFIX + rule.rule,
+                f"{rule.endpoint}_in_session",
+                target.view_functions[rule.endpoint],
+                methods=rule.methods - {"HEAD", "OPTIONS"},
+            )
 
-        document.getElementById("feedbackForm").addEventListener("submit", (e) => {
-            e.preventDefault();
-            const formData = new FormData(document.getElementById("feedbackForm"));
-            const answers = Array.from(formData.entries()).map(([_, v]) => v);
-            
-            fetch("/api/submit-feedback", {
-                method: "POST",
-                headers: {"Content-Type": "application/json"},
-                body: JSON.stringify({answers})
-            }).then(r => r.json()).then(data => {
-                if (data.success) {
-                    alert("Thank you! Your response has been submitted.");
-                    document.getElementById("feedbackForm").reset();
-                } else {
-                    alert("Error: " + (data.error || "Unknown error"));
-                }
-            });
-        });
+def session_path() -> str:
+    """URL prefix of the session being served: "/s/<id>", or "" for the container's own."""
+    return f"/s/{session_data.session_id}" if tenants.active.get() else ""
 
-        loadQuestions();
-        setInterval(loadQuestions, 3000);
-    </script>
-</body>
-</html>
-"""
+@app.url_value_preprocessor
+def select_session(endpoint, values):
+    """Point session_data and friends at the session named in the URL.
+
+    A multi-tenant server has no session of its own, so its unprefixed
+    session endpoints are 404, as is /s/ on a single-session server.
+    """
+    session_id = values.pop("session_id", None) if values else None
+    tenant = sessions.get(session_id) if MULTI_TENANT and session_id else None
+    tenants.active.set(tenant)
+    if session_id is not None and tenant is None:
+        raise NotFound()
+    if MULTI_TENANT and session_id is None and endpoint and endpoint not in GLOBAL_ENDPOINTS:
+        raise NotFound()
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+    tracer.start(f"{request.method} {request.url_rule.rule if request.url_rule else 'unmatched'}")
+
+# Session requests are recorded in the store at most this often (seconds), for /health
+ACTIVITY_RESOLUTION = 30.0
+
+def activity_due(endpoint: str | None) -> bool:
+    """Whether a request to `endpoint` should be recorded as the session's last activity."""
+    if endpoint is None or endpoint in GLOBAL_ENDPOINTS:
+        return False
+    return time.time() - current_tenant().activity_noted >= ACTIVITY_RESOLUTION
+
+def note_activity() -> None:
+    tenant = current_tenant()
+    tenant.activity_noted = time.time()
+    tenant.session.store.record_activity(tenant.activity_noted)
+
+@app.before_request
+def record_activity():
+    if activity_due(request.endpoint):
+        note_activity()
+
+@app.before_request
+def adopt_claim():
+    """Take on the session id a claim stored, whichever worker received it."""
+    if CLAIM_TOKEN and session_data.session_id == SESSION_ID:
+        claimed = session_data.store.get("claimed_session_id")
+        if claimed:
+            session_data.session_id = claimed
+
+@app.after_request
+def record_request(response):
+    """Record the request for /metrics, and its spans in Server-Timing when tracing."""
+    trace = tracer.finish()
+    if trace is not None:
+        response.headers["Server-Timing"] = trace.server_timing()
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.inc("event_server_http_requests_total", (route, request.method, str(response.status_code)))
+    if "started" in g:
+        elapsed = time.perf_counter() - g.started
+        metrics.observe("event_server_http_request_duration_seconds", elapsed, (route,))
+    if route.removeprefix(SESSION_PREFIX) in STATE_ROUTES and response.status_code == 200:
+        metrics.observe("event_server_state_payload_bytes", response.content_length or 0, (route,))
+    metrics.ensure_flushing()
+    return response
+
+def session_gauges() -> dict[str, tuple[str, float]]:
+    """Gauges read at scrape time: feedback held, and sessions when multi-tenant."""
+    if not MULTI_TENANT:
+        feedback_count = default_tenant.session.store.feedback_count()
+        return {"event_server_feedback_items": ("Feedback items in the session", feedback_count)}
+    hosted = sessions.tenants()
+    return {
+        "event_server_feedback_items": (
+            "Feedback items in all sessions", sum(t.session.store.feedback_count() for t in hosted)
+        ),
+        "event_server_sessions": ("Sessions hosted by this worker", len(hosted)),
+    }
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus metrics for this container (see event_server/metrics.py)."""
+    body = metrics.render(session_gauges())
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+@app.route("/debug/profile")
+def debug_profile():
+    """Sample this worker's stacks for `?seconds=N` (default 10, at most 60).
+
+    Returns collapsed stacks for a flamegraph tool. Only served when
+    DEBUG_TOKEN is set, to requests with `Authorization: Bearer <token>`.
+    """
+    error = bearer_token_error(request.headers.get("Authorization", ""), os.environ.get("DEBUG_TOKEN"))
+    if error is not None:
+        return jsonify({"success": False, "error": error[0]}), error[1]
+    seconds = min(max(request.args.get("seconds", 10.0, type=float), 0.1), 60.0)
+    return Response(tracer.profile(seconds), mimetype="text/plain")
+
+def bearer_token_error(authorization: str, token: str | None) -> tuple[str, int] | None:
+    """None if `authorization` is "Bearer <token>", else an error and status.
+
+    An unset `token` means the endpoint is off, so it answers 404.
+    """
+    if not token:
+        return "Not found", 404
+    scheme, _, supplied = authorization.partition(" ")
+    if scheme != "Bearer" or not hmac.compare_digest(supplied.strip().encode(), token.encode()):
+        return "Invalid token", 403
+    return None
+
+@app.route("/api/claim", methods=["POST"])
+def claim_session():
+    """Assign this warm container to a new session: `{"session_id": ...}`.
+
+    Called by the landing page with `Authorization: Bearer <CLAIM_TOKEN>`.
+    A container is claimed once; a second claim gets 409.
+    """
+    error = bearer_token_error(request.headers.get("Authorization", ""), CLAIM_TOKEN)
+    if error is not None:
+        return jsonify({"success": False, "error": error[0]}), error[1]
+    session_id = (request.get_json(silent=True) or {}).get("session_id")
+    if not isinstance(session_id, str) or not session_id:
+        return jsonify({"success": False, "error": "session_id is required"}), 400
+    if session_data.store.compare_and_set("claimed_session_id", None, session_id) is None:
+        return jsonify({"success": False, "error": "Already claimed"}), 409
+    session_data.session_id = session_id
+    return jsonify({"success": True, "session_id": session_id})
 
 @app.route("/")
 def admin():
-    return render_template_string(admin_html, session_id=session_data.session_id)
+    return render_template_string(
+        admin_html, session_id=session_data.session_id, base_path=request.script_root + session_path()
+    )
 
 @app.route("/participant")
 def participant():
-    return render_template("participant.html", session_id=session_data.session_id)
+    return render_template(
+        "participant.html",
+        session_id=session_data.session_id,
+        base_path=request.script_root + session_path(),
+    )
 
 @app.route("/api/state")
 def get_state():
-    return jsonify(session_data.to_dict())
+    """Return the session state, or only what changed with `?since=<version>`.
+
+    Responses carry an ETag derived from the session version, so pollers get
+    a bodyless 304 while nothing has changed.
+    """
+    since = request.args.get("since", type=int)
+    with tracer.span("store"):
+        version = session_data.version
+    etag = _state_etag(version, since)
+    if request.if_none_match.contains(etag) or (since is not None and since >= version):
+        return _not_modified(etag)
+
+    with tracer.span("store"):
+        state = session_data.to_dict() if since is None else session_data.delta(since)
+    with tracer.span("serialize"):
+        response = jsonify(state)
+    response.set_etag(_state_etag(state["version"], since))
+    return response
+
+@app.route("/api/participant-state")
+def get_participant_state():
+    """Return questions and collection status only, for the participant page."""
+    return _versioned_json("participant", session_data.participant_state)
+
+@app.route("/api/admin-summary")
+def get_admin_summary():
+    """Return counts, questions, expiry and report for the admin dashboard."""
+    return _versioned_json("admin", session_data.admin_summary)
+
+@app.route("/api/events")
+def events():
+    """Stream session changes as Server-Sent Events. `?view=admin` adds admin events."""
+    # Resolved now: the stream is read after the request's context is gone
+    stream = stream_events(
+        current_tenant().watcher,
+        admin=request.args.get("view") == "admin",
+        heartbeat=float(os.environ.get("SSE_HEARTBEAT_SECONDS", "15")),
+        max_seconds=float(os.environ.get("SSE_MAX_SECONDS", "300")),
+    )
+    return Response(
+        stream,
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _versioned_json(view: str, build):
+    """Serve `build()` as JSON with a version ETag, or 304 if the client has it."""
+    with tracer.span("store"):
+        etag = f"{session_data.session_id}-{session_data.version}-{view}"
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
+    with tracer.span("store"):
+        state = build()
+    with tracer.span("serialize"):
+        response = jsonify(state)
+    response.set_etag(etag)
+    return response
+
+def _state_etag(version: int, since: int | None) -> str:
+    etag = f"{session_data.session_id}-{version}"
+    return etag if since is None else f"{etag}-since-{since}"
+
+def _not_modified(etag: str):
+    response = app.response_class(status=304)
+    response.set_etag(etag)
+    return response
 
 @app.route("/api/questions", methods=["POST"])
 def update_questions():
@@ -619,6 +863,7 @@ def set_expire_time():
     data = request.json
     minutes = data.get("minutes", 30)
     session_data.expire_time = datetime.now() + timedelta(minutes=minutes)
+    expiry_scheduler.ensure_running()
     return jsonify({"success": True})
 
 @app.route("/api/close-collection", methods=["POST"])
@@ -628,59 +873,149 @@ def close_collection():
 
 @app.route("/api/submit-feedback", methods=["POST"])
 def submit_feedback():
+    # Close collection now if the expire time has passed, rather than when
+    # this worker's scheduler next looks (up to EXPIRY_CHECK_SECONDS later)
+    with tracer.span("store"):
+        expiry_scheduler.step()
     if not session_data.is_collecting:
         return jsonify({"success": False, "error": "Data collection is closed"}), 400
     
-    data = request.json
-    
     # Support two formats:
     # 1. New: {"items": [{"question": "Q", "answer": "A"}, ...]}
     # 2. Old: {"answers": ["A1", "A2", ...]} (uses session_data.questions)
-    if "items" in data:
-        # New format: direct question+answer pairs
-        for item in data["items"]:
-            if item.get("answer"):  # Only add if answer is not empty
-                session_data.feedback.append({
-                    "question": item.get("question", ""),
-                    "answer": item["answer"],
-                    "timestamp": datetime.now().isoformat(),
-                })
-    else:
-        # Old format: just answers (use existing questions)
-        answers = data.get("answers", [])
-        session_data.add_feedback(answers)
+    with tracer.span("parse"):
+        data = request.get_json(silent=True)
+    questions = session_data.questions if isinstance(data, dict) and "items" not in data else []
+    try:
+        with tracer.span("parse"):
+            records = parse_submission(data, questions, MAX_ITEMS_PER_REQUEST)
+    except SubmissionError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status
     
-    return jsonify({"success": True})
+    try:
+        with tracer.span("store"):
+            committed = ingest_queue.submit(records)
+    except QueueFull:
+        response = jsonify({"success": False, "error": "Server busy, please retry"})
+        response.headers["Retry-After"] = "1"
+        return response, 429
+    
+    if rolling_summarizer:
+        rolling_summarizer.ensure_running()
+    # Also here, so a worker that did not set the expire time can enforce it
+    expiry_scheduler.ensure_running()
+    
+    # 202: accepted and queued, but not yet committed when we stopped waiting
+    return jsonify({"success": True}), 200 if committed else 202
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({"success": False, "error": "Request too large"}), 413
 
 @app.route("/api/generate-report", methods=["POST"])
 def generate_report_endpoint():
-    """Generate a report from collected feedback using LLM."""
+    """Start generating a report in the background and return its job.
+
+    If a job for the same feedback is already running, that job is returned
+    instead of starting another LLM call. Poll `/api/report-jobs/<id>`.
+    A report already cached for exactly this feedback is returned at once.
+    """
+    with tracer.span("store"):
+        feedback = session_data.feedback
+    if not feedback:
+        return jsonify({"success": False, "error": "No feedback collected yet"}), 400
+    with tracer.span("cache"):
+        report = report_backend.cached(feedback)
+    if report is not None:
+        report_jobs.save(report, len(feedback))
+        return jsonify({"success": True, "report": report, "cached": True})
+    job = report_jobs.submit()
+    response = jsonify({"success": True, "job": job})
+    response.headers["Location"] = f"{request.script_root}{session_path()}/api/report-jobs/{job['id']}"
+    return response, 202
+
+@app.route("/api/report-jobs/<job_id>")
+def report_job_status(job_id):
+    """Return a report job: status is running, done (with report) or failed (with error)."""
+    job = report_jobs.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "No such report job"}), 404
+    return jsonify({"success": True, "job": job})
+
+@app.route("/api/generate-report/stream", methods=["POST"])
+def generate_report_stream_endpoint():
+    """Generate a report, sending text as Server-Sent Events while the LLM writes it.
+
+    Emits `chunk` events with `{"text": ...}`, then `done`, or `error` if the
+    LLM call fails partway. The full text is saved as the generated report.
+    Shares the single-flight slot with background jobs: if one is already
+    running for this feedback, answers 409 with that job instead.
+    """
+    if session_data.store.feedback_count() == 0:
+        return jsonify({"success": False, "error": "No feedback collected yet"}), 400
+    job, created = report_jobs.claim()
+    if not created:
+        return jsonify({"success": False, "error": "Report already being generated", "job": job}), 409
     try:
-        if not session_data.feedback:
-            return jsonify({"success": False, "error": "No feedback collected yet"}), 400
-        
-        # Generate report using LLM
-        report = generate_report(session_data.feedback)
-        session_data.generated_report = report
-        
-        return jsonify({
-            "success": True,
-            "report": report
-        })
-    except ValueError as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+        options = {"rolling": rolling_summarizer.state()} if rolling_summarizer else {}
+        chunks = report_backend.stream(
+            session_data.store.read_feedback()[:job["feedback_count"]], **options
+        )
     except Exception as e:
-        return jsonify({"success": False, "error": f"Failed to generate report: {str(e)}"}), 500
+        # Whatever went wrong, the slot must not stay claimed until it goes stale
+        report_jobs.fail(job, str(e))
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    # Resolved now: the stream is read after the request's context is gone
+    jobs = current_tenant().jobs
+    finished = False
+
+    def events():
+        nonlocal finished
+        parts = []
+        try:
+            for text in chunks:
+                parts.append(text)
+                yield format_event("chunk", {"text": text})
+            jobs.finish(job, "".join(parts))
+            finished = True
+            yield format_event("done", {"job_id": job["id"]})
+        except Exception as e:
+            jobs.fail(job, f"Failed to generate report: {str(e)}")
+            finished = True
+            yield format_event("error", {"error": f"Failed to generate report: {str(e)}"})
+
+    def abandon():
+        # The client went away, perhaps before the first chunk, when a
+        # generator's finally would not run; free the slot for a retry
+        if not finished:
+            jobs.fail(job, "Report stream was closed before it finished")
+
+    response = Response(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    response.call_on_close(abandon)
+    return response
 
 @app.route("/api/publish-to-quartz", methods=["POST"])
 def publish_to_quartz():
     """Publish the generated report to the quartz repository."""
+    result, status = publish_report()
+    return jsonify(result), status
+
+def publish_report():
+    """Commit and push the generated report to the quartz repository.
+
+    Returns the JSON body and status code; shared with the ASGI app.
+    """
     import subprocess
     from pathlib import Path
     
     try:
         if not session_data.generated_report:
-            return jsonify({"success": False, "error": "No report generated yet"}), 400
+            return {"success": False, "error": "No report generated yet"}, 400
         
         # Configuration
         quartz_dir = Path("/home/ubuntu/quartz")
@@ -688,7 +1023,7 @@ def publish_to_quartz():
         
         # Verify quartz repo exists
         if not quartz_dir.exists() or not (quartz_dir / ".git").exists():
-            return jsonify({"success": False, "error": "Quartz repository not found"}), 500
+            return {"success": False, "error": "Quartz repository not found"}, 500
         
         # Create filename with datetime
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
@@ -731,27 +1066,51 @@ def publish_to_quartz():
                 text=True
             )
             
-            return jsonify({
+            return {
                 "success": True,
                 "filename": filename,
                 "path": str(filepath.relative_to(quartz_dir))
-            })
+            }, 200
             
         except subprocess.CalledProcessError as e:
-            return jsonify({
+            return {
                 "success": False,
                 "error": f"Git operation failed: {e.stderr}"
-            }), 500
+            }, 500
             
     except Exception as e:
-        return jsonify({
+        return {
             "success": False,
             "error": f"Failed to publish report: {str(e)}"
-        }), 500
+        }, 500
+
+def heartbeat() -> dict:
+    """What the landing page's reaper reads from /health (see landing_page/reaper.py).
+
+    `idle_seconds` is the time since the last request to a session
+    endpoint (accurate to ACTIVITY_RESOLUTION), or None if there was none;
+    `expires_in` is seconds until (negative: since) the expire time, or
+    None. Multi-tenant servers evict their own sessions.
+    """
+    if MULTI_TENANT:
+        return {}
+    session = default_tenant.session
+    expire_time = session.expire_time
+    last_activity = session.store.last_activity()
+    return {
+        "session_id": session.session_id,
+        "idle_seconds": time.time() - last_activity if last_activity is not None else None,
+        "expires_in": (expire_time - datetime.now()).total_seconds() if expire_time else None,
+    }
 
 @app.route("/health")
 def health():
-    return jsonify({"status": "ok"}), 200
+    return jsonify({"status": "ok", **heartbeat()}), 200
+
+add_session_routes(app)
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)), debug=False)
+    try:
+        app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)), debug=False)
+    finally:
+        end_session()
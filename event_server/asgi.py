@@ -0,0 +1,371 @@
+"""ASGI entry point: the event server's routes on Quart.
+
+    uvicorn event_server.asgi:app --workers 4
+
+Serves the same URLs, state and background workers as `event_server.app`
+(it imports them from there), but every request is a coroutine:
+
+- store reads and writes run in the default thread pool via
+  `asyncio.to_thread`, so a slow store never blocks the event loop;
+- `/api/events` streams and feedback submissions wait on the event loop
+  (`VersionWatcher.wait_async`, `IngestQueue.submit_async`), so an idle
+  participant costs a coroutine rather than a thread or greenlet;
+- report generation stays in `ReportJobs`' pool, and the streaming report
+  reads each chunk from the backend in a worker thread.
+
+Requires the `asgi` extra (pip install structured-transparency[asgi]).
+`SERVER_MODE=asgi` selects it in the Docker image.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+from quart import Quart, Response, g, jsonify, render_template, render_template_string, request
+
+from event_server.app import (
+    CLAIM_TOKEN, MAX_ITEMS_PER_REQUEST, SESSION_ID, SESSION_PREFIX, STATE_ROUTES, activity_due,
+    add_session_routes, adopt_claim, admin_html, bearer_token_error, current_tenant, end_session,
+    expiry_scheduler, heartbeat, ingest_queue, note_activity, publish_report, report_backend,
+    report_jobs, rolling_summarizer, select_session, session_data, session_gauges, session_path,
+)
+from event_server.events import format_event, stream_events_async
+from event_server.ingest import QueueFull, SubmissionError, parse_submission
+from event_server.metrics import metrics
+from event_server.tracing import tracer
+
+app = Quart(__name__, template_folder="templates", static_folder="static")
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_REQUEST_BYTES", 64 * 1024))
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# Picks the session for /s/<session_id>/ URLs, as in event_server.app
+app.url_value_preprocessor(select_session)
+
+
+@app.after_serving
+async def shutdown():
+    await asyncio.to_thread(end_session)
+
+
+@app.before_request
+async def start_timer():
+    g.started = time.perf_counter()
+    tracer.start(f"{request.method} {request.url_rule.rule if request.url_rule else 'unmatched'}")
+    if activity_due(request.endpoint):
+        await asyncio.to_thread(note_activity)
+    if CLAIM_TOKEN and session_data.session_id == SESSION_ID:
+        await asyncio.to_thread(adopt_claim)
+
+
+@app.after_request
+async def record_request(response):
+    """Record the request for /metrics and Server-Timing (see event_server.app)."""
+    trace = tracer.finish()
+    if trace is not None:
+        response.headers["Server-Timing"] = trace.server_timing()
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.inc("event_server_http_requests_total", (route, request.method, str(response.status_code)))
+    if "started" in g:
+        elapsed = time.perf_counter() - g.started
+        metrics.observe("event_server_http_request_duration_seconds", elapsed, (route,))
+    if route.removeprefix(SESSION_PREFIX) in STATE_ROUTES and response.status_code == 200:
+        metrics.observe("event_server_state_payload_bytes", response.content_length or 0, (route,))
+    metrics.ensure_flushing()
+    return response
+
+
+@app.route("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics for this container (see event_server/metrics.py)."""
+    gauges = await asyncio.to_thread(session_gauges)
+    body = await asyncio.to_thread(metrics.render, gauges)
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/debug/profile")
+async def debug_profile():
+    """Sample this worker's stacks for `?seconds=N` (see event_server.app)."""
+    error = bearer_token_error(request.headers.get("Authorization", ""), os.environ.get("DEBUG_TOKEN"))
+    if error is not None:
+        return jsonify({"success": False, "error": error[0]}), error[1]
+    seconds = min(max(request.args.get("seconds", 10.0, type=float), 0.1), 60.0)
+    return Response(await asyncio.to_thread(tracer.profile, seconds), mimetype="text/plain")
+
+
+@app.route("/api/claim", methods=["POST"])
+async def claim_session():
+    """Assign this warm container to a new session (see event_server.app)."""
+    error = bearer_token_error(request.headers.get("Authorization", ""), CLAIM_TOKEN)
+    if error is not None:
+        return jsonify({"success": False, "error": error[0]}), error[1]
+    session_id = (await request.get_json(silent=True) or {}).get("session_id")
+    if not isinstance(session_id, str) or not session_id:
+        return jsonify({"success": False, "error": "session_id is required"}), 400
+    claimed = await asyncio.to_thread(
+        session_data.store.compare_and_set, "claimed_session_id", None, session_id
+    )
+    if claimed is None:
+        return jsonify({"success": False, "error": "Already claimed"}), 409
+    session_data.session_id = session_id
+    return jsonify({"success": True, "session_id": session_id})
+
+
+@app.route("/")
+async def admin():
+    return await render_template_string(
+        admin_html, session_id=session_data.session_id, base_path=request.root_path + session_path()
+    )
+
+
+@app.route("/participant")
+async def participant():
+    return await render_template(
+        "participant.html",
+        session_id=session_data.session_id,
+        base_path=request.root_path + session_path(),
+    )
+
+
+@app.route("/api/state")
+async def get_state():
+    """Return the session state, or only what changed with `?since=<version>`."""
+    since = request.args.get("since", type=int)
+    version = await asyncio.to_thread(lambda: session_data.version)
+    etag = _state_etag(version, since)
+    if request.if_none_match.contains(etag) or (since is not None and since >= version):
+        return _not_modified(etag)
+
+    state = await asyncio.to_thread(
+        session_data.to_dict if since is None else lambda: session_data.delta(since)
+    )
+    response = jsonify(state)
+    response.set_etag(_state_etag(state["version"], since))
+    return response
+
+
+@app.route("/api/participant-state")
+async def get_participant_state():
+    """Return questions and collection status only, for the participant page."""
+    return await _versioned_json("participant", session_data.participant_state)
+
+
+@app.route("/api/admin-summary")
+async def get_admin_summary():
+    """Return counts, questions, expiry and report for the admin dashboard."""
+    return await _versioned_json("admin", session_data.admin_summary)
+
+
+@app.route("/api/events")
+async def events():
+    """Stream session changes as Server-Sent Events. `?view=admin` adds admin events."""
+    # Resolved now: the stream is read after the request's context is gone
+    stream = stream_events_async(
+        current_tenant().watcher,
+        admin=request.args.get("view") == "admin",
+        heartbeat=float(os.environ.get("SSE_HEARTBEAT_SECONDS", "15")),
+        max_seconds=float(os.environ.get("SSE_MAX_SECONDS", "300")),
+    )
+    response = Response(stream, mimetype="text/event-stream", headers=SSE_HEADERS)
+    # Streams end on their own after SSE_MAX_SECONDS
+    response.timeout = None
+    return response
+
+
+async def _versioned_json(view: str, build):
+    """Serve `build()` as JSON with a version ETag, or 304 if the client has it."""
+    version = await asyncio.to_thread(lambda: session_data.version)
+    etag = f"{session_data.session_id}-{version}-{view}"
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
+    response = jsonify(await asyncio.to_thread(build))
+    response.set_etag(etag)
+    return response
+
+
+def _state_etag(version: int, since: int | None) -> str:
+    etag = f"{session_data.session_id}-{version}"
+    return etag if since is None else f"{etag}-since-{since}"
+
+
+def _not_modified(etag: str):
+    response = Response("", status=304)
+    response.set_etag(etag)
+    return response
+
+
+@app.route("/api/questions", methods=["POST"])
+async def update_questions():
+    data = await request.get_json()
+    questions = [q for q in data.get("questions", []) if q.strip()]
+    await asyncio.to_thread(setattr, session_data, "questions", questions)
+    return jsonify({"success": True})
+
+
+@app.route("/api/expire-time", methods=["POST"])
+async def set_expire_time():
+    data = await request.get_json()
+    expire_time = datetime.now() + timedelta(minutes=data.get("minutes", 30))
+    await asyncio.to_thread(setattr, session_data, "expire_time", expire_time)
+    expiry_scheduler.ensure_running()
+    return jsonify({"success": True})
+
+
+@app.route("/api/close-collection", methods=["POST"])
+async def close_collection():
+    await asyncio.to_thread(setattr, session_data, "is_collecting", False)
+    return jsonify({"success": True})
+
+
+@app.route("/api/submit-feedback", methods=["POST"])
+async def submit_feedback():
+    # Close collection now if the expire time has passed (see event_server.app)
+    await asyncio.to_thread(expiry_scheduler.step)
+    if not await asyncio.to_thread(lambda: session_data.is_collecting):
+        return jsonify({"success": False, "error": "Data collection is closed"}), 400
+
+    data = await request.get_json(silent=True)
+    questions = (
+        await asyncio.to_thread(lambda: session_data.questions)
+        if isinstance(data, dict) and "items" not in data
+        else []
+    )
+    try:
+        records = parse_submission(data, questions, MAX_ITEMS_PER_REQUEST)
+    except SubmissionError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status
+
+    try:
+        committed = await ingest_queue.submit_async(records)
+    except QueueFull:
+        response = jsonify({"success": False, "error": "Server busy, please retry"})
+        response.headers["Retry-After"] = "1"
+        return response, 429
+
+    if rolling_summarizer:
+        rolling_summarizer.ensure_running()
+    expiry_scheduler.ensure_running()
+
+    return jsonify({"success": True}), 200 if committed else 202
+
+
+@app.errorhandler(413)
+async def request_too_large(e):
+    return jsonify({"success": False, "error": "Request too large"}), 413
+
+
+@app.route("/api/generate-report", methods=["POST"])
+async def generate_report_endpoint():
+    """Start generating a report in the background and return its job (see event_server.app)."""
+    feedback = await asyncio.to_thread(lambda: session_data.feedback)
+    if not feedback:
+        return jsonify({"success": False, "error": "No feedback collected yet"}), 400
+    report = await asyncio.to_thread(report_backend.cached, feedback)
+    if report is not None:
+        await asyncio.to_thread(report_jobs.save, report, len(feedback))
+        return jsonify({"success": True, "report": report, "cached": True})
+    job = await asyncio.to_thread(report_jobs.submit)
+    response = jsonify({"success": True, "job": job})
+    response.headers["Location"] = f"{request.root_path}{session_path()}/api/report-jobs/{job['id']}"
+    return response, 202
+
+
+@app.route("/api/report-jobs/<job_id>")
+async def report_job_status(job_id):
+    """Return a report job: status is running, done (with report) or failed (with error)."""
+    job = await asyncio.to_thread(report_jobs.get, job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "No such report job"}), 404
+    return jsonify({"success": True, "job": job})
+
+
+class _ClosingEvents:
+    """An async event stream that calls `on_close` when Quart closes it.
+
+    Closing an async generator that never started skips its `finally`; this
+    runs `on_close` either way, like Flask's `Response.call_on_close`.
+    """
+
+    def __init__(self, events, on_close) -> None:
+        self._events = events
+        self._on_close = on_close
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self._events.__anext__()
+
+    async def aclose(self) -> None:
+        try:
+            await self._events.aclose()
+        finally:
+            await asyncio.to_thread(self._on_close)
+
+
+@app.route("/api/generate-report/stream", methods=["POST"])
+async def generate_report_stream_endpoint():
+    """Generate a report, sending text as Server-Sent Events (see event_server.app)."""
+    if await asyncio.to_thread(session_data.store.feedback_count) == 0:
+        return jsonify({"success": False, "error": "No feedback collected yet"}), 400
+    job, created = await asyncio.to_thread(report_jobs.claim)
+    if not created:
+        return jsonify({"success": False, "error": "Report already being generated", "job": job}), 409
+
+    def start():
+        options = {"rolling": rolling_summarizer.state()} if rolling_summarizer else {}
+        feedback = session_data.store.read_feedback()[:job["feedback_count"]]
+        return report_backend.stream(feedback, **options)
+
+    try:
+        chunks = await asyncio.to_thread(start)
+    except Exception as e:
+        # Whatever went wrong, the slot must not stay claimed until it goes stale
+        await asyncio.to_thread(report_jobs.fail, job, str(e))
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    # Resolved now: the stream is read after the request's context is gone
+    jobs = current_tenant().jobs
+    finished = False
+
+    async def events():
+        nonlocal finished
+        parts = []
+        try:
+            # The backend's iterator blocks on the LLM; read it off the event loop
+            while (text := await asyncio.to_thread(next, chunks, None)) is not None:
+                parts.append(text)
+                yield format_event("chunk", {"text": text})
+            await asyncio.to_thread(jobs.finish, job, "".join(parts))
+            finished = True
+            yield format_event("done", {"job_id": job["id"]})
+        except Exception as e:
+            await asyncio.to_thread(jobs.fail, job, f"Failed to generate report: {str(e)}")
+            finished = True
+            yield format_event("error", {"error": f"Failed to generate report: {str(e)}"})
+
+    def abandon():
+        # The client went away, perhaps before the first chunk; free the slot for a retry
+        if not finished:
+            jobs.fail(job, "Report stream was closed before it finished")
+
+    response = Response(
+        _ClosingEvents(events(), abandon), mimetype="text/event-stream", headers=SSE_HEADERS
+    )
+    response.timeout = None
+    return response
+
+
+@app.route("/api/publish-to-quartz", methods=["POST"])
+async def publish_to_quartz():
+    """Publish the generated report to the quartz repository."""
+    result, status = await asyncio.to_thread(publish_report)
+    return jsonify(result), status
+
+
+@app.route("/health")
+async def health():
+    return jsonify({"status": "ok", **await asyncio.to_thread(heartbeat)}), 200
+
+
+add_session_routes(app)
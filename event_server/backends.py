@@ -0,0 +1,72 @@
+"""Pluggable report backends.
+
+`REPORT_BACKEND` picks how reports are written:
+
+    anthropic   Claude via `event_server/llm.py` (default)
+    extractive  Offline TF-IDF themes and quotes (`event_server/extractive.py`);
+                no network, no API key, deterministic
+    auto        anthropic if ANTHROPIC_API_KEY is set, otherwise extractive
+"""
+import os
+from abc import ABC, abstractmethod
+from typing import Any, Iterator
+
+from event_server import extractive, llm
+
+
+class ReportBackend(ABC):
+    """Turns feedback into report text."""
+
+    name: str
+    # Whether `rolling=` summaries from a RollingSummarizer help this backend
+    supports_rolling = False
+
+    @abstractmethod
+    def generate(self, feedback: list[dict[str, Any]], **options: Any) -> str:
+        """Return the report for `feedback`."""
+
+    def stream(self, feedback: list[dict[str, Any]], **options: Any) -> Iterator[str]:
+        """Return an iterator over the report text. Errors in setup raise here."""
+        return iter([self.generate(feedback, **options)])
+
+    def cached(self, feedback: list[dict[str, Any]]) -> str | None:
+        """Return a report for exactly this feedback if one is ready without work."""
+        return None
+
+
+class AnthropicBackend(ReportBackend):
+    name = "anthropic"
+    supports_rolling = True
+
+    def generate(self, feedback: list[dict[str, Any]], **options: Any) -> str:
+        return llm.generate_report(feedback, **options)
+
+    def stream(self, feedback: list[dict[str, Any]], **options: Any) -> Iterator[str]:
+        return llm.stream_report(feedback, **options)
+
+    def cached(self, feedback: list[dict[str, Any]]) -> str | None:
+        return llm.cached_report(feedback)
+
+
+class ExtractiveBackend(ReportBackend):
+    name = "extractive"
+
+    def __init__(self, max_themes: int = 5) -> None:
+        self.max_themes = max_themes
+
+    def generate(self, feedback: list[dict[str, Any]], **options: Any) -> str:
+        if not feedback:
+            return llm.NO_FEEDBACK_REPORT
+        return extractive.summarize(feedback, self.max_themes)
+
+
+def create_backend(name: str | None = None) -> ReportBackend:
+    """Create the backend named by `name` or the REPORT_BACKEND environment variable."""
+    name = name or os.environ.get("REPORT_BACKEND", "anthropic")
+    if name == "auto":
+        name = "anthropic" if os.environ.get("ANTHROPIC_API_KEY") else "extractive"
+    if name == "anthropic":
+        return AnthropicBackend()
+    if name == "extractive":
+        return ExtractiveBackend(int(os.environ.get("EXTRACTIVE_MAX_THEMES", "5")))
+    raise ValueError(f"Unsupported REPORT_BACKEND: {name}")
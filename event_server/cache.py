@@ -0,0 +1,212 @@
+"""Content-addressed cache for LLM output.
+
+Keys are hashes of everything that determines a completion (model, prompt
+template and the feedback it is filled with), so an entry never goes stale
+in the usual sense: if any input changes, so does the key. TTL and size
+limits only bound how much is kept.
+
+Cached reports contain participant answers in summarized form. Keep a disk
+cache on a tmpfs such as `/dev/shm` so it dies with the container, like the
+session store.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any
+
+
+def cache_key(*parts: Any) -> str:
+    """Return a stable hex digest of JSON-serializable `parts`."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    def to_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class ReportCache(ABC):
+    """Interface for string caches keyed by `cache_key()` digests."""
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        """Return the cached value, or None if it is missing or expired."""
+        value = self._get(key)
+        with self._lock:
+            if value is None:
+                self.stats.misses += 1
+            else:
+                self.stats.hits += 1
+        return value
+
+    @abstractmethod
+    def _get(self, key: str) -> str | None:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: str) -> None:
+        """Store `value`, evicting old entries if over the size limit."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every entry. Stats are kept."""
+
+    def _expired(self, created: float) -> bool:
+        return time.time() - created > self.ttl
+
+
+class NullCache(ReportCache):
+    """Caches nothing. Every lookup is a miss."""
+
+    def __init__(self) -> None:
+        super().__init__(ttl=0)
+
+    def _get(self, key: str) -> str | None:
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class MemoryCache(ReportCache):
+    """In-process LRU cache holding at most `max_entries` values."""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600.0) -> None:
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    def _get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[0]):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache(ReportCache):
+    """One JSON file per entry in `directory`, shared by workers on the host.
+
+    Reads refresh a file's mtime, and once the directory exceeds `max_bytes`
+    the least recently used files are deleted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 50 * 2**20, ttl: float = 3600.0) -> None:
+        super().__init__(ttl)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _get(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self._expired(entry["created"]):
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["value"]
+
+    def set(self, key: str, value: str) -> None:
+        path = self._path(key)
+        # Write then rename, so other workers never read a partial file
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "value": value}, f)
+        os.replace(tmp, path)
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if self._remove(path):
+                total -= size
+                with self._lock:
+                    self.stats.evictions += 1
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def clear(self) -> None:
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    self._remove(entry.path)
+
+
+def create_cache(url: str, ttl: float = 3600.0) -> ReportCache:
+    """Create a cache from a `REPORT_CACHE`-style URL.
+
+    Supported values:
+        memory                        In-process LRU (default)
+        disk:///dev/shm/report-cache  One file per entry in the given directory
+        none                          No caching
+    """
+    if not url or url == "memory":
+        return MemoryCache(ttl=ttl)
+    if url == "none":
+        return NullCache()
+    if url.startswith("disk://"):
+        return DiskCache(url[len("disk://"):], ttl=ttl)
+    raise ValueError(f"Unsupported REPORT_CACHE: {url}")
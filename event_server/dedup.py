@@ -0,0 +1,138 @@
+"""Near-duplicate answer grouping with MinHash, ahead of the LLM.
+
+Big sessions repeat themselves ("more time for discussion", "needed more
+discussion time"). `compress_feedback()` merges answers to the same
+question whose word sets are similar enough and returns one item per group
+with a `count`, which `prompts.format_answer()` shows to the model. Fewer prompt
+tokens, and the report still knows how often each point was made.
+
+Signatures and LSH band keys are computed with NumPy over all answers at
+once. Requires the `numpy` package (pip install structured-transparency[dedup]).
+"""
+import zlib
+from typing import Any
+
+from event_server.extractive import tokenize
+
+# Mersenne prime 2**31 - 1. Hashes are reduced mod it first, so a * h + b < 2**63
+_PRIME = (1 << 31) - 1
+_SEED = 20251105
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as e:
+        raise RuntimeError(
+            "Answer deduplication requires the 'numpy' package "
+            "(pip install structured-transparency[dedup])"
+        ) from e
+    return numpy
+
+
+def shingles(text: str) -> set[str]:
+    """Word set used for similarity: content words, light plural stemming.
+
+    Text with no content words (such as "ok") is its own single shingle.
+    """
+    words = {word[:-1] if len(word) > 3 and word.endswith("s") else word for word in tokenize(text)}
+    return words or {text.strip().lower()}
+
+
+def signatures(sets: list[set[str]], num_perm: int = 64):
+    """MinHash signatures of shingle sets, one row of `num_perm` uint64 values per set."""
+    np = _numpy()
+    hashed = [[zlib.crc32(s.encode()) for s in shingle_set] for shingle_set in sets]
+    lengths = np.fromiter((len(h) for h in hashed), dtype=np.int64, count=len(sets))
+    flat = np.fromiter((x for h in hashed for x in h), dtype=np.uint64, count=int(lengths.sum()))
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    rng = np.random.default_rng(_SEED)
+    a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+    result = np.empty((len(sets), num_perm), dtype=np.uint64)
+    # One permutation at a time keeps memory at one value per shingle
+    for p in range(num_perm):
+        values = (a[p] * (flat % _PRIME) + b[p]) % _PRIME
+        result[:, p] = np.minimum.reduceat(values, starts)
+    return result
+
+
+def near_duplicate_groups(
+    texts: list[str],
+    keys: list[int] | None = None,
+    threshold: float = 0.6,
+    num_perm: int = 64,
+    bands: int = 16,
+) -> list[int]:
+    """Label each text with the index of the first text in its group.
+
+    Only texts with equal `keys` (for example, a question id) are grouped.
+    Candidates come from LSH banding on MinHash signatures; a candidate pair
+    is merged if the Jaccard similarity of its word sets is at least
+    `threshold`. Groups are transitive.
+    """
+    np = _numpy()
+    n = len(texts)
+    if n == 0:
+        return []
+    sets = [shingles(text) for text in texts]
+    sig = signatures(sets, num_perm)
+    group_keys = np.asarray(keys if keys is not None else [0] * n, dtype=np.uint64)
+    rows = num_perm // bands
+
+    pairs = []
+    for band in range(bands):
+        # Mix the band's rows and the group key into one bucket id per text
+        bucket = group_keys * np.uint64(0x9E3779B97F4A7C15)
+        for row in sig[:, band * rows:(band + 1) * rows].T:
+            bucket = (bucket ^ row) * np.uint64(0x100000001B3)
+        _, first, inverse = np.unique(bucket, return_index=True, return_inverse=True)
+        rep = first[inverse]
+        candidates = np.nonzero(rep != np.arange(n))[0]
+        # Each pair as one int64 (i * n + j), so duplicates across bands sort cheaply
+        pairs.append(candidates * n + rep[candidates])
+    codes = np.unique(np.concatenate(pairs))
+    left, right = codes // n, codes % n
+    pairs = np.stack([left, right], axis=1)[group_keys[left] == group_keys[right]]
+
+    parent = list(range(n))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs.tolist():
+        # Exact check: a 64-value signature misjudges short answers by several points
+        if len(sets[i] & sets[j]) < threshold * len(sets[i] | sets[j]):
+            continue
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            # The earliest text stays the representative
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+    return [find(i) for i in range(n)]
+
+
+def compress_feedback(feedback: list[dict[str, Any]], threshold: float = 0.6) -> list[dict[str, Any]]:
+    """Merge near-duplicate answers per question.
+
+    Returns one item per group, in order of first appearance: the earliest
+    answer and timestamp, plus `count` when the group has more than one.
+    """
+    question_ids: dict[str, int] = {}
+    keys = [question_ids.setdefault(item["question"], len(question_ids)) for item in feedback]
+    labels = near_duplicate_groups([item["answer"] for item in feedback], keys, threshold)
+
+    counts: dict[int, int] = {}
+    for label in labels:
+        counts[label] = counts.get(label, 0) + 1
+    compressed = []
+    for i, item in enumerate(feedback):
+        if labels[i] == i:
+            merged = dict(item)
+            if counts[i] > 1:
+                merged["count"] = counts[i]
+            compressed.append(merged)
+    return compressed
@@ -0,0 +1,181 @@
+"""Server-Sent Events push channel for session changes.
+
+One `VersionWatcher` per process polls the store version and wakes every open
+stream, so the store is read once per change rather than once per client.
+Streams block on a `threading.Condition`, which gevent patches into a
+greenlet primitive, so idle connections are cheap under the gevent worker.
+The ASGI app (event_server/asgi.py) uses `stream_events_async()`, which
+awaits the watcher on the event loop instead.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Iterator
+
+from event_server.models import SessionData
+
+
+class VersionWatcher:
+    """Tracks the session version and a snapshot of the fields streams push."""
+
+    def __init__(self, session: SessionData, interval: float = 0.5) -> None:
+        self.session = session
+        self.interval = interval
+        self._cond = threading.Condition()
+        self._version: int | None = None
+        self._snapshot: dict[str, Any] = {}
+        self._pid: int | None = None
+        self._closed = False
+        # Called once on the next change; used by wait_async()
+        self._callbacks: list[Callable[[], None]] = []
+
+    def _ensure_running(self) -> None:
+        # Started lazily so each gunicorn worker gets its own thread after fork
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._refresh()
+        threading.Thread(target=self._run, name="sse-version-watcher", daemon=True).start()
+
+    def _refresh(self) -> None:
+        version = self.session.version
+        if version != self._version:
+            fields = self.session.store.get_many(["questions", "is_collecting", "generated_report"])
+            self._snapshot = {
+                "questions": fields.get("questions", []),
+                "is_collecting": fields.get("is_collecting", True),
+                "report_ready": bool(fields.get("generated_report")),
+                "response_count": self.session.store.feedback_count(),
+            }
+            self._version = version
+            self._cond.notify_all()
+            callbacks, self._callbacks = self._callbacks, []
+            for callback in callbacks:
+                callback()
+
+    def close(self) -> None:
+        """Stop polling; streams still open keep their last snapshot until they time out."""
+        self._closed = True
+
+    def _run(self) -> None:
+        while not self._closed:
+            time.sleep(self.interval)
+            with self._cond:
+                self._refresh()
+
+    def wait(self, version: int | None, timeout: float) -> tuple[int, dict[str, Any]]:
+        """Block until the version differs from `version` or `timeout` passes.
+
+        Returns the current version and field snapshot.
+        """
+        self._ensure_running()
+        with self._cond:
+            self._cond.wait_for(lambda: self._version != version, timeout)
+            return self._version, self._snapshot
+
+    async def wait_async(self, version: int | None, timeout: float) -> tuple[int, dict[str, Any]]:
+        """Like `wait()`, but awaits on the running event loop instead of holding a thread."""
+        self._ensure_running()
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+
+        def notify() -> None:
+            loop.call_soon_threadsafe(changed.set)
+
+        with self._cond:
+            if self._version != version:
+                return self._version, self._snapshot
+            self._callbacks.append(notify)
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            with self._cond:
+                if notify in self._callbacks:
+                    self._callbacks.remove(notify)
+        with self._cond:
+            return self._version, self._snapshot
+
+
+def format_event(event: str, data: dict[str, Any], event_id: int | None = None) -> str:
+    """Format one SSE message."""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _changed_events(
+    before: dict[str, Any], after: dict[str, Any], admin: bool
+) -> list[tuple[str, dict[str, Any]]]:
+    events = []
+    if after["questions"] != before.get("questions"):
+        events.append(("questions", {"questions": after["questions"]}))
+    if not after["is_collecting"] and before.get("is_collecting", True):
+        events.append(("collection-closed", {}))
+    if admin:
+        if after["response_count"] != before.get("response_count"):
+            events.append(("responses", {"response_count": after["response_count"]}))
+        if after["report_ready"] and not before.get("report_ready"):
+            events.append(("report-ready", {}))
+    return events
+
+
+def stream_events(
+    watcher: VersionWatcher,
+    admin: bool = False,
+    heartbeat: float = 15.0,
+    max_seconds: float = 300.0,
+) -> Iterator[str]:
+    """Yield SSE messages for session changes.
+
+    The first messages describe the current state. Participants get
+    `questions` and `collection-closed`; admins also get `responses` and
+    `report-ready`. A comment line is sent every `heartbeat` seconds to keep
+    proxies from closing the connection. The stream ends after `max_seconds`
+    and the browser's EventSource reconnects on its own.
+    """
+    yield "retry: 3000\n\n"
+    deadline = time.monotonic() + max_seconds
+    version = None
+    seen: dict[str, Any] = {}
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        new_version, snapshot = watcher.wait(version, min(heartbeat, remaining))
+        yield from _messages(version, new_version, seen, snapshot, admin)
+        version, seen = new_version, snapshot
+
+
+async def stream_events_async(
+    watcher: VersionWatcher,
+    admin: bool = False,
+    heartbeat: float = 15.0,
+    max_seconds: float = 300.0,
+) -> AsyncIterator[str]:
+    """Async version of `stream_events()` for the ASGI app; same messages."""
+    yield "retry: 3000\n\n"
+    deadline = time.monotonic() + max_seconds
+    version = None
+    seen: dict[str, Any] = {}
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        new_version, snapshot = await watcher.wait_async(version, min(heartbeat, remaining))
+        for message in _messages(version, new_version, seen, snapshot, admin):
+            yield message
+        version, seen = new_version, snapshot
+
+
+def _messages(
+    version: int | None, new_version: int, seen: dict[str, Any], snapshot: dict[str, Any], admin: bool
+) -> list[str]:
+    """Messages for the fields that changed, or a keepalive comment if nothing did."""
+    if new_version == version:
+        return [": keepalive\n\n"]
+    return [format_event(event, data, new_version) for event, data in _changed_events(seen, snapshot, admin)]
@@ -0,0 +1,94 @@
+"""Closing collection when the session's expire time passes.
+
+`/api/expire-time` only records a deadline. An `ExpiryScheduler` thread
+checks it every `EXPIRY_CHECK_SECONDS` and closes collection once it has
+passed, which the pages hear about through `/api/events` like a manual
+close. With `AUTO_REPORT=1` it then starts a report job, so the report is
+ready (or under way) when the admin comes back.
+
+Closing flips `is_collecting` with `compare_and_set`, so when several
+workers share a store only the one that wins starts the report.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from event_server.models import SessionData
+from event_server.reports import ReportJobs
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiryScheduler:
+    """Closes collection at `expire_time`, and optionally starts the report.
+
+    Args:
+        session: Session to watch
+        jobs: Report jobs to submit to when `auto_report` is set
+        interval: Seconds between checks
+        auto_report: Start a report job when collection is closed by expiry
+    """
+
+    def __init__(
+        self,
+        session: SessionData,
+        jobs: ReportJobs,
+        interval: float = 5.0,
+        auto_report: bool = False,
+    ) -> None:
+        self.session = session
+        self.jobs = jobs
+        self.interval = interval
+        self.auto_report = auto_report
+        self._lock = threading.Lock()
+        self._pid: int | None = None
+        self._closed = False
+
+    @classmethod
+    def from_env(cls, session: SessionData, jobs: ReportJobs) -> "ExpiryScheduler":
+        return cls(
+            session,
+            jobs,
+            interval=float(os.environ.get("EXPIRY_CHECK_SECONDS", "5")),
+            auto_report=os.environ.get("AUTO_REPORT", "") not in ("", "0"),
+        )
+
+    def ensure_running(self) -> None:
+        # Started lazily so each gunicorn worker gets its own thread after fork
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, name="expiry-scheduler", daemon=True).start()
+
+    def step(self, now: datetime | None = None) -> bool:
+        """Close collection if the expire time has passed. True if this call closed it."""
+        store = self.session.store
+        fields = store.get_many(["is_collecting", "expire_time"])
+        if not fields.get("is_collecting", True) or not fields.get("expire_time"):
+            return False
+        if datetime.fromisoformat(fields["expire_time"]) > (now or datetime.now()):
+            return False
+        # An unset is_collecting reads as None, and means collecting
+        if store.compare_and_set("is_collecting", fields.get("is_collecting"), False) is None:
+            return False
+        logger.info("Session %s expired, collection closed", self.session.session_id)
+        if self.auto_report and store.feedback_count():
+            self.jobs.submit()
+        return True
+
+    def close(self) -> None:
+        """Stop checking after the current interval."""
+        self._closed = True
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            if self._closed:
+                return
+            try:
+                self.step()
+            except Exception:
+                logger.exception("Expiry check failed")
@@ -0,0 +1,188 @@
+"""Extractive, CPU-only feedback summarizer.
+
+Builds a report without any model: for each question, answers are weighted
+with TF-IDF, grouped into themes around their most distinctive keywords,
+and each theme is shown with its share of answers and the answer closest
+to the theme's centroid as a representative quote.
+
+Pure Python and linear in the number of words, so 100k answers take
+seconds. Output depends only on the input, which also makes it a
+deterministic stand-in for the LLM in load tests.
+"""
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from itertools import repeat
+from operator import mul
+from typing import Any
+
+WORD = re.compile(r"[a-z0-9][a-z0-9']*")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been
+before being below between both but by can could did do does doing down during each
+even few for from further get got had has have having he her here hers him his how i
+if in into is it its itself just let like lot me more most much my no nor not now of
+off on once only or other our ours out over own really same she should so some such
+than that the their them then there these they thing things think this those through
+to too under until up very was way we well were what when where which while who whom
+why will with would yes yet you your yours it's i'm don't didn't was overall honestly
+maybe perhaps today probably quite pretty
+""".split())
+
+# Words used by more than this share of a question's answers are too common to seed a theme
+MAX_SEED_SHARE = 0.5
+
+
+@dataclass
+class Theme:
+    keywords: list[str]
+    count: int
+    quote: str
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase words of three or more characters, without stopwords."""
+    return [
+        word for word in WORD.findall(text.lower())
+        if len(word) > 2 and word not in STOPWORDS
+    ]
+
+
+def _vectors(answers: list[str]) -> tuple[list[dict[str, float]], dict[str, float]]:
+    """L2-normalized TF-IDF vectors per answer, and the IDF table."""
+    tokens = [Counter(tokenize(answer)) for answer in answers]
+    df = Counter(word for counts in tokens for word in counts)
+    n = len(answers)
+    idf = {word: math.log((1 + n) / (1 + count)) + 1 for word, count in df.items()}
+    vectors = []
+    for counts in tokens:
+        vector = {word: tf * idf[word] for word, tf in counts.items()}
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        vectors.append({word: w / norm for word, w in vector.items()})
+    return vectors, idf
+
+
+def question_themes(answers: list[str], max_themes: int = 5, iterations: int = 1) -> list[Theme]:
+    """Group answers into at most `max_themes` themes, largest first.
+
+    Seeds are the keywords with the most total TF-IDF weight among words used
+    by at least two answers and at most `MAX_SEED_SHARE` of them, skipping
+    words mostly used alongside an earlier seed. Each answer
+    joins the seed it weighs highest, then `iterations` rounds of spherical
+    k-means refine the groups. Answers with no words in common with any
+    theme are left out.
+    """
+    vectors, _ = _vectors(answers)
+    weight: dict[str, float] = {}
+    used: Counter[str] = Counter()
+    for vector in vectors:
+        used.update(vector.keys())
+        for word, w in vector.items():
+            weight[word] = weight.get(word, 0.0) + w
+    max_used = max(2, len(answers) * MAX_SEED_SHARE)
+    ranked = sorted(weight, key=lambda word: (-weight[word], word))
+    candidates = [word for word in ranked if 1 < used[word] <= max_used][:max_themes * 10]
+    seeds = _distinct_seeds(vectors, candidates, max_themes)
+    if not seeds:
+        return []
+
+    # A one-word centroid's dot product is just that word's weight
+    assignment = [_nearest_seed(vector, seeds) for vector in vectors]
+    centroids = _centroids(vectors, assignment, len(seeds))
+    for _ in range(iterations):
+        assignment = [_nearest(vector, centroids) for vector in vectors]
+        centroids = _centroids(vectors, assignment, len(centroids))
+
+    themes = []
+    for k, centroid in enumerate(centroids):
+        members = [i for i, a in enumerate(assignment) if a == k]
+        if not members:
+            continue
+        best = max(members, key=lambda i: (_dot(vectors[i], centroid), -i))
+        keywords = sorted(centroid, key=lambda word: (-centroid[word], word))[:3]
+        themes.append(Theme(keywords, len(members), answers[best].strip()))
+    themes.sort(key=lambda theme: -theme.count)
+    return themes
+
+
+def _distinct_seeds(vectors: list[dict[str, float]], candidates: list[str], limit: int) -> list[str]:
+    """Pick up to `limit` candidates, skipping any whose answers are mostly covered already."""
+    postings: dict[str, set[int]] = {word: set() for word in candidates}
+    for i, vector in enumerate(vectors):
+        for word in vector:
+            if word in postings:
+                postings[word].add(i)
+    seeds: list[str] = []
+    covered: set[int] = set()
+    for word in candidates:
+        docs = postings[word]
+        if len(docs & covered) * 2 > len(docs):
+            continue
+        seeds.append(word)
+        covered |= docs
+        if len(seeds) == limit:
+            break
+    return seeds
+
+
+def _dot(vector: dict[str, float], centroid: dict[str, float]) -> float:
+    # map() keeps the loop in C; this is the hot path for large sessions
+    return sum(map(mul, vector.values(), map(centroid.get, vector, repeat(0.0))))
+
+
+def _nearest_seed(vector: dict[str, float], seeds: list[str]) -> int:
+    best, best_score = -1, 0.0
+    for k, seed in enumerate(seeds):
+        score = vector.get(seed, 0.0)
+        if score > best_score:
+            best, best_score = k, score
+    return best
+
+
+def _nearest(vector: dict[str, float], centroids: list[dict[str, float]]) -> int:
+    best, best_score = -1, 0.0
+    for k, centroid in enumerate(centroids):
+        score = _dot(vector, centroid)
+        if score > best_score:
+            best, best_score = k, score
+    return best
+
+
+def _centroids(vectors: list[dict[str, float]], assignment: list[int], k: int) -> list[dict[str, float]]:
+    sums: list[dict[str, float]] = [{} for _ in range(k)]
+    for vector, a in zip(vectors, assignment):
+        if a >= 0:
+            total = sums[a]
+            for word, w in vector.items():
+                total[word] = total.get(word, 0.0) + w
+    centroids = []
+    for total in sums:
+        norm = math.sqrt(sum(w * w for w in total.values())) or 1.0
+        centroids.append({word: w / norm for word, w in total.items()})
+    return centroids
+
+
+def summarize(feedback: list[dict[str, Any]], max_themes: int = 5) -> str:
+    """Build a plain-text report of themes and representative quotes per question."""
+    by_question: dict[str, list[str]] = {}
+    for item in feedback:
+        by_question.setdefault(item["question"], []).append(item["answer"])
+
+    lines = [
+        f"Summary of {len(feedback)} answers to {len(by_question)} question(s). "
+        "Themes and quotes were selected automatically from the answers; no AI model was used."
+    ]
+    for question, answers in by_question.items():
+        lines += ["", f"## {question} ({len(answers)} answers)"]
+        themes = question_themes(answers, max_themes)
+        if not themes:
+            lines += [f'- "{answer.strip()}"' for answer in answers[:max_themes]]
+            continue
+        for theme in themes:
+            share = theme.count / len(answers)
+            lines.append(
+                f"- {', '.join(theme.keywords)} ({theme.count} answers, {share:.0%}): \"{theme.quote}\""
+            )
+    return "\n".join(lines)
@@ -0,0 +1,133 @@
+"""Compact columnar storage for feedback items.
+
+A list of dicts repeats the question text, the key names and an ISO
+timestamp string for every answer. `FeedbackLog` stores each question once
+in a table, timestamps as an array of epoch floats and answers in one
+append-only UTF-8 buffer, and rebuilds the dict shape only when asked.
+"""
+from array import array
+from datetime import datetime
+from typing import Any, Iterator
+
+
+class FeedbackRecord:
+    """Read-only view of one item in a `FeedbackLog`."""
+
+    __slots__ = ("_log", "_index")
+
+    def __init__(self, log: "FeedbackLog", index: int) -> None:
+        self._log = log
+        self._index = index
+
+    @property
+    def question(self) -> str:
+        return self._log._questions[self._log._question_ids[self._index]]
+
+    @property
+    def answer(self) -> str:
+        return self._log._answer(self._index)
+
+    @property
+    def timestamp(self) -> float:
+        """Submission time as seconds since the epoch."""
+        return self._log._timestamps[self._index]
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the item in the `{"question", "answer", "timestamp"}` shape."""
+        return {
+            "question": self.question,
+            "answer": self.answer,
+            "timestamp": datetime.fromtimestamp(self.timestamp).isoformat(),
+        }
+
+    def __repr__(self) -> str:
+        return f"FeedbackRecord({self.question!r}, {self.answer!r}, {self.timestamp})"
+
+
+class FeedbackLog:
+    """Append-only columnar feedback storage. Not thread-safe; callers lock."""
+
+    def __init__(self) -> None:
+        self._questions: list[str] = []
+        self._question_index: dict[str, int] = {}
+        self._question_ids = array("I")
+        self._timestamps = array("d")
+        self._answers = bytearray()
+        self._answer_ends = array("Q")
+        # Items from one submission share a timestamp string; parse it once
+        self._last_iso: str | None = None
+        self._last_epoch = 0.0
+
+    def __len__(self) -> int:
+        return len(self._timestamps)
+
+    def __getitem__(self, index: int) -> FeedbackRecord:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("feedback index out of range")
+        return FeedbackRecord(self, index)
+
+    def __iter__(self) -> Iterator[FeedbackRecord]:
+        return (FeedbackRecord(self, i) for i in range(len(self)))
+
+    def _intern(self, question: str) -> int:
+        question_id = self._question_index.get(question)
+        if question_id is None:
+            question_id = len(self._questions)
+            self._questions.append(question)
+            self._question_index[question] = question_id
+        return question_id
+
+    def _epoch(self, iso: str) -> float:
+        if iso != self._last_iso:
+            self._last_iso = iso
+            self._last_epoch = datetime.fromisoformat(iso).timestamp()
+        return self._last_epoch
+
+    def _answer(self, index: int) -> str:
+        start = self._answer_ends[index - 1] if index else 0
+        return self._answers[start:self._answer_ends[index]].decode()
+
+    def append(self, question: str, answer: str, timestamp: float) -> None:
+        """Append one item. `timestamp` is seconds since the epoch."""
+        self._answers += answer.encode()
+        self._answer_ends.append(len(self._answers))
+        self._question_ids.append(self._intern(question))
+        # Length is taken from timestamps, so append it last for lock-free readers
+        self._timestamps.append(timestamp)
+
+    def extend(self, items: list[dict[str, Any]]) -> None:
+        """Append items in the dict shape, with ISO timestamps."""
+        for item in items:
+            self.append(item["question"], item["answer"], self._epoch(item["timestamp"]))
+
+    def to_dicts(self, start: int = 0) -> list[dict[str, Any]]:
+        """Return items from `start` onwards in the dict shape."""
+        questions = self._questions
+        question_ids = self._question_ids
+        timestamps = self._timestamps
+        answers = self._answers
+        ends = self._answer_ends
+        if start >= len(timestamps):
+            return []
+        iso_cache: dict[float, str] = {}
+        result = []
+        begin = ends[start - 1] if start else 0
+        for i in range(start, len(timestamps)):
+            end = ends[i]
+            timestamp = timestamps[i]
+            iso = iso_cache.get(timestamp)
+            if iso is None:
+                iso = iso_cache[timestamp] = datetime.fromtimestamp(timestamp).isoformat()
+            result.append({
+                "question": questions[question_ids[i]],
+                "answer": answers[begin:end].decode(),
+                "timestamp": iso,
+            })
+            begin = end
+        return result
+
+    def clear(self) -> None:
+        """Remove all items and interned questions."""
+        self.__init__()
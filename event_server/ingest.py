@@ -0,0 +1,222 @@
+"""Batched feedback ingestion.
+
+`submit_feedback()` validates a request, stamps it once and hands it to an
+`IngestQueue`. A flusher thread group-commits queued submissions into the
+session store, so a room pressing Export at once costs a few store
+transactions instead of one per request. Each request waits until its own
+items are committed, so a success response means the feedback is stored.
+The ASGI app awaits `submit_async()` instead, which holds no thread while
+waiting.
+"""
+import asyncio
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable
+
+from event_server.metrics import metrics
+from event_server.models import SessionData
+
+
+class SubmissionError(ValueError):
+    """A submission was malformed or over the per-request limits."""
+
+    def __init__(self, message: str, status: int = 400) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class QueueFull(Exception):
+    """The ingest queue is at capacity; the client should retry later."""
+
+
+def parse_submission(
+    data: Any, questions: list[str], max_items: int
+) -> list[dict[str, Any]]:
+    """Validate a submit-feedback body and return feedback records.
+
+    Accepts `{"items": [{"question": "Q", "answer": "A"}, ...]}` or the older
+    `{"answers": ["A1", ...]}`, which is paired with `questions`. Empty
+    answers are skipped. All records share one timestamp.
+
+    Raises:
+        SubmissionError: If the body is malformed or has too many items
+    """
+    if not isinstance(data, dict):
+        raise SubmissionError("Request body must be a JSON object")
+
+    if "items" in data:
+        items = data["items"]
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise SubmissionError("'items' must be a list of objects")
+        pairs = [(item.get("question", ""), item.get("answer")) for item in items]
+    else:
+        answers = data.get("answers", [])
+        if not isinstance(answers, list):
+            raise SubmissionError("'answers' must be a list")
+        pairs = [(question, answer) for question, answer in zip(questions, answers) if question]
+
+    if len(pairs) > max_items:
+        raise SubmissionError(f"Too many items (limit {max_items})", status=413)
+    for question, answer in pairs:
+        if not isinstance(question, str) or not isinstance(answer, (str, type(None))):
+            raise SubmissionError("Questions and answers must be strings")
+
+    timestamp = datetime.now().isoformat()
+    return [
+        {"question": question, "answer": answer, "timestamp": timestamp}
+        for question, answer in pairs
+        if answer
+    ]
+
+
+@dataclass
+class _Submission:
+    records: list[dict[str, Any]]
+    done: threading.Event = field(default_factory=threading.Event)
+    error: Exception | None = None
+    # Called by the flusher after `done` is set
+    on_done: Callable[[], None] | None = None
+
+
+class IngestQueue:
+    """Bounded queue with a group-commit flusher in front of a session store.
+
+    Args:
+        session: Session whose store receives the feedback
+        batch_size: Commit as soon as this many items are waiting
+        max_delay: Longest a submission waits for others to join its batch (seconds)
+        max_pending: Items allowed in the queue before `submit` raises `QueueFull`
+        commit_timeout: Longest `submit` waits for its batch to commit (seconds)
+    """
+
+    def __init__(
+        self,
+        session: SessionData,
+        batch_size: int = 256,
+        max_delay: float = 0.01,
+        max_pending: int = 10000,
+        commit_timeout: float = 10.0,
+    ) -> None:
+        self.session = session
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.commit_timeout = commit_timeout
+        self._queue: queue.Queue[_Submission] = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._pid: int | None = None
+        self._closed = False
+
+    @classmethod
+    def from_env(cls, session: SessionData) -> "IngestQueue":
+        """Create a queue configured by INGEST_* environment variables."""
+        return cls(
+            session,
+            batch_size=int(os.environ.get("INGEST_BATCH_SIZE", "256")),
+            max_delay=int(os.environ.get("INGEST_MAX_DELAY_MS", "10")) / 1000,
+            max_pending=int(os.environ.get("INGEST_MAX_PENDING", "10000")),
+        )
+
+    @property
+    def pending(self) -> int:
+        """Items queued but not yet committed."""
+        return self._pending
+
+    def submit(self, records: list[dict[str, Any]]) -> bool:
+        """Queue records and wait for them to be committed.
+
+        Returns:
+            True once committed, False if still queued after `commit_timeout`
+
+        Raises:
+            QueueFull: If accepting the records would exceed `max_pending`
+            Exception: Whatever the store raised while committing the batch
+        """
+        if not records:
+            return True
+        submission = self._enqueue(_Submission(records))
+        if not submission.done.wait(self.commit_timeout):
+            return False
+        if submission.error:
+            raise submission.error
+        return True
+
+    async def submit_async(self, records: list[dict[str, Any]]) -> bool:
+        """Like `submit`, but awaits the commit on the running event loop."""
+        if not records:
+            return True
+        loop = asyncio.get_running_loop()
+        committed = asyncio.Event()
+        submission = self._enqueue(
+            _Submission(records, on_done=lambda: loop.call_soon_threadsafe(committed.set))
+        )
+        try:
+            await asyncio.wait_for(committed.wait(), self.commit_timeout)
+        except asyncio.TimeoutError:
+            return False
+        if submission.error:
+            raise submission.error
+        return True
+
+    def close(self) -> None:
+        """Stop the flusher once everything queued so far is committed."""
+        self._closed = True
+        # Wakes the flusher if it is waiting for a first submission
+        self._queue.put(_Submission([]))
+
+    def _enqueue(self, submission: _Submission) -> _Submission:
+        self._ensure_running()
+        count = len(submission.records)
+        with self._lock:
+            if self._pending + count > self.max_pending:
+                raise QueueFull(f"{self._pending} items already waiting")
+            self._pending += count
+        self._queue.put(submission)
+        return submission
+
+    def _ensure_running(self) -> None:
+        # Started lazily so each gunicorn worker gets its own flusher after fork
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, name="ingest-flusher", daemon=True).start()
+
+    def _next_batch(self) -> list[_Submission]:
+        batch = [self._queue.get()]
+        count = len(batch[0].records)
+        deadline = time.monotonic() + self.max_delay
+        while count < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                submission = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(submission)
+            count += len(submission.records)
+        return batch
+
+    def _run(self) -> None:
+        while not (self._closed and self._queue.empty()):
+            batch = self._next_batch()
+            records = [record for submission in batch for record in submission.records]
+            try:
+                self.session.store.append_feedback(records)
+            except Exception as e:
+                for submission in batch:
+                    submission.error = e
+            else:
+                metrics.inc("event_server_feedback_ingested_total", value=len(records))
+            with self._lock:
+                self._pending -= len(records)
+            for submission in batch:
+                submission.done.set()
+                if submission.on_done:
+                    submission.on_done()
@@ -1,49 +1,454 @@
-"""LLM integration for generating reports from participant feedback."""
+"""LLM integration for generating reports from participant feedback.
+
+Feedback that fits in one prompt is summarized with a single call. Larger
+sessions are summarized map-reduce style: feedback is split into chunks of
+at most `chunk_tokens`, each chunk is summarized concurrently, and the
+partial summaries are combined into the final report.
+
+A `RollingSummarizer` (event_server/rolling.py) can fold feedback into
+per-question summaries with `fold_feedback()` while collection is open.
+Passing that state as `rolling` leaves only the newest answers and one
+synthesis call for the end.
+
+Reports and chunk summaries are cached under a hash of the model, prompt
+templates and feedback they were made from (see `event_server/cache.py`).
+Chunks are cut from the start of the feedback, so when answers are added
+only the last chunk changes and the others are served from the cache.
+
+With `REPORT_DEDUP_THRESHOLD` set, near-duplicate answers to a question are
+merged within each chunk (`event_server/dedup.py`) and the model is told how
+many participants gave each one. Merging after chunking keeps a full chunk's
+prompt, and so its cached summary, unchanged as answers arrive.
+
+Feedback text comes from `event_server/prompts.py`: answers grouped under
+their question, without timestamps. `REPORT_TOKEN_BUDGET` caps the feedback
+tokens sent per report by evenly sampling answers.
+"""
 import os
-from typing import Any
-from anthropic import Anthropic
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterator
+from event_server.cache import ReportCache, cache_key, create_cache
+from event_server.dedup import compress_feedback
+from event_server.llm_client import ResilientClient, get_client
+from event_server.metrics import metrics
+from event_server.prompts import (
+    estimate_tokens, format_answers, format_feedback, header_tokens, item_tokens, sample_feedback,
+    truncate,
+)
+
+MODEL = "claude-3-5-haiku-20241022"
+MAX_TOKENS = 2048
+
+NO_FEEDBACK_REPORT = "No feedback collected yet."
+
+# Feedback tokens per prompt before switching to map-reduce, and parallel chunk calls
+CHUNK_TOKENS = int(os.environ.get("REPORT_CHUNK_TOKENS", "60000"))
+CONCURRENCY = int(os.environ.get("REPORT_CONCURRENCY", "4"))
+# Estimated similarity above which answers to a question are merged; 0 disables
+DEDUP_THRESHOLD = float(os.environ.get("REPORT_DEDUP_THRESHOLD", "0"))
+# Estimated feedback tokens sent per report, across all chunks; 0 sends everything
+TOKEN_BUDGET = int(os.environ.get("REPORT_TOKEN_BUDGET", "0"))
+
+report_cache = create_cache(
+    os.environ.get("REPORT_CACHE", "memory"),
+    ttl=float(os.environ.get("REPORT_CACHE_TTL", "3600")),
+)
+# Exported on /metrics as event_server_report_cache_{hits,misses,evictions}_total
+metrics.add_counters(lambda: {
+    f"event_server_report_cache_{name}_total": value for name, value in report_cache.stats.to_dict().items()
+})
+
+REPORT_PROMPT = """You are analyzing participant feedback from a transparency session. Below is the collected feedback, with answers listed under their question:
+
+{feedback_text}
+
+Please provide a concise summary and analysis of the feedback, highlighting key themes, insights, and any notable patterns or concerns."""
+
+# Does not mention the number of parts, so a chunk's prompt (and cache key)
+# stays the same when later answers add a chunk
+CHUNK_PROMPT = """You are analyzing participant feedback from a transparency session. The feedback is too long to read at once, so it has been split into parts. Below is part {part}, with answers listed under their question:
+
+{feedback_text}
+
+Summarize this part for a later step that will combine all parts into one report. List the themes, insights, concerns and notable quotes, and say roughly how many participants raised each point. Do not write an introduction or conclusion."""
+
+REDUCE_PROMPT = """You are analyzing participant feedback from a transparency session. The feedback was summarized in {total} parts:
+
+{summaries_text}
+
+Please provide a concise summary and analysis of the feedback as a whole, highlighting key themes, insights, and any notable patterns or concerns."""
+
+FOLD_PROMPT = """You are keeping a running summary of participant feedback from a transparency session while it is still being collected. The question was:
+
+{question}
+
+Summary of the answers so far:
+{summary}
+
+New answers:
+{answers_text}
+
+Rewrite the summary so it also covers the new answers. Keep the themes, insights, concerns and notable quotes, and say roughly how many participants raised each point. Reply with the summary only."""
+
+ROLLING_REPORT_PROMPT = """You are analyzing participant feedback from a transparency session. The answers to each question were summarized as they arrived:
+
+{summaries_text}
+
+Please provide a concise summary and analysis of the feedback, highlighting key themes, insights, and any notable patterns or concerns."""
+
+NO_SUMMARY_YET = "No answers yet."
+
+
+def _api_key() -> str:
+    api_key = os.environ.get("ANTHROPIC_API_KEY")
+    if not api_key:
+        raise ValueError("ANTHROPIC_API_KEY environment variable not set")
+    return api_key
+
+
+def build_prompt(feedback: list[dict[str, Any]], totals: dict[str, int] | None = None) -> str:
+    """Format feedback items into the report prompt."""
+    return REPORT_PROMPT.format(feedback_text=format_feedback(feedback, totals))
+
+
+def build_chunk_prompt(
+    feedback: list[dict[str, Any]], part: int, totals: dict[str, int] | None = None
+) -> str:
+    """Prompt for the map step: summarize one chunk of a large session."""
+    return CHUNK_PROMPT.format(part=part, feedback_text=format_feedback(feedback, totals))
+
+
+def build_reduce_prompt(summaries: list[str]) -> str:
+    """Prompt for the reduce step: write the report from partial summaries."""
+    summaries_text = "\n\n".join(
+        f"Summary of part {i} of {len(summaries)}:\n{summary}"
+        for i, summary in enumerate(summaries, 1)
+    )
+    return REDUCE_PROMPT.format(total=len(summaries), summaries_text=summaries_text)
+
+
+def build_fold_prompt(question: str, summary: str, feedback: list[dict[str, Any]]) -> str:
+    """Prompt that folds new answers to one question into its running summary."""
+    return FOLD_PROMPT.format(question=question, summary=summary, answers_text=format_answers(feedback))
+
+
+def build_rolling_prompt(summaries: dict[str, str]) -> str:
+    """Prompt for the final report from per-question running summaries."""
+    summaries_text = "\n\n".join(
+        f"Question: {question}\nSummary:\n{summary}" for question, summary in summaries.items()
+    )
+    return ROLLING_REPORT_PROMPT.format(summaries_text=summaries_text)
+
+
+def normalize_feedback(feedback: list[dict[str, Any]]) -> list[list[str]]:
+    """Reduce feedback to exactly the values that reach the prompt, in order."""
+    return [[item["question"], item["answer"]] for item in feedback]
+
+
+def report_key(feedback: list[dict[str, Any]], chunk_tokens: int | None = None) -> str:
+    """Cache key of the final report for `feedback`.
+
+    Depends on every template and the chunk budget, since a large session's
+    report is built from all of them.
+    """
+    return cache_key(
+        "report", MODEL, MAX_TOKENS, chunk_tokens or CHUNK_TOKENS, DEDUP_THRESHOLD, TOKEN_BUDGET,
+        REPORT_PROMPT, CHUNK_PROMPT, REDUCE_PROMPT, FOLD_PROMPT, ROLLING_REPORT_PROMPT,
+        normalize_feedback(feedback),
+    )
+
+
+def cached_report(feedback: list[dict[str, Any]], cache: ReportCache | None = None) -> str | None:
+    """Return the cached report for exactly this feedback, without calling the LLM."""
+    if not feedback:
+        return None
+    return (report_cache if cache is None else cache).get(report_key(feedback))
+
+
+def deduplicate(feedback: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Merge near-duplicate answers if REPORT_DEDUP_THRESHOLD is set, else return `feedback`."""
+    if DEDUP_THRESHOLD <= 0 or len(feedback) < 2:
+        return feedback
+    return compress_feedback(feedback, DEDUP_THRESHOLD)
 
 
-def generate_report(feedback: list[dict[str, Any]]) -> str:
+def chunk_feedback(feedback: list[dict[str, Any]], chunk_tokens: int) -> list[list[dict[str, Any]]]:
+    """Split feedback, in order, into chunks of at most `chunk_tokens` estimated tokens.
+
+    Counts each question header once per chunk, as `format_feedback()` writes
+    it. An answer too long for a chunk of its own is truncated.
+    """
+    chunks: list[list[dict[str, Any]]] = []
+    current: list[dict[str, Any]] = []
+    questions: set[str] = set()
+    used = 0
+    for item in feedback:
+        header = header_tokens(item["question"])
+        tokens = item_tokens(item)
+        if header + tokens > chunk_tokens:
+            item = dict(item, answer=truncate(item["answer"], chunk_tokens - header - 2))
+            tokens = item_tokens(item)
+        if item["question"] not in questions:
+            tokens += header
+        if current and used + tokens > chunk_tokens:
+            chunks.append(current)
+            current, questions, used = [], set(), 0
+            tokens = header + item_tokens(item)
+        current.append(item)
+        questions.add(item["question"])
+        used += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _complete(client: ResilientClient, prompt: str, cache: ReportCache | None = None) -> str:
+    """One LLM call. Intermediate summaries pass `cache`; final reports are cached by the caller."""
+    key = cache_key("completion", MODEL, MAX_TOKENS, prompt)
+    text = cache.get(key) if cache is not None else None
+    if text is None:
+        message = client.messages.create(
+            model=MODEL,
+            max_tokens=MAX_TOKENS,
+            messages=[
+                {"role": "user", "content": prompt}
+            ]
+        )
+        text = message.content[0].text
+        if cache is not None:
+            cache.set(key, text)
+    return text
+
+
+def _complete_all(client: ResilientClient, prompts: list[str], concurrency: int, cache: ReportCache) -> list[str]:
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(prompts)))) as pool:
+        return list(pool.map(lambda prompt: _complete(client, prompt, cache), prompts))
+
+
+def _final_prompt(
+    client: ResilientClient,
+    feedback: list[dict[str, Any]],
+    chunk_tokens: int,
+    concurrency: int,
+    cache: ReportCache,
+) -> str:
+    """Run the map step if needed and return the prompt for the final call."""
+    feedback, totals = _within_budget(feedback)
+    chunks = [deduplicate(chunk) for chunk in chunk_feedback(feedback, chunk_tokens)]
+    if len(chunks) == 1:
+        return build_prompt(chunks[0], totals)
+
+    prompts = [build_chunk_prompt(chunk, i, totals) for i, chunk in enumerate(chunks, 1)]
+    summaries = _complete_all(client, prompts, concurrency, cache)
+    # Very large sessions: combine summaries in groups until they fit one prompt
+    while len(summaries) > 1 and estimate_tokens("\n\n".join(summaries)) > chunk_tokens:
+        groups = _group(summaries, chunk_tokens)
+        if len(groups) == len(summaries):
+            break
+        summaries = _complete_all(client, [build_reduce_prompt(g) for g in groups], concurrency, cache)
+    return build_reduce_prompt(summaries)
+
+
+def _within_budget(feedback: list[dict[str, Any]]) -> tuple[list[dict[str, Any]], dict[str, int] | None]:
+    """Sample feedback down to REPORT_TOKEN_BUDGET; also return answers per question if sampled."""
+    if TOKEN_BUDGET <= 0:
+        return feedback, None
+    sampled = sample_feedback(feedback, TOKEN_BUDGET)
+    if sampled is feedback:
+        return feedback, None
+    totals: dict[str, int] = {}
+    for item in feedback:
+        totals[item["question"]] = totals.get(item["question"], 0) + item.get("count", 1)
+    return sampled, totals
+
+
+def _group(summaries: list[str], chunk_tokens: int) -> list[list[str]]:
+    groups: list[list[str]] = []
+    used = 0
+    for summary in summaries:
+        tokens = estimate_tokens(summary)
+        if groups and used + tokens <= chunk_tokens:
+            groups[-1].append(summary)
+            used += tokens
+        else:
+            groups.append([summary])
+            used = tokens
+    return groups
+
+
+def fold_feedback(
+    summaries: dict[str, str],
+    feedback: list[dict[str, Any]],
+    client: ResilientClient | None = None,
+    chunk_tokens: int | None = None,
+    concurrency: int | None = None,
+    cache: ReportCache | None = None,
+) -> dict[str, str]:
+    """Fold new feedback into running per-question summaries.
+
+    Questions are folded concurrently. Answers to one question that exceed
+    `chunk_tokens` are folded in several steps, oldest first.
+
+    Returns:
+        A new dict with an updated summary for every question in `feedback`
+
+    Raises:
+        ValueError: If no client is given and ANTHROPIC_API_KEY is not set
+    """
+    if not feedback:
+        return dict(summaries)
+    if client is None:
+        client = get_client(_api_key())
+    cache = report_cache if cache is None else cache
+    chunk_tokens = chunk_tokens or CHUNK_TOKENS
+
+    by_question: dict[str, list[dict[str, Any]]] = {}
+    for item in feedback:
+        by_question.setdefault(item["question"], []).append(item)
+
+    def fold(question: str) -> str:
+        summary = summaries.get(question, NO_SUMMARY_YET)
+        for chunk in chunk_feedback(by_question[question], chunk_tokens):
+            summary = _complete(client, build_fold_prompt(question, summary, deduplicate(chunk)), cache)
+        return summary
+
+    workers = max(1, min(concurrency or CONCURRENCY, len(by_question)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        folded = dict(zip(by_question, pool.map(fold, by_question)))
+    return {**summaries, **folded}
+
+
+def _report_prompt(
+    client: ResilientClient,
+    feedback: list[dict[str, Any]],
+    chunk_tokens: int,
+    concurrency: int,
+    cache: ReportCache,
+    rolling: dict[str, Any] | None,
+) -> str:
+    # Rolling state only applies if it covers a prefix of this feedback
+    if rolling and 0 < rolling["feedback_count"] <= len(feedback):
+        summaries = fold_feedback(
+            rolling["summaries"], feedback[rolling["feedback_count"]:],
+            client, chunk_tokens, concurrency, cache,
+        )
+        return build_rolling_prompt(summaries)
+    return _final_prompt(client, feedback, chunk_tokens, concurrency, cache)
+
+
+def generate_report(
+    feedback: list[dict[str, Any]],
+    client: ResilientClient | None = None,
+    chunk_tokens: int | None = None,
+    concurrency: int | None = None,
+    cache: ReportCache | None = None,
+    rolling: dict[str, Any] | None = None,
+) -> str:
     """Generate a report from participant feedback using Claude Haiku 4.5.
-    
+
     Args:
         feedback: List of feedback items, each with 'question', 'answer', 'timestamp'
-        
+        client: Client to use; by default the shared one for ANTHROPIC_API_KEY
+        chunk_tokens: Feedback budget per prompt (default: REPORT_CHUNK_TOKENS)
+        concurrency: Parallel chunk summaries (default: REPORT_CONCURRENCY)
+        cache: Completion cache (default: the module's `report_cache`)
+        rolling: `{"feedback_count", "summaries"}` from a `RollingSummarizer`;
+            only feedback after `feedback_count` is then read individually
+
     Returns:
         Generated report text from the LLM
-        
+
     Raises:
         ValueError: If ANTHROPIC_API_KEY is not set
         Exception: If API call fails
     """
-    api_key = os.environ.get("ANTHROPIC_API_KEY")
-    if not api_key:
-        raise ValueError("ANTHROPIC_API_KEY environment variable not set")
-    
+    api_key = _api_key() if client is None else None
+
     if not feedback:
-        return "No feedback collected yet."
-    
-    # Format feedback for the prompt
-    feedback_text = "\n\n".join([
-        f"Q: {item['question']}\nA: {item['answer']}\nTimestamp: {item['timestamp']}"
-        for item in feedback
-    ])
-    
-    prompt = f"""You are analyzing participant feedback from a transparency session. Below is the collected feedback:
+        return NO_FEEDBACK_REPORT
 
-{feedback_text}
+    cache = report_cache if cache is None else cache
+    chunk_tokens = chunk_tokens or CHUNK_TOKENS
+    key = report_key(feedback, chunk_tokens)
+    report = cache.get(key)
+    if report is not None:
+        return report
 
-Please provide a concise summary and analysis of the feedback, highlighting key themes, insights, and any notable patterns or concerns."""
-    
-    client = Anthropic(api_key=api_key)
-    
-    message = client.messages.create(
-        model="claude-3-5-haiku-20241022",
-        max_tokens=2048,
-        messages=[
-            {"role": "user", "content": prompt}
-        ]
-    )
-    
-    return message.content[0].text
+    if client is None:
+        client = get_client(api_key)
+
+    prompt = _report_prompt(client, feedback, chunk_tokens, concurrency or CONCURRENCY, cache, rolling)
+    report = _complete(client, prompt)
+    cache.set(key, report)
+    return report
+
+
+def stream_report(
+    feedback: list[dict[str, Any]],
+    client: ResilientClient | None = None,
+    chunk_tokens: int | None = None,
+    concurrency: int | None = None,
+    cache: ReportCache | None = None,
+    rolling: dict[str, Any] | None = None,
+) -> Iterator[str]:
+    """Generate a report like `generate_report`, yielding text as it is produced.
+
+    The API key is checked before this returns, so configuration errors are
+    raised here rather than partway through the stream. For large sessions
+    the chunk summaries are made first and only the final call is streamed.
+    A cached report is returned as a single chunk.
+
+    Args:
+        feedback: List of feedback items, each with 'question', 'answer', 'timestamp'
+        client: Client to use; by default the shared one for ANTHROPIC_API_KEY
+        chunk_tokens: Feedback budget per prompt (default: REPORT_CHUNK_TOKENS)
+        concurrency: Parallel chunk summaries (default: REPORT_CONCURRENCY)
+        cache: Completion cache (default: the module's `report_cache`)
+        rolling: `{"feedback_count", "summaries"}` from a `RollingSummarizer`;
+            only feedback after `feedback_count` is then read individually
+
+    Returns:
+        Iterator over chunks of report text
+
+    Raises:
+        ValueError: If ANTHROPIC_API_KEY is not set
+    """
+    api_key = _api_key() if client is None else None
+
+    if not feedback:
+        return iter([NO_FEEDBACK_REPORT])
+
+    cache = report_cache if cache is None else cache
+    chunk_tokens = chunk_tokens or CHUNK_TOKENS
+    key = report_key(feedback, chunk_tokens)
+    report = cache.get(key)
+    if report is not None:
+        return iter([report])
+
+    if client is None:
+        client = get_client(api_key)
+
+    return _stream_text(client, feedback, key, chunk_tokens, concurrency or CONCURRENCY, cache, rolling)
+
+
+def _stream_text(
+    client: ResilientClient,
+    feedback: list[dict[str, Any]],
+    key: str,
+    chunk_tokens: int,
+    concurrency: int,
+    cache: ReportCache,
+    rolling: dict[str, Any] | None,
+) -> Iterator[str]:
+    prompt = _report_prompt(client, feedback, chunk_tokens, concurrency, cache, rolling)
+    parts = []
+    with client.messages.stream(
+        model=MODEL,
+        max_tokens=MAX_TOKENS,
+        messages=[{"role": "user", "content": prompt}],
+    ) as stream:
+        for text in stream.text_stream:
+            parts.append(text)
+            yield text
+    # Only a stream that ran to the end is cached
+    cache.set(key, "".join(parts))
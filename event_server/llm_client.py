@@ -0,0 +1,262 @@
+"""Shared, fault-tolerant Anthropic client.
+
+Creating an `Anthropic` per report means a new connection pool and TLS
+handshake every time. `get_client()` returns one client per process (and
+per API key), so connections are kept alive and reused.
+
+The client is wrapped in `ResilientClient`, which adds:
+
+- connect and read timeouts, so a hung upstream cannot hold a worker;
+- retries with jittered exponential backoff on 429, 5xx and connection
+  errors, honouring `Retry-After`;
+- a `CircuitBreaker` that fails fast with `CircuitOpen` after repeated
+  upstream failures, and lets one trial call through after a cool-down.
+
+The SDK's own retries are turned off so that only this layer retries.
+"""
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+import anthropic
+from anthropic import Anthropic
+
+from event_server.metrics import metrics
+from event_server.tracing import tracer
+
+
+class CircuitOpen(RuntimeError):
+    """The LLM upstream has been failing; calls are refused until it cools down."""
+
+
+class CircuitBreaker:
+    """Closed → open after `threshold` consecutive failures → half-open after `reset_after`.
+
+    While open every call fails immediately. Half-open lets a single call
+    through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, threshold: int = 5, reset_after: float = 30.0, clock: Callable[[], float] = time.monotonic) -> None:
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at >= self.reset_after:
+            return "half-open"
+        return "open"
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpen unless a call may go through now. True if it is the half-open trial."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return False
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            raise CircuitOpen("LLM service is unavailable, try again shortly")
+
+    def end_trial(self) -> None:
+        """Let another trial through, whether or not this one recorded an outcome."""
+        with self._lock:
+            self._trial = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = self.clock()
+            self._trial = False
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for rate limits, server errors and connection problems (including timeouts)."""
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, anthropic.APIConnectionError)
+
+
+def _retry_after(error: Exception) -> float | None:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class ResilientClient:
+    """Wraps an `Anthropic` client's `messages.create` and `messages.stream`.
+
+    Exposes the same `client.messages.create(...)` / `client.messages.stream(...)`
+    shape, so code written against the SDK works unchanged.
+    """
+
+    def __init__(
+        self,
+        client: Anthropic,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        breaker: CircuitBreaker | None = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.client = client
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.sleep = sleep
+        self.messages = _Messages(self)
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        """Seconds to wait before retry `attempt` (0-based): full jitter, or Retry-After."""
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """Run `fn` under the circuit breaker, retrying transient failures."""
+        attempt = 0
+        while True:
+            trial = self.breaker.before_call()
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_retryable(e):
+                    # The upstream answered; a 4xx says nothing about its health
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                self.sleep(self.backoff(attempt, e))
+                attempt += 1
+            else:
+                self.breaker.record_success()
+                return result
+            finally:
+                # A BaseException (gevent.Timeout, KeyboardInterrupt) records
+                # nothing; the trial must not stay taken, or the circuit never closes
+                if trial:
+                    self.breaker.end_trial()
+
+
+class _Messages:
+    def __init__(self, owner: ResilientClient) -> None:
+        self._owner = owner
+
+    def create(self, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            with tracer.span("llm"):
+                message = self._owner.call(lambda: self._owner.client.messages.create(**kwargs))
+        except Exception as e:
+            _record_call("create", started, error=e)
+            raise
+        _record_call("create", started, usage=message.usage)
+        return message
+
+    @contextmanager
+    def stream(self, **kwargs: Any) -> Iterator[Any]:
+        # Only opening the stream is retried; once text has been sent a retry
+        # would repeat it
+        manager = None
+        started = time.perf_counter()
+
+        def open_stream():
+            nonlocal manager
+            manager = self._owner.client.messages.stream(**kwargs)
+            return manager.__enter__()
+
+        try:
+            with tracer.span("llm"):
+                stream = self._owner.call(open_stream)
+        except Exception as e:
+            _record_call("stream", started, error=e)
+            raise
+        try:
+            yield stream
+        except BaseException as e:
+            _record_call("stream", started, error=e)
+            if not manager.__exit__(type(e), e, e.__traceback__):
+                raise
+        else:
+            manager.__exit__(None, None, None)
+            _record_call("stream", started, usage=_stream_usage(stream))
+
+
+def _record_call(kind: str, started: float, usage: Any = None, error: BaseException | None = None) -> None:
+    metrics.observe("event_server_llm_request_duration_seconds", time.perf_counter() - started, (kind,))
+    if error is not None:
+        metrics.inc("event_server_llm_errors_total", (kind, type(error).__name__))
+    if usage is not None:
+        metrics.inc("event_server_llm_tokens_total", ("input",), getattr(usage, "input_tokens", 0) or 0)
+        metrics.inc("event_server_llm_tokens_total", ("output",), getattr(usage, "output_tokens", 0) or 0)
+
+
+def _stream_usage(stream: Any) -> Any:
+    try:
+        return stream.current_message_snapshot.usage
+    except Exception:
+        return None
+
+
+_clients: dict[tuple[int, str, str | None], ResilientClient] = {}
+_clients_lock = threading.Lock()
+
+
+def create_client(api_key: str, base_url: str | None = None) -> ResilientClient:
+    """Build a new client with timeouts, retries and a breaker from the environment."""
+    timeout = anthropic.Timeout(
+        float(os.environ.get("LLM_READ_TIMEOUT", "60")),
+        connect=float(os.environ.get("LLM_CONNECT_TIMEOUT", "5")),
+    )
+    client = Anthropic(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+    return ResilientClient(
+        client,
+        max_retries=int(os.environ.get("LLM_MAX_RETRIES", "3")),
+        backoff_base=float(os.environ.get("LLM_BACKOFF_BASE", "0.5")),
+        backoff_max=float(os.environ.get("LLM_BACKOFF_MAX", "8")),
+        breaker=CircuitBreaker(
+            threshold=int(os.environ.get("LLM_BREAKER_THRESHOLD", "5")),
+            reset_after=float(os.environ.get("LLM_BREAKER_RESET_SECONDS", "30")),
+        ),
+    )
+
+
+def get_client(api_key: str, base_url: str | None = None) -> ResilientClient:
+    """Return this process's client for `api_key`, creating it on first use.
+
+    Keyed by pid too: a connection pool must not be shared across a fork.
+    """
+    key = (os.getpid(), api_key, base_url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = create_client(api_key, base_url)
+        return client
+
+
+def reset_clients() -> None:
+    """Forget all shared clients (for tests, or after changing settings)."""
+    with _clients_lock:
+        _clients.clear()
@@ -0,0 +1,251 @@
+"""Prometheus metrics for the event server, with no client library.
+
+Counters and histograms live in plain dicts behind one lock, so recording
+a request costs a dict lookup and a few additions. `/metrics` renders them
+in the Prometheus text format along with gauges read at scrape time
+(feedback count, process memory).
+
+gunicorn runs several workers, and a scrape lands on only one of them. With
+`METRICS_DIR` set (a tmpfs directory), a thread in every worker writes its
+numbers there once a second if they changed, and `/metrics` adds up all
+workers' files, so any scrape reports the whole container. Without it, each worker reports itself.
+"""
+import json
+import os
+import resource
+import threading
+import time
+from typing import Any, Callable
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# name: (type, help, label names, buckets)
+METRICS: dict[str, tuple[str, str, tuple[str, ...], tuple[float, ...]]] = {
+    "event_server_http_requests_total": (
+        "counter", "HTTP requests by route, method and status", ("route", "method", "status"), ()),
+    "event_server_http_request_duration_seconds": (
+        "histogram", "Time to build each response (to first byte for streams)", ("route",),
+        LATENCY_BUCKETS),
+    "event_server_state_payload_bytes": (
+        "histogram", "Body size of state responses", ("route",), BYTES_BUCKETS),
+    "event_server_feedback_ingested_total": (
+        "counter", "Feedback items committed to the store", (), ()),
+    "event_server_llm_request_duration_seconds": (
+        "histogram", "LLM calls, including retries", ("kind",), LLM_BUCKETS),
+    "event_server_llm_tokens_total": (
+        "counter", "LLM tokens used", ("type",), ()),
+    "event_server_llm_errors_total": (
+        "counter", "LLM calls that failed after retries", ("kind", "error"), ()),
+    "event_server_report_cache_hits_total": (
+        "counter", "Report and chunk summary cache lookups that found an entry", (), ()),
+    "event_server_report_cache_misses_total": (
+        "counter", "Report and chunk summary cache lookups that found nothing", (), ()),
+    "event_server_report_cache_evictions_total": (
+        "counter", "Report cache entries removed to stay within the size limit", (), ()),
+}
+
+
+class Metrics:
+    """Per-process counters and histograms, optionally shared through a directory.
+
+    Args:
+        directory: Where workers write their numbers for each other (None: this process only)
+        flush_interval: Seconds between a worker's writes to `directory`
+    """
+
+    def __init__(self, directory: str | None = None, flush_interval: float = 1.0) -> None:
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[tuple[str, ...], float]] = {}
+        # Per label set: a count per bucket (not cumulative), then sum, then count
+        self._histograms: dict[str, dict[tuple[str, ...], list[float]]] = {}
+        # Read at each snapshot: counters kept by other objects, such as cache stats
+        self._collectors: list[Callable[[], dict[str, float]]] = []
+        self._changes = 0
+        self._flushed_changes = 0
+        self._flush_lock = threading.Lock()
+        self._pid: int | None = None
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "Metrics":
+        return cls(os.environ.get("METRICS_DIR") or None)
+
+    def inc(self, name: str, labels: tuple[str, ...] = (), value: float = 1.0) -> None:
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0.0) + value
+            self._changes += 1
+
+    def add_counters(self, read: Callable[[], dict[str, float]]) -> None:
+        """Also report the unlabelled counters `read()` returns as {name: value}."""
+        self._collectors.append(read)
+
+    def observe(self, name: str, value: float, labels: tuple[str, ...] = ()) -> None:
+        buckets = METRICS[name][3]
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            counts = series.get(labels)
+            if counts is None:
+                counts = series[labels] = [0.0] * (len(buckets) + 3)
+            index = 0
+            while index < len(buckets) and value > buckets[index]:
+                index += 1
+            counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+            self._changes += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        """This process's numbers, JSON-serializable."""
+        with self._lock:
+            counters = {
+                name: [[list(labels), value] for labels, value in series.items()]
+                for name, series in self._counters.items()
+            }
+            histograms = {
+                name: [[list(labels), list(counts)] for labels, counts in series.items()]
+                for name, series in self._histograms.items()
+            }
+        for read in self._collectors:
+            for name, value in read().items():
+                counters.setdefault(name, []).append([[], value])
+        return {
+            "pid": os.getpid(),
+            "rss_bytes": rss_bytes(),
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+    def ensure_flushing(self) -> None:
+        """Start this worker's writer thread if `directory` is set and it is not running."""
+        if not self.directory or self._pid == os.getpid():
+            return
+        with self._lock:
+            # Started lazily so each gunicorn worker gets its own thread after fork
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, name="metrics-flusher", daemon=True).start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            if self._changes != self._flushed_changes:
+                self.flush()
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            self._flushed_changes = self._changes
+            snapshot = self.snapshot()
+            path = os.path.join(self.directory, f"worker-{snapshot['pid']}.json")
+            with open(path + ".tmp", "w") as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+            os.replace(path + ".tmp", path)
+
+    def collect(self) -> list[dict[str, Any]]:
+        """Snapshots of every worker (just this one without `directory`)."""
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def render(self, gauges: dict[str, tuple[str, float]] | None = None) -> str:
+        """All workers' metrics plus `gauges` ({name: (help, value)}) in the text format."""
+        snapshots = self.collect()
+        counters: dict[str, dict[tuple[str, ...], float]] = {}
+        histograms: dict[str, dict[tuple[str, ...], list[float]]] = {}
+        for snapshot in snapshots:
+            for name, series in snapshot["counters"].items():
+                merged = counters.setdefault(name, {})
+                for labels, value in series:
+                    merged[tuple(labels)] = merged.get(tuple(labels), 0.0) + value
+            for name, series in snapshot["histograms"].items():
+                merged_histograms = histograms.setdefault(name, {})
+                for labels, counts in series:
+                    current = merged_histograms.get(tuple(labels))
+                    merged_histograms[tuple(labels)] = (
+                        counts if current is None else [a + b for a, b in zip(current, counts)]
+                    )
+
+        # A dead worker's counters still count; its memory does not
+        live = [s for s in snapshots if _alive(s["pid"])]
+        gauges = {
+            **(gauges or {}),
+            "process_resident_memory_bytes": (
+                "Resident memory of the server's workers", sum(s["rss_bytes"] for s in live)
+            ),
+            "event_server_workers": ("Workers reporting metrics", len(live)),
+        }
+
+        lines = []
+        for name, (kind, help_text, label_names, buckets) in METRICS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            if kind == "counter":
+                for labels, value in sorted(counters.get(name, {}).items()):
+                    lines.append(f"{name}{_labels(label_names, labels)} {_number(value)}")
+                continue
+            for labels, counts in sorted(histograms.get(name, {}).items()):
+                cumulative = 0.0
+                for bound, count in zip([*buckets, "+Inf"], counts):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else _number(bound)
+                    bucket_labels = _labels((*label_names, "le"), (*labels, le))
+                    lines.append(f"{name}_bucket{bucket_labels} {_number(cumulative)}")
+                lines.append(f"{name}_sum{_labels(label_names, labels)} {_number(counts[-2])}")
+                lines.append(f"{name}_count{_labels(label_names, labels)} {_number(counts[-1])}")
+        for name, (help_text, value) in gauges.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def rss_bytes() -> int:
+    """Current resident memory of this process (peak RSS where /proc is missing)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = (f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# One per process; app.py, ingest.py and llm_client.py record into it
+metrics = Metrics.from_env()
@@ -3,38 +3,123 @@ from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Any
 
+from event_server.store import MemoryStore, SessionStore
+
+# Client-visible fields and their defaults, in the order to_dict() lists them
+STATE_FIELDS: dict[str, Any] = {
+    "questions": [],
+    "is_collecting": True,
+    "expire_time": None,
+    "generated_report": None,
+}
+
 
 @dataclass
 class SessionData:
     """Represents the ephemeral data for a single transparency session.
-    
-    This data lives only in memory and dies when the container stops.
+
+    All state lives in `store`. The default `MemoryStore` keeps it in this
+    process only; a shared store lets several workers serve one session.
+    Either way the data dies when the container stops.
     """
-    
+
     session_id: str
-    questions: list[str] = field(default_factory=list)
-    is_collecting: bool = True
-    expire_time: datetime | None = None
-    feedback: list[dict[str, Any]] = field(default_factory=list)
-    generated_report: str | None = None
-    
+    store: SessionStore = field(default_factory=MemoryStore, repr=False, compare=False)
+
+    @property
+    def questions(self) -> list[str]:
+        return self.store.get("questions", [])
+
+    @questions.setter
+    def questions(self, value: list[str]) -> None:
+        self.store.set(questions=list(value))
+
+    @property
+    def is_collecting(self) -> bool:
+        return self.store.get("is_collecting", True)
+
+    @is_collecting.setter
+    def is_collecting(self, value: bool) -> None:
+        self.store.set(is_collecting=value)
+
+    @property
+    def expire_time(self) -> datetime | None:
+        value = self.store.get("expire_time")
+        return datetime.fromisoformat(value) if value else None
+
+    @expire_time.setter
+    def expire_time(self, value: datetime | None) -> None:
+        self.store.set(expire_time=value.isoformat() if value else None)
+
+    @property
+    def feedback(self) -> list[dict[str, Any]]:
+        return self.store.read_feedback()
+
+    @property
+    def generated_report(self) -> str | None:
+        return self.store.get("generated_report")
+
+    @generated_report.setter
+    def generated_report(self, value: str | None) -> None:
+        self.store.set(generated_report=value)
+
+    @property
+    def version(self) -> int:
+        """Monotonic counter bumped by every write to this session."""
+        return self.store.version()
+
     def to_dict(self) -> dict[str, Any]:
         """Convert session data to dictionary."""
+        changes = self.store.changes_since(0)
         return {
             "session_id": self.session_id,
-            "questions": self.questions,
-            "is_collecting": self.is_collecting,
-            "expire_time": self.expire_time.isoformat() if self.expire_time else None,
-            "feedback": self.feedback,
-            "generated_report": self.generated_report,
+            **{key: changes.fields.get(key, default) for key, default in STATE_FIELDS.items()},
+            "feedback": changes.feedback,
+            "version": changes.version,
+        }
+
+    def delta(self, since: int) -> dict[str, Any]:
+        """Return only the fields and feedback that changed after version `since`."""
+        changes = self.store.changes_since(since)
+        return {
+            "version": changes.version,
+            "since": since,
+            "fields": {key: value for key, value in changes.fields.items() if key in STATE_FIELDS},
+            "feedback": changes.feedback,
+        }
+
+    def participant_state(self) -> dict[str, Any]:
+        """Return only what participants need. Never includes other people's answers."""
+        fields = self.store.get_many(["questions", "is_collecting"])
+        return {
+            "questions": fields.get("questions", []),
+            "is_collecting": fields.get("is_collecting", True),
         }
-    
+
+    def admin_summary(self) -> dict[str, Any]:
+        """Return the admin dashboard view: counts instead of raw feedback."""
+        fields = self.store.get_many(STATE_FIELDS)
+        return {
+            "session_id": self.session_id,
+            **{key: fields.get(key, default) for key, default in STATE_FIELDS.items()},
+            "response_count": self.store.feedback_count(),
+            "question_counts": self.store.question_counts(),
+            "version": self.store.version(),
+        }
+
     def add_feedback(self, answers: list[str]) -> None:
         """Add feedback responses for current questions."""
-        for question, answer in zip(self.questions, answers):
-            if question and answer:
-                self.feedback.append({
-                    "question": question,
-                    "answer": answer,
-                    "timestamp": datetime.now().isoformat(),
-                })
+        self.add_items([
+            {"question": question, "answer": answer}
+            for question, answer in zip(self.questions, answers)
+            if question
+        ])
+
+    def add_items(self, items: list[dict[str, Any]]) -> None:
+        """Add question+answer pairs as one atomic write. Empty answers are skipped."""
+        timestamp = datetime.now().isoformat()
+        self.store.append_feedback([
+            {"question": item.get("question", ""), "answer": item["answer"], "timestamp": timestamp}
+            for item in items
+            if item.get("answer")
+        ])
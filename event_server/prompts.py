@@ -0,0 +1,132 @@
+"""Compact feedback text for LLM prompts, within a token budget.
+
+Feedback used to reach the model as one `Q:`/`A:`/`Timestamp:` block per
+answer. Here answers are grouped under their question, so each question is
+written once, and timestamps are left out: answers stay in the order they
+arrived, which is all the reports use.
+
+`estimate_tokens()` approximates a BPE tokenizer without needing one.
+`sample_feedback()` and `truncate()` keep a session or a single answer
+within a budget, deterministically, so the same feedback always produces
+the same prompt (and cache key).
+"""
+import re
+from typing import Any
+
+# Runs of letters, up to three digits, single punctuation marks and line
+# breaks: roughly the pieces a BPE tokenizer starts from
+_PIECE = re.compile(r"[^\W\d_]+|\d{1,3}|\n+|[^\w\s]|_")
+
+# Letters per token in long words; common short words are a single token
+_LETTERS_PER_TOKEN = 8
+
+TRUNCATED = " [...]"
+
+
+def _piece_tokens(piece: str) -> int:
+    if piece[0].isalpha():
+        return 1 + (len(piece) - 1) // _LETTERS_PER_TOKEN
+    return 1
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count: one per word (more for long words), number group or mark.
+
+    Counts the pieces a tokenizer would see, so unlike a fixed characters
+    per token ratio it is not thrown off by punctuation, numbers or many
+    short words.
+    """
+    return sum(_piece_tokens(piece) for piece in _PIECE.findall(text)) + 1
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    """Cut `text` to at most `max_tokens` estimated tokens, marking the cut."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens - estimate_tokens(TRUNCATED)
+    used = 0
+    for match in _PIECE.finditer(text):
+        used += _piece_tokens(match.group())
+        if used > budget:
+            return text[:match.start()].rstrip() + TRUNCATED
+    return text
+
+
+def format_answer(item: dict[str, Any]) -> str:
+    """One answer line; merged near-duplicates (see `dedup.py`) show their count."""
+    count = item.get("count", 1)
+    return f"- {item['answer']}" + (f" ({count} similar answers)" if count > 1 else "")
+
+
+def format_answers(feedback: list[dict[str, Any]]) -> str:
+    return "\n".join(format_answer(item) for item in feedback)
+
+
+def question_header(question: str, total: int | None = None) -> str:
+    header = f"Q: {question}"
+    if total is not None:
+        header += f" (sampled from {total} answers)"
+    return header
+
+
+def format_feedback(feedback: list[dict[str, Any]], totals: dict[str, int] | None = None) -> str:
+    """Answers grouped under their question, questions in order of first answer.
+
+    Args:
+        feedback: Items to include
+        totals: Answers per question before `sample_feedback()`, shown in the
+            header of each sampled question
+    """
+    by_question: dict[str, list[dict[str, Any]]] = {}
+    for item in feedback:
+        by_question.setdefault(item["question"], []).append(item)
+    totals = totals or {}
+    return "\n\n".join(
+        question_header(question, totals.get(question)) + "\n" + format_answers(items)
+        for question, items in by_question.items()
+    )
+
+
+def item_tokens(item: dict[str, Any]) -> int:
+    """Estimated tokens one answer adds to `format_feedback()` output."""
+    return estimate_tokens(format_answer(item))
+
+
+def header_tokens(question: str) -> int:
+    """Estimated tokens for a question's header and the gap before it."""
+    return estimate_tokens(question_header(question)) + 1
+
+
+def feedback_tokens(feedback: list[dict[str, Any]]) -> int:
+    """Estimated tokens of `format_feedback(feedback)`, without building it."""
+    questions = {item["question"] for item in feedback}
+    return sum(map(item_tokens, feedback)) + sum(map(header_tokens, questions))
+
+
+def sample_feedback(feedback: list[dict[str, Any]], budget: int) -> list[dict[str, Any]]:
+    """Deterministically thin `feedback` until its estimated tokens fit `budget`.
+
+    Every question keeps the same share of its answers, picked at evenly
+    spaced positions so that early and late answers are both represented,
+    and at least one answer. Order is preserved. Returns `feedback` itself if
+    it already fits.
+    """
+    sizes = [item_tokens(item) for item in feedback]
+    positions: dict[str, list[int]] = {}
+    for i, item in enumerate(feedback):
+        positions.setdefault(item["question"], []).append(i)
+    headers = sum(map(header_tokens, positions))
+    total = headers + sum(sizes)
+    if total <= budget:
+        return feedback
+
+    share = max(budget - headers, 0) / (total - headers)
+    while True:
+        keep: set[int] = set()
+        for indices in positions.values():
+            count = max(1, int(len(indices) * share))
+            keep.update(indices[j * len(indices) // count] for j in range(count))
+        if share <= 0 or headers + sum(sizes[i] for i in keep) <= budget:
+            return [feedback[i] for i in sorted(keep)]
+        # Long answers landed in the sample; thin a little more
+        share = share * 0.9 if share > 1e-6 else 0
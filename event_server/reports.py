@@ -0,0 +1,197 @@
+"""Background report generation with single-flight deduplication.
+
+Generating a report is one slow LLM call. `ReportJobs` runs it off the
+request thread and records its progress as a job in the session store, so
+`GET /api/report-jobs/<id>` works from any worker. Only one job per feedback
+snapshot runs at a time: a second request while it is in flight, from a
+double click or another admin tab, gets the running job back instead of
+starting another call.
+
+The running job is held in the `report_inflight` store field and claimed
+with `compare_and_set`, which makes the dedup hold across workers sharing a
+store. Every job is also kept under `report_job:<id>`, with its result once
+it ends.
+
+New feedback can start a job while an older one is still running, and the
+two may finish in either order. The session report records how many answers
+it was written from (`generated_report_count`), and a job only replaces it
+with a report from at least as many.
+"""
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from event_server.llm import generate_report
+from event_server.models import SessionData
+from event_server.rolling import RollingSummarizer
+from event_server.tracing import tracer
+
+INFLIGHT_KEY = "report_inflight"
+REPORT_KEY = "generated_report"
+# How many answers the saved report was written from
+REPORT_COUNT_KEY = "generated_report_count"
+
+
+def job_key(job_id: str) -> str:
+    return f"report_job:{job_id}"
+
+
+class ReportJobs:
+    """Runs report generation as background jobs, one per feedback snapshot.
+
+    A snapshot is identified by the feedback count: feedback is append-only,
+    so equal counts mean the same input. A claim older than `stale_after`
+    seconds is assumed to belong to a worker that died and may be replaced.
+    With a `rolling` summarizer, jobs start from its state.
+    """
+
+    def __init__(
+        self,
+        session: SessionData,
+        generate: Callable[..., str] = generate_report,
+        max_workers: int = 2,
+        stale_after: float = 300.0,
+        rolling: RollingSummarizer | None = None,
+    ) -> None:
+        self.session = session
+        self.generate = generate
+        self.rolling = rolling
+        self.stale_after = stale_after
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self._pid: int | None = None
+
+    @classmethod
+    def from_env(
+        cls,
+        session: SessionData,
+        generate: Callable[..., str] = generate_report,
+        rolling: RollingSummarizer | None = None,
+    ) -> "ReportJobs":
+        return cls(
+            session,
+            generate=generate,
+            rolling=rolling,
+            max_workers=int(os.environ.get("REPORT_JOB_WORKERS", "2")),
+            stale_after=float(os.environ.get("REPORT_JOB_TIMEOUT", "300")),
+        )
+
+    def claim(self) -> tuple[dict[str, Any], bool]:
+        """Claim the in-flight slot for the current feedback snapshot.
+
+        Returns `(job, created)`. If a live job for the same snapshot already
+        holds the slot, that job is returned with `created=False` and the
+        caller must not generate. Otherwise the caller owns the new job and
+        must end it with `finish()` or `fail()`.
+        """
+        store = self.session.store
+        while True:
+            current = store.get(INFLIGHT_KEY)
+            count = store.feedback_count()
+            if current and current["feedback_count"] == count and not self._is_stale(current):
+                return current, False
+            job = {
+                "id": secrets.token_hex(8),
+                "status": "running",
+                "feedback_count": count,
+                "created_at": time.time(),
+            }
+            if store.compare_and_set(INFLIGHT_KEY, current, job) is not None:
+                # Also file it by id, so it stays visible if newer feedback takes the slot
+                store.set(**{job_key(job["id"]): job})
+                return job, True
+            # Another worker changed the slot between our read and write; look again
+
+    def submit(self) -> dict[str, Any]:
+        """Start a job for the current feedback, or return the one in flight."""
+        job, created = self.claim()
+        if created:
+            self._ensure_executor().submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        """Return the job record, or None if there is no such job."""
+        # The slot is read first: finished jobs are written before it is
+        # released, so a job finishing between the two reads is not missed
+        current = self.session.store.get(INFLIGHT_KEY)
+        if current and current["id"] == job_id:
+            return current
+        return self.session.store.get(job_key(job_id))
+
+    def finish(self, job: dict[str, Any], report: str) -> None:
+        """Record a successful job and save its report as the session report.
+
+        A job that finishes after one for more feedback only files its result.
+        """
+        done = {**job, "status": "done", "report": report, "finished_at": time.time()}
+        self.session.store.set(**{job_key(job["id"]): done})
+        self.save(report, job["feedback_count"])
+        self._release(job)
+
+    def save(self, report: str, feedback_count: int) -> bool:
+        """Make `report`, written from the first `feedback_count` answers, the session report.
+
+        Returns False, writing nothing, if the saved report covers more
+        feedback. Both fields are claimed with `compare_and_set`, the count
+        first, so of two jobs finishing together the older one backs off.
+        """
+        store = self.session.store
+        while True:
+            fields = store.get_many([REPORT_KEY, REPORT_COUNT_KEY])
+            saved = fields.get(REPORT_COUNT_KEY)
+            if saved is not None and saved > feedback_count:
+                return False
+            if saved == feedback_count and fields.get(REPORT_KEY) == report:
+                return True
+            if store.compare_and_set(REPORT_COUNT_KEY, saved, feedback_count) is None:
+                continue
+            if store.compare_and_set(REPORT_KEY, fields.get(REPORT_KEY), report) is not None:
+                return True
+            # Another job saved its report in between; compare counts again
+
+    def fail(self, job: dict[str, Any], error: str) -> None:
+        """Record a failed job."""
+        failed = {**job, "status": "failed", "error": error, "finished_at": time.time()}
+        self.session.store.set(**{job_key(job["id"]): failed})
+        self._release(job)
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _ensure_executor(self) -> ThreadPoolExecutor:
+        # Created lazily so each gunicorn worker builds its own after fork,
+        # and after gevent has patched threading
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="report-job")
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, job: dict[str, Any]) -> None:
+        try:
+            with tracer.trace(f"report job {job['id']}"):
+                # Read exactly the snapshot the job was claimed for
+                with tracer.span("store"):
+                    feedback = self.session.store.read_feedback()[:job["feedback_count"]]
+                if self.rolling is not None:
+                    report = self.generate(feedback, rolling=self.rolling.state())
+                else:
+                    report = self.generate(feedback)
+        except Exception as e:
+            self.fail(job, f"Failed to generate report: {str(e)}")
+        else:
+            self.finish(job, report)
+
+    def _release(self, job: dict[str, Any]) -> None:
+        # No-op if the slot was taken over as stale in the meantime
+        self.session.store.compare_and_set(INFLIGHT_KEY, job, None)
+
+    def _is_stale(self, job: dict[str, Any]) -> bool:
+        return time.time() - job["created_at"] > self.stale_after
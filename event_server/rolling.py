@@ -0,0 +1,120 @@
+"""Rolling per-question summaries kept up to date while feedback arrives.
+
+Without this, all LLM work waits for the admin to close collection. With
+`ROLLING_SUMMARY_SECONDS` set, a `RollingSummarizer` thread folds each new
+batch of feedback into a running summary per question (`fold_feedback()`),
+so at close time only the answers since the last fold and one synthesis
+call remain.
+
+The state is kept in the `rolling_summary` store field as
+`{"feedback_count", "summaries"}`. Workers sharing a store take turns
+through the store's `rolling_summary` lease, so each batch is folded once.
+The lease is only taken when there is something to fold, and leases bump
+no session version, so an idle session's version (ETags, `?since`, SSE,
+the reaper's heartbeat) stays put.
+"""
+import logging
+import os
+import secrets
+import threading
+import time
+from typing import Any, Callable
+
+from event_server.llm import fold_feedback
+from event_server.models import SessionData
+
+ROLLING_KEY = "rolling_summary"
+LEASE_NAME = "rolling_summary"
+
+logger = logging.getLogger(__name__)
+
+
+class RollingSummarizer:
+    """Periodically folds new feedback into the rolling summary.
+
+    Args:
+        session: Session to summarize
+        interval: Seconds between folds
+        min_new: Fold only once at least this many new answers are waiting
+        fold: `fold(summaries, feedback) -> summaries`, `fold_feedback` by default
+    """
+
+    def __init__(
+        self,
+        session: SessionData,
+        interval: float = 30.0,
+        min_new: int = 1,
+        fold: Callable[[dict[str, str], list[dict[str, Any]]], dict[str, str]] = fold_feedback,
+    ) -> None:
+        self.session = session
+        self.interval = interval
+        self.min_new = min_new
+        self.fold = fold
+        self._lock = threading.Lock()
+        self._pid: int | None = None
+        self._owner = secrets.token_hex(8)
+        self._closed = False
+
+    @classmethod
+    def from_env(cls, session: SessionData) -> "RollingSummarizer | None":
+        """Create a summarizer if ROLLING_SUMMARY_SECONDS is set above 0."""
+        interval = float(os.environ.get("ROLLING_SUMMARY_SECONDS", "0"))
+        if interval <= 0:
+            return None
+        return cls(
+            session,
+            interval=interval,
+            min_new=int(os.environ.get("ROLLING_SUMMARY_MIN_NEW", "1")),
+        )
+
+    def state(self) -> dict[str, Any] | None:
+        """Return the current rolling state, or None if nothing was folded yet."""
+        return self.session.store.get(ROLLING_KEY)
+
+    def ensure_running(self) -> None:
+        # Started lazily so each gunicorn worker gets its own thread after fork
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._owner = secrets.token_hex(8)
+        threading.Thread(target=self._run, name="rolling-summarizer", daemon=True).start()
+
+    def step(self) -> bool:
+        """Fold waiting feedback once, if collecting and this worker holds the lease.
+
+        Returns True if the rolling state was updated.
+        """
+        store = self.session.store
+        if not self.session.is_collecting:
+            return False
+        state = store.get(ROLLING_KEY)
+        done = state["feedback_count"] if state else 0
+        count = store.feedback_count()
+        if count - done < self.min_new or not self._hold_lease():
+            return False
+        new = store.read_feedback(done)[:count - done]
+        summaries = self.fold(state["summaries"] if state else {}, new)
+        # Fails harmlessly if another worker folded the same batch after losing the lease
+        return store.compare_and_set(
+            ROLLING_KEY, state, {"feedback_count": count, "summaries": summaries}
+        ) is not None
+
+    def _hold_lease(self) -> bool:
+        # A fold can take a while; the lease outlives a few intervals
+        return self.session.store.acquire_lease(LEASE_NAME, self._owner, 3 * self.interval + 60)
+
+    def close(self) -> None:
+        """Stop folding after the current interval."""
+        self._closed = True
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            if self._closed:
+                return
+            try:
+                self.step()
+            except Exception:
+                # Rolling summaries are an optimization; the final report still works without them
+                logger.exception("Rolling summary failed")
@@ -0,0 +1,753 @@
+"""Storage backends for session state.
+
+`SessionData` keeps no state of its own; every read and write goes through a
+`SessionStore`. The in-process store is the default; `WALStore` is the
+same, plus a write-ahead log so it survives worker restarts. The SQLite and
+Redis stores let several gunicorn workers serve the same session.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+from event_server.feedback import FeedbackLog
+from event_server.wal import WriteAheadLog
+
+
+@dataclass
+class Changes:
+    """Everything written to a store after a given version."""
+
+    version: int
+    fields: dict[str, Any]
+    feedback: list[dict[str, Any]]
+
+
+class SessionStore(ABC):
+    """Interface for session state storage.
+
+    Scalar fields (questions, is_collecting, ...) are stored as JSON-compatible
+    values under string keys. Feedback is an append-only list of dicts.
+    Every write bumps a monotonic version number and is atomic with respect to
+    other workers using the same store.
+    """
+
+    @abstractmethod
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the value stored under `key`, or `default` if unset."""
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        """Return the values for several keys. Unset keys are omitted."""
+        missing = object()
+        values = {key: self.get(key, missing) for key in keys}
+        return {key: value for key, value in values.items() if value is not missing}
+
+    @abstractmethod
+    def set(self, **fields: Any) -> int:
+        """Atomically set one or more fields. Returns the new version."""
+
+    @abstractmethod
+    def compare_and_set(self, key: str, expected: Any, value: Any) -> int | None:
+        """Set `key` to `value` only if it currently equals `expected`.
+
+        An unset key compares equal to None. Returns the new version, or None
+        if the current value did not match and nothing was written.
+        """
+
+    @abstractmethod
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """Take or renew the lease `name` for `owner` for `ttl` seconds.
+
+        Returns False if another owner holds it unexpired. Leases coordinate
+        workers and are not session state: they bump no version and never
+        appear in `changes_since()`.
+        """
+
+    @abstractmethod
+    def record_activity(self, at: float) -> None:
+        """Note that the session was used at `at` (a `time.time()`). Unversioned, like leases."""
+
+    @abstractmethod
+    def last_activity(self) -> float | None:
+        """When `record_activity()` was last called, or None."""
+
+    @abstractmethod
+    def append_feedback(self, items: list[dict[str, Any]]) -> int:
+        """Atomically append feedback items. Returns the new version.
+
+        Either all items are stored or none. Appending nothing leaves the
+        version unchanged.
+        """
+
+    @abstractmethod
+    def read_feedback(self, start: int = 0) -> list[dict[str, Any]]:
+        """Return feedback items from index `start` onwards."""
+
+    @abstractmethod
+    def feedback_count(self) -> int:
+        """Return the number of stored feedback items. O(1)."""
+
+    @abstractmethod
+    def question_counts(self) -> dict[str, int]:
+        """Return the number of feedback items per question.
+
+        Counts are kept up to date on append, so this does not scan feedback.
+        """
+
+    @abstractmethod
+    def version(self) -> int:
+        """Return the current version. 0 means nothing has been written."""
+
+    @abstractmethod
+    def changes_since(self, version: int) -> Changes:
+        """Return fields and feedback written after `version`, as one snapshot."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Delete all state for this session, including its version."""
+
+
+class MemoryStore(SessionStore):
+    """In-process store. State is lost when the process exits.
+
+    Feedback is kept in a columnar `FeedbackLog` rather than a list of dicts.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._version = 0
+        self._fields: dict[str, Any] = {}
+        self._field_versions: dict[str, int] = {}
+        self._feedback = FeedbackLog()
+        self._question_counts: dict[str, int] = {}
+        # One entry per append: its version and the index of its first item
+        self._batch_versions: list[int] = []
+        self._batch_starts: list[int] = []
+        # lease name -> (owner, expiry as time.time())
+        self._leases: dict[str, tuple[str, float]] = {}
+        self._last_activity: float | None = None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._fields.get(key, default)
+
+    def set(self, **fields: Any) -> int:
+        with self._lock:
+            self._version += 1
+            self._fields.update(fields)
+            self._field_versions.update(dict.fromkeys(fields, self._version))
+            return self._version
+
+    def compare_and_set(self, key: str, expected: Any, value: Any) -> int | None:
+        with self._lock:
+            if self._fields.get(key) != expected:
+                return None
+            self._version += 1
+            self._fields[key] = value
+            self._field_versions[key] = self._version
+            return self._version
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            current = self._leases.get(name)
+            if current and current[0] != owner and current[1] > now:
+                return False
+            self._leases[name] = (owner, now + ttl)
+            return True
+
+    def record_activity(self, at: float) -> None:
+        self._last_activity = at
+
+    def last_activity(self) -> float | None:
+        return self._last_activity
+
+    def append_feedback(self, items: list[dict[str, Any]]) -> int:
+        with self._lock:
+            if items:
+                self._version += 1
+                self._batch_versions.append(self._version)
+                self._batch_starts.append(len(self._feedback))
+                self._feedback.extend(items)
+                for item in items:
+                    question = item["question"]
+                    self._question_counts[question] = self._question_counts.get(question, 0) + 1
+            return self._version
+
+    def read_feedback(self, start: int = 0) -> list[dict[str, Any]]:
+        return self._feedback.to_dicts(start)
+
+    def feedback_count(self) -> int:
+        return len(self._feedback)
+
+    def question_counts(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._question_counts)
+
+    def version(self) -> int:
+        return self._version
+
+    def changes_since(self, version: int) -> Changes:
+        with self._lock:
+            fields = {
+                key: value
+                for key, value in self._fields.items()
+                if self._field_versions[key] > version
+            }
+            batch = bisect_right(self._batch_versions, version)
+            start = self._batch_starts[batch] if batch < len(self._batch_starts) else len(self._feedback)
+            return Changes(self._version, fields, self._feedback.to_dicts(start))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
+
+
+class WALStore(MemoryStore):
+    """In-process store that logs every write to disk before applying it.
+
+    On start the snapshot and log in `directory` are replayed, so a worker
+    restart or crash loses no acknowledged write. Like `MemoryStore` it
+    serves one process; the log is locked against a second one. `clear()`
+    overwrites the files with zeros. See `event_server/wal.py`.
+    """
+
+    def __init__(self, directory: str, session_id: str, snapshot_bytes: int = 16 * 1024 * 1024) -> None:
+        super().__init__()
+        # Orders log records the same as versions; MemoryStore's lock is held only while applying
+        self._write_lock = threading.Lock()
+        self.wal = WriteAheadLog(directory, session_id, snapshot_bytes)
+        self._recover()
+
+    def _recover(self) -> None:
+        snapshot, records = self.wal.load()
+        if snapshot:
+            self._restore(snapshot)
+        replayed = 0
+        for record in records:
+            # Records older than the snapshot remain if a crash hit between the two
+            if record["version"] > self._version:
+                self._apply(record)
+                replayed += 1
+        if replayed:
+            # Start from a compact snapshot, so the next recovery is quicker
+            self.wal.snapshot(self._snapshot())
+
+    def _apply(self, record: dict[str, Any]) -> None:
+        if record["op"] == "set":
+            super().set(**record["fields"])
+        else:
+            super().append_feedback(record["items"])
+
+    def _snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "version": self._version,
+                "fields": self._fields,
+                "field_versions": self._field_versions,
+                "batch_versions": self._batch_versions,
+                "batch_starts": self._batch_starts,
+                "feedback": self._feedback.to_dicts(),
+            }
+
+    def _restore(self, snapshot: dict[str, Any]) -> None:
+        with self._lock:
+            self._reset()
+            self._version = snapshot["version"]
+            self._fields = snapshot["fields"]
+            self._field_versions = snapshot["field_versions"]
+            self._batch_versions = snapshot["batch_versions"]
+            self._batch_starts = snapshot["batch_starts"]
+            self._feedback.extend(snapshot["feedback"])
+            self._question_counts = _count_questions(snapshot["feedback"])
+
+    def _write(self, record: dict[str, Any], check=None) -> int | None:
+        """Log `record` as the next version, apply it, then wait for the log to reach disk.
+
+        If `check()` returns False nothing is written and this returns None.
+        """
+        with self._write_lock:
+            if check is not None and not check():
+                return None
+            record["version"] = self._version + 1
+            position = self.wal.append(record)
+            self._apply(record)
+            if self.wal.needs_snapshot:
+                self.wal.snapshot(self._snapshot())
+            version = self._version
+        self.wal.sync(position)
+        return version
+
+    def set(self, **fields: Any) -> int:
+        return self._write({"op": "set", "fields": fields})
+
+    def compare_and_set(self, key: str, expected: Any, value: Any) -> int | None:
+        return self._write(
+            {"op": "set", "fields": {key: value}}, check=lambda: self._fields.get(key) == expected
+        )
+
+    def append_feedback(self, items: list[dict[str, Any]]) -> int:
+        if not items:
+            return self._version
+        return self._write({"op": "append", "items": items})
+
+    def clear(self) -> None:
+        with self._write_lock:
+            self.wal.destroy()
+            super().clear()
+
+
+class SQLiteStore(SessionStore):
+    """SQLite store in WAL mode, shared by workers on the same host.
+
+    Put the database on a tmpfs such as `/dev/shm` so that session data still
+    disappears with the container.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            feedback_count INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS question_counts (
+            session_id TEXT NOT NULL,
+            question TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (session_id, question)
+        );
+        CREATE TABLE IF NOT EXISTS fields (
+            session_id TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (session_id, key)
+        );
+        CREATE TABLE IF NOT EXISTS feedback (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            version INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS leases (
+            session_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            owner TEXT NOT NULL,
+            expires REAL NOT NULL,
+            PRIMARY KEY (session_id, name)
+        );
+        CREATE TABLE IF NOT EXISTS activity (
+            session_id TEXT PRIMARY KEY,
+            at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS feedback_session ON feedback (session_id, seq);
+        CREATE INDEX IF NOT EXISTS feedback_version ON feedback (session_id, version);
+    """
+
+    def __init__(self, path: str, session_id: str, timeout: float = 10.0) -> None:
+        self.path = path
+        self.session_id = session_id
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections must not cross threads or a gunicorn fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _transaction(self, mode: str = "IMMEDIATE") -> "_SQLiteTransaction":
+        return _SQLiteTransaction(self._connection(), mode)
+
+    def _bump_version(self, conn: sqlite3.Connection) -> int:
+        conn.execute(
+            "INSERT INTO sessions (session_id, version) VALUES (?, 1) "
+            "ON CONFLICT (session_id) DO UPDATE SET version = version + 1",
+            (self.session_id,),
+        )
+        return self._read_version(conn)
+
+    def _read_version(self, conn: sqlite3.Connection) -> int:
+        row = conn.execute(
+            "SELECT version FROM sessions WHERE session_id = ?", (self.session_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        row = self._connection().execute(
+            "SELECT value FROM fields WHERE session_id = ? AND key = ?",
+            (self.session_id, key),
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        placeholders = ", ".join("?" for _ in keys)
+        rows = self._connection().execute(
+            f"SELECT key, value FROM fields WHERE session_id = ? AND key IN ({placeholders})",
+            (self.session_id, *keys),
+        ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def set(self, **fields: Any) -> int:
+        with self._transaction() as conn:
+            version = self._bump_version(conn)
+            conn.executemany(
+                "INSERT OR REPLACE INTO fields (session_id, key, value, version) VALUES (?, ?, ?, ?)",
+                [
+                    (self.session_id, key, json.dumps(value), version)
+                    for key, value in fields.items()
+                ],
+            )
+            return version
+
+    def compare_and_set(self, key: str, expected: Any, value: Any) -> int | None:
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT value FROM fields WHERE session_id = ? AND key = ?",
+                (self.session_id, key),
+            ).fetchone()
+            if (json.loads(row[0]) if row else None) != expected:
+                return None
+            version = self._bump_version(conn)
+            conn.execute(
+                "INSERT OR REPLACE INTO fields (session_id, key, value, version) VALUES (?, ?, ?, ?)",
+                (self.session_id, key, json.dumps(value), version),
+            )
+            return version
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT owner, expires FROM leases WHERE session_id = ? AND name = ?",
+                (self.session_id, name),
+            ).fetchone()
+            if row and row[0] != owner and row[1] > now:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO leases (session_id, name, owner, expires) VALUES (?, ?, ?, ?)",
+                (self.session_id, name, owner, now + ttl),
+            )
+            return True
+
+    def record_activity(self, at: float) -> None:
+        self._connection().execute(
+            "INSERT INTO activity (session_id, at) VALUES (?, ?) "
+            "ON CONFLICT (session_id) DO UPDATE SET at = max(at, excluded.at)",
+            (self.session_id, at),
+        )
+
+    def last_activity(self) -> float | None:
+        row = self._connection().execute(
+            "SELECT at FROM activity WHERE session_id = ?", (self.session_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def append_feedback(self, items: list[dict[str, Any]]) -> int:
+        with self._transaction() as conn:
+            if not items:
+                return self._read_version(conn)
+            version = self._bump_version(conn)
+            conn.executemany(
+                "INSERT INTO feedback (session_id, question, answer, timestamp, version) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (self.session_id, item["question"], item["answer"], item["timestamp"], version)
+                    for item in items
+                ],
+            )
+            conn.execute(
+                "UPDATE sessions SET feedback_count = feedback_count + ? WHERE session_id = ?",
+                (len(items), self.session_id),
+            )
+            conn.executemany(
+                "INSERT INTO question_counts (session_id, question, count) VALUES (?, ?, ?) "
+                "ON CONFLICT (session_id, question) DO UPDATE SET count = count + excluded.count",
+                [
+                    (self.session_id, question, count)
+                    for question, count in _count_questions(items).items()
+                ],
+            )
+            return version
+
+    def read_feedback(self, start: int = 0) -> list[dict[str, Any]]:
+        rows = self._connection().execute(
+            "SELECT question, answer, timestamp FROM feedback WHERE session_id = ? "
+            "ORDER BY seq LIMIT -1 OFFSET ?",
+            (self.session_id, start),
+        ).fetchall()
+        return _feedback_rows(rows)
+
+    def feedback_count(self) -> int:
+        row = self._connection().execute(
+            "SELECT feedback_count FROM sessions WHERE session_id = ?", (self.session_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def question_counts(self) -> dict[str, int]:
+        rows = self._connection().execute(
+            "SELECT question, count FROM question_counts WHERE session_id = ?",
+            (self.session_id,),
+        ).fetchall()
+        return dict(rows)
+
+    def version(self) -> int:
+        return self._read_version(self._connection())
+
+    def changes_since(self, version: int) -> Changes:
+        # A deferred transaction reads from one consistent WAL snapshot
+        with self._transaction("DEFERRED") as conn:
+            current = self._read_version(conn)
+            fields = conn.execute(
+                "SELECT key, value FROM fields WHERE session_id = ? AND version > ?",
+                (self.session_id, version),
+            ).fetchall()
+            feedback = conn.execute(
+                "SELECT question, answer, timestamp FROM feedback "
+                "WHERE session_id = ? AND version > ? ORDER BY seq",
+                (self.session_id, version),
+            ).fetchall()
+        return Changes(
+            current,
+            {key: json.loads(value) for key, value in fields},
+            _feedback_rows(feedback),
+        )
+
+    def clear(self) -> None:
+        with self._transaction() as conn:
+            for table in ("sessions", "fields", "feedback", "question_counts", "leases", "activity"):
+                conn.execute(f"DELETE FROM {table} WHERE session_id = ?", (self.session_id,))
+
+
+def _count_questions(items: list[dict[str, Any]]) -> dict[str, int]:
+    counts: dict[str, int] = {}
+    for item in items:
+        counts[item["question"]] = counts.get(item["question"], 0) + 1
+    return counts
+
+
+def _feedback_rows(rows: list[tuple[str, str, str]]) -> list[dict[str, Any]]:
+    return [
+        {"question": question, "answer": answer, "timestamp": timestamp}
+        for question, answer, timestamp in rows
+    ]
+
+
+class _SQLiteTransaction:
+    """Context manager for a transaction. IMMEDIATE takes the write lock up front."""
+
+    def __init__(self, conn: sqlite3.Connection, mode: str) -> None:
+        self.conn = conn
+        self.mode = mode
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute(f"BEGIN {self.mode}")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+class RedisStore(SessionStore):
+    """Store backed by any server that speaks the Redis protocol.
+
+    Fields live in one hash and feedback in one list. Writes WATCH the version
+    key and apply inside MULTI/EXEC, so concurrent workers never interleave.
+    """
+
+    def __init__(self, client: Any, session_id: str) -> None:
+        self.client = client
+        self.session_id = session_id
+        prefix = f"session:{session_id}"
+        self.version_key = f"{prefix}:version"
+        self.fields_key = f"{prefix}:fields"
+        self.field_versions_key = f"{prefix}:field_versions"
+        self.feedback_key = f"{prefix}:feedback"
+        self.question_counts_key = f"{prefix}:question_counts"
+        # Sorted set of batch start indexes, scored by the version that appended them
+        self.batches_key = f"{prefix}:batches"
+        self.lease_prefix = f"{prefix}:lease:"
+        self.activity_key = f"{prefix}:activity"
+
+    @classmethod
+    def from_url(cls, url: str, session_id: str) -> "RedisStore":
+        """Create a store from a `redis://` URL. Requires the `redis` package."""
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(
+                "RedisStore requires the 'redis' package (pip install structured-transparency[redis])"
+            ) from e
+        return cls(redis.Redis.from_url(url), session_id)
+
+    def _write(self, apply, check=None) -> int | None:
+        """Run `apply(pipe, version, feedback_length)` as one versioned transaction.
+
+        If `check(pipe)` is given and returns False, nothing is written and the
+        result is None. It runs while the version key is watched.
+        """
+        def transaction(pipe) -> int | None:
+            if check is not None and not check(pipe):
+                return None
+            version = int(pipe.get(self.version_key) or 0) + 1
+            length = pipe.llen(self.feedback_key)
+            pipe.multi()
+            pipe.set(self.version_key, version)
+            apply(pipe, version, length)
+            return version
+
+        return self.client.transaction(transaction, self.version_key, value_from_callable=True)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.client.hget(self.fields_key, key)
+        return json.loads(value) if value is not None else default
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self.client.hmget(self.fields_key, keys)
+        return {key: json.loads(value) for key, value in zip(keys, values) if value is not None}
+
+    def set(self, **fields: Any) -> int:
+        def apply(pipe, version, length):
+            pipe.hset(
+                self.fields_key, mapping={key: json.dumps(value) for key, value in fields.items()}
+            )
+            pipe.hset(self.field_versions_key, mapping=dict.fromkeys(fields, version))
+
+        return self._write(apply)
+
+    def compare_and_set(self, key: str, expected: Any, value: Any) -> int | None:
+        # Every write bumps the version, so watching it also guards this field
+        def check(pipe):
+            current = pipe.hget(self.fields_key, key)
+            return (json.loads(current) if current is not None else None) == expected
+
+        def apply(pipe, version, length):
+            pipe.hset(self.fields_key, key, json.dumps(value))
+            pipe.hset(self.field_versions_key, key, version)
+
+        return self._write(apply, check)
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        # Its own key with its own expiry, outside the versioned transaction
+        key = f"{self.lease_prefix}{name}"
+
+        def transaction(pipe) -> bool:
+            current = pipe.get(key)
+            if current is not None and _decode(current) != owner:
+                return False
+            pipe.multi()
+            pipe.set(key, owner, px=max(int(ttl * 1000), 1))
+            return True
+
+        return self.client.transaction(transaction, key, value_from_callable=True)
+
+    def record_activity(self, at: float) -> None:
+        self.client.set(self.activity_key, at)
+
+    def last_activity(self) -> float | None:
+        value = self.client.get(self.activity_key)
+        return float(value) if value is not None else None
+
+    def append_feedback(self, items: list[dict[str, Any]]) -> int:
+        if not items:
+            return self.version()
+
+        def apply(pipe, version, length):
+            pipe.rpush(self.feedback_key, *(json.dumps(item) for item in items))
+            pipe.zadd(self.batches_key, {length: version})
+            for question, count in _count_questions(items).items():
+                pipe.hincrby(self.question_counts_key, question, count)
+
+        return self._write(apply)
+
+    def read_feedback(self, start: int = 0) -> list[dict[str, Any]]:
+        return [json.loads(item) for item in self.client.lrange(self.feedback_key, start, -1)]
+
+    def feedback_count(self) -> int:
+        return self.client.llen(self.feedback_key)
+
+    def question_counts(self) -> dict[str, int]:
+        return {
+            _decode(question): int(count)
+            for question, count in self.client.hgetall(self.question_counts_key).items()
+        }
+
+    def version(self) -> int:
+        return int(self.client.get(self.version_key) or 0)
+
+    def changes_since(self, version: int) -> Changes:
+        pipe = self.client.pipeline()
+        pipe.get(self.version_key)
+        pipe.hgetall(self.field_versions_key)
+        pipe.zrangebyscore(self.batches_key, f"({version}", "+inf", start=0, num=1)
+        pipe.llen(self.feedback_key)
+        current, field_versions, first_batch, length = pipe.execute()
+
+        changed = [_decode(key) for key, v in field_versions.items() if int(v) > version]
+        values = self.client.hmget(self.fields_key, changed) if changed else []
+        # Feedback is append-only, so [start, length) holds exactly this snapshot's new items
+        start = int(first_batch[0]) if first_batch else length
+        feedback = self.client.lrange(self.feedback_key, start, length - 1) if start < length else []
+
+        return Changes(
+            int(current or 0),
+            {key: json.loads(value) for key, value in zip(changed, values) if value is not None},
+            [json.loads(item) for item in feedback],
+        )
+
+    def clear(self) -> None:
+        self.client.delete(
+            self.version_key,
+            self.fields_key,
+            self.field_versions_key,
+            self.feedback_key,
+            self.question_counts_key,
+            self.batches_key,
+            self.activity_key,
+            *self.client.scan_iter(f"{self.lease_prefix}*"),
+        )
+
+
+def _decode(value: bytes | str) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def create_store(url: str, session_id: str) -> SessionStore:
+    """Create a store from a `SESSION_STORE`-style URL.
+
+    Supported values:
+        memory                      In-process (default, single worker only)
+        wal:///dev/shm/session-wal  In-process, with a write-ahead log in that directory
+        sqlite:///dev/shm/session.db  SQLite in WAL mode at the given path
+        redis://host:6379/0         Redis or any Redis-protocol server
+    """
+    if not url or url == "memory":
+        return MemoryStore()
+    if url.startswith("wal://"):
+        return WALStore(url[len("wal://"):], session_id)
+    if url.startswith("sqlite://"):
+        return SQLiteStore(url[len("sqlite://"):], session_id)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStore.from_url(url, session_id)
+    raise ValueError(f"Unsupported SESSION_STORE: {url}")
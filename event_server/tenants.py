@@ -0,0 +1,194 @@
+"""Many sessions in one process (`MULTI_TENANT=1`).
+
+By default a container serves one session, and starting a session means
+starting a container: a Python interpreter and gunicorn of its own. In
+multi-tenant mode a `SessionRegistry` hosts any number of sessions in one
+process instead, each a `Tenant` with its own `SessionData`, ingest queue,
+report jobs, event watcher and expiry scheduler, served under `/s/<session_id>/`. Requests
+select their tenant through the `active` context variable, which the
+`session_data`, `ingest_queue`, ... names in event_server.app resolve
+through. The tenant's threads start when first needed, and a session idle
+for `SESSION_IDLE_SECONDS` is evicted: its threads stop and its store is
+cleared, as stopping its container would.
+
+Sessions live in the process that created them, so run one worker (gevent
+or ASGI provide the concurrency).
+"""
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from event_server.backends import ReportBackend
+from event_server.events import VersionWatcher
+from event_server.expiry import ExpiryScheduler
+from event_server.ingest import IngestQueue
+from event_server.models import SessionData
+from event_server.reports import ReportJobs
+from event_server.rolling import RollingSummarizer
+from event_server.store import SessionStore, create_store
+
+logger = logging.getLogger(__name__)
+
+# Ids go into URLs and store paths
+SESSION_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+class SessionLimit(Exception):
+    """The registry already hosts `max_sessions` sessions."""
+
+
+@dataclass
+class Tenant:
+    """One session and the objects serving it."""
+
+    session: SessionData
+    ingest: IngestQueue
+    jobs: ReportJobs
+    watcher: VersionWatcher
+    expiry: ExpiryScheduler
+    rolling: RollingSummarizer | None = None
+    last_seen: float = field(default_factory=time.monotonic)
+    # When this process last recorded a request in the store (see event_server.app.note_activity)
+    activity_noted: float = 0.0
+
+    @classmethod
+    def create(cls, session_id: str, store: SessionStore, backend: ReportBackend) -> "Tenant":
+        """Build a session's objects, configured from the environment like event_server.app's."""
+        session = SessionData(session_id=session_id, store=store)
+        rolling = RollingSummarizer.from_env(session) if backend.supports_rolling else None
+        interval = float(os.environ.get("SSE_POLL_SECONDS", "0.5"))
+        jobs = ReportJobs.from_env(session, generate=backend.generate, rolling=rolling)
+        return cls(
+            session=session,
+            ingest=IngestQueue.from_env(session),
+            jobs=jobs,
+            watcher=VersionWatcher(session, interval=interval),
+            expiry=ExpiryScheduler.from_env(session, jobs),
+            rolling=rolling,
+        )
+
+    def close(self) -> None:
+        """Stop this session's threads and delete its data."""
+        self.ingest.close()
+        self.watcher.close()
+        self.expiry.close()
+        if self.rolling is not None:
+            self.rolling.close()
+        self.jobs.shutdown(wait=False)
+        self.session.store.clear()
+
+
+# The tenant the current request is for; None for the container's own session
+active: ContextVar[Tenant | None] = ContextVar("active_tenant", default=None)
+
+
+class SessionRegistry:
+    """The sessions this process hosts, by id.
+
+    Args:
+        backend: Report backend shared by every session
+        store_url: `SESSION_STORE` URL; each session gets its own store from it
+        idle_seconds: Evict a session after this long without a request
+        max_sessions: Refuse new sessions beyond this many
+    """
+
+    def __init__(
+        self,
+        backend: ReportBackend,
+        store_url: str = "memory",
+        idle_seconds: float = 3600.0,
+        max_sessions: int = 1000,
+    ) -> None:
+        self.backend = backend
+        self.store_url = store_url
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._tenants: dict[str, Tenant] = {}
+        self._pid: int | None = None
+
+    @classmethod
+    def from_env(cls, backend: ReportBackend) -> "SessionRegistry":
+        return cls(
+            backend,
+            store_url=os.environ.get("SESSION_STORE", "memory"),
+            idle_seconds=float(os.environ.get("SESSION_IDLE_SECONDS", "3600")),
+            max_sessions=int(os.environ.get("MAX_SESSIONS", "1000")),
+        )
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def create(self, session_id: str | None = None) -> Tenant:
+        """Start hosting a new session, with a random id unless one is given.
+
+        Raises:
+            ValueError: If the id is malformed or already in use
+            SessionLimit: If `max_sessions` sessions are already hosted
+        """
+        session_id = session_id or secrets.token_hex(4)
+        if not SESSION_ID_PATTERN.fullmatch(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        self._ensure_running()
+        with self._lock:
+            if session_id in self._tenants:
+                raise ValueError(f"Session {session_id} already exists")
+            if len(self._tenants) >= self.max_sessions:
+                raise SessionLimit(f"Already hosting {self.max_sessions} sessions")
+            tenant = Tenant.create(session_id, create_store(self.store_url, session_id), self.backend)
+            self._tenants[session_id] = tenant
+        logger.info("Created session %s (%d hosted)", session_id, len(self._tenants))
+        return tenant
+
+    def get(self, session_id: str) -> Tenant | None:
+        """The session's tenant, marked as just used; None if it is not hosted here."""
+        tenant = self._tenants.get(session_id)
+        if tenant is not None:
+            tenant.last_seen = time.monotonic()
+        return tenant
+
+    def tenants(self) -> list[Tenant]:
+        with self._lock:
+            return list(self._tenants.values())
+
+    def remove(self, session_id: str) -> bool:
+        """Stop hosting a session and delete its data. False if it was not hosted."""
+        with self._lock:
+            tenant = self._tenants.pop(session_id, None)
+        if tenant is None:
+            return False
+        tenant.close()
+        return True
+
+    def evict_idle(self) -> list[str]:
+        """Remove sessions unused for `idle_seconds`; returns their ids."""
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            idle = [sid for sid, tenant in self._tenants.items() if tenant.last_seen < cutoff]
+            evicted = [self._tenants.pop(sid) for sid in idle]
+        for tenant in evicted:
+            tenant.close()
+        if idle:
+            logger.info("Evicted idle sessions: %s", ", ".join(idle))
+        return idle
+
+    def _ensure_running(self) -> None:
+        # Started lazily so each gunicorn worker gets its own thread after fork
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, name="session-evictor", daemon=True).start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(min(max(self.idle_seconds / 4, 1.0), 60.0))
+            try:
+                self.evict_idle()
+            except Exception:
+                logger.exception("Evicting idle sessions failed")
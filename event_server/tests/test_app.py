@@ -0,0 +1,205 @@
+"""Tests for event server API endpoints."""
+import time
+import pytest
+from event_server.app import app, default_session_id, ingest_queue, report_backend, report_jobs, session_data
+from event_server.llm import report_cache, report_key
+from event_server.reports import INFLIGHT_KEY
+from event_server.store import MemoryStore
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Flask test client over a fresh in-memory session."""
+    monkeypatch.setattr(session_data, "store", MemoryStore())
+    report_cache.clear()
+    return app.test_client()
+
+
+def test_state_includes_version(client):
+    """Test the full state carries the session version."""
+    client.post("/api/questions", json={"questions": ["Q1", "Q2"]})
+    state = client.get("/api/state").get_json()
+    assert state["questions"] == ["Q1", "Q2"]
+    assert state["version"] == 1
+
+
+def test_state_etag_not_modified(client):
+    """Test If-None-Match returns 304 until the session changes."""
+    first = client.get("/api/state")
+    etag = first.headers["ETag"]
+
+    unchanged = client.get("/api/state", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.data == b""
+
+    client.post("/api/submit-feedback", json={"items": [{"question": "Q", "answer": "A"}]})
+    changed = client.get("/api/state", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_state_since_returns_delta(client):
+    """Test ?since= returns only new feedback and changed fields."""
+    client.post("/api/questions", json={"questions": ["Q1"]})
+    client.post("/api/submit-feedback", json={"items": [{"question": "Q1", "answer": "First"}]})
+    version = client.get("/api/state").get_json()["version"]
+
+    client.post("/api/submit-feedback", json={"items": [{"question": "Q1", "answer": "Second"}]})
+    client.post("/api/close-collection")
+
+    delta = client.get(f"/api/state?since={version}").get_json()
+    assert delta["since"] == version
+    assert delta["fields"] == {"is_collecting": False}
+    assert [item["answer"] for item in delta["feedback"]] == ["Second"]
+
+    assert client.get(f"/api/state?since={delta['version']}").status_code == 304
+
+
+def test_participant_state_excludes_feedback(client):
+    """Test participants get questions and status but no answers."""
+    client.post("/api/questions", json={"questions": ["Q1"]})
+    client.post("/api/submit-feedback", json={"items": [{"question": "Q1", "answer": "Secret"}]})
+
+    state = client.get("/api/participant-state").get_json()
+    assert state == {"questions": ["Q1"], "is_collecting": True}
+
+
+def test_admin_summary_counts(client):
+    """Test the admin summary reports running counts instead of raw feedback."""
+    client.post("/api/submit-feedback", json={"items": [
+        {"question": "Q1", "answer": "A"},
+        {"question": "Q2", "answer": "B"},
+    ]})
+    client.post("/api/submit-feedback", json={"items": [{"question": "Q1", "answer": "C"}]})
+
+    response = client.get("/api/admin-summary")
+    summary = response.get_json()
+    assert summary["response_count"] == 3
+    assert summary["question_counts"] == {"Q1": 2, "Q2": 1}
+    assert "feedback" not in summary
+
+    cached = client.get("/api/admin-summary", headers={"If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304
+
+
+def test_submit_feedback_validates(client):
+    """Test malformed and oversized submissions are rejected."""
+    assert client.post("/api/submit-feedback", json={"items": "nope"}).status_code == 400
+
+    items = [{"question": "Q", "answer": "A"}] * 51
+    assert client.post("/api/submit-feedback", json={"items": items}).status_code == 413
+
+    huge = {"items": [{"question": "Q", "answer": "x" * 70000}]}
+    assert client.post("/api/submit-feedback", json=huge).status_code == 413
+    assert session_data.store.feedback_count() == 0
+
+
+def test_submit_feedback_backpressure(client, monkeypatch):
+    """Test a full ingest queue answers 429 with Retry-After."""
+    monkeypatch.setattr(ingest_queue, "max_pending", 0)
+    response = client.post("/api/submit-feedback", json={"items": [{"question": "Q", "answer": "A"}]})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_generate_report_stream(client, monkeypatch):
+    """Test the streaming endpoint sends chunks and saves the full report."""
+    monkeypatch.setattr(report_backend, "stream", lambda feedback, **kwargs: iter(["Part 1. ", "Part 2."]))
+    client.post("/api/submit-feedback", json={"items": [{"question": "Q", "answer": "A"}]})
+
+    response = client.post("/api/generate-report/stream")
+    body = response.get_data(as_text=True)
+    assert response.mimetype == "text/event-stream"
+    assert 'event: chunk\ndata: {"text": "Part 1. "}' in body
+    assert "event: done" in body
+    assert session_data.generated_report == "Part 1. Part 2."
+
+
+def test_generate_report_stream_frees_slot(client, monkeypatch):
+    """Test a stream that fails to start, or is closed before its first chunk, frees the slot."""
+    client.post("/api/submit-feedback", json={"items": [{"question": "Q", "answer": "A"}]})
+
+    def broken(feedback, **kwargs):
+        raise RuntimeError("backend down")
+
+    monkeypatch.setattr(report_backend, "stream", broken)
+    response = client.post("/api/generate-report/stream")
+    assert response.status_code == 500
+    assert session_data.store.get(INFLIGHT_KEY) is None
+
+    monkeypatch.setattr(report_backend, "stream", lambda feedback, **kwargs: iter(["Part 1. "]))
+    response = client.post("/api/generate-report/stream", buffered=False)
+    job = session_data.store.get(INFLIGHT_KEY)
+    response.close()
+    assert session_data.store.get(INFLIGHT_KEY) is None
+    assert report_jobs.get(job["id"])["status"] == "failed"
+
+
+def test_generate_report_stream_requires_feedback(client):
+    """Test the streaming endpoint refuses to run without feedback."""
+    assert client.post("/api/generate-report/stream").status_code == 400
+
+
+def test_generate_report_returns_job(client, monkeypatch):
+    """Test report generation runs as a job that can be polled."""
+    monkeypatch.setattr(report_jobs, "generate", lambda feedback: "Report")
+    client.post("/api/submit-feedback", json={"items": [{"question": "Q", "answer": "A"}]})
+
+    response = client.post("/api/generate-report")
+    assert response.status_code == 202
+    job_id = response.get_json()["job"]["id"]
+    assert response.headers["Location"] == f"/api/report-jobs/{job_id}"
+
+    deadline = time.monotonic() + 5
+    while (job := client.get(f"/api/report-jobs/{job_id}").get_json()["job"])["status"] == "running":
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert job["status"] == "done"
+    assert job["report"] == "Report"
+    assert session_data.generated_report == "Report"
+
+
+def test_report_job_not_found(client):
+    """Test unknown job ids return 404."""
+    assert client.get("/api/report-jobs/missing").status_code == 404
+
+
+def test_generate_report_serves_cache(client, monkeypatch):
+    """Test a report cached for the current feedback is returned without a job."""
+    monkeypatch.setattr(report_jobs, "submit", lambda: pytest.fail("should not start a job"))
+    client.post("/api/submit-feedback", json={"items": [{"question": "Q", "answer": "A"}]})
+    report_cache.set(report_key(session_data.feedback), "Cached report")
+
+    response = client.post("/api/generate-report")
+    assert response.status_code == 200
+    assert response.get_json() == {"success": True, "report": "Cached report", "cached": True}
+    assert session_data.generated_report == "Cached report"
+
+
+def test_claim_warm_container(client, monkeypatch):
+    """Test a warm container takes the session id it is claimed for, once, with its token."""
+    module = app.view_functions["claim_session"].__globals__
+    monkeypatch.setattr(session_data, "session_id", module["SESSION_ID"])
+    assert client.post("/api/claim", json={"session_id": "abc"}).status_code == 404
+
+    monkeypatch.setitem(module, "CLAIM_TOKEN", "warm-token")
+    wrong = client.post("/api/claim", json={"session_id": "abc"}, headers={"Authorization": "Bearer x"})
+    assert wrong.status_code == 403
+
+    headers = {"Authorization": "Bearer warm-token"}
+    assert client.post("/api/claim", json={}, headers=headers).status_code == 400
+    assert client.post("/api/claim", json={"session_id": "abc"}, headers=headers).status_code == 200
+    assert client.get("/api/state").get_json()["session_id"] == "abc"
+    assert client.post("/api/claim", json={"session_id": "def"}, headers=headers).status_code == 409
+
+    # Another worker's SessionData adopts the claim on its next request
+    session_data.session_id = module["SESSION_ID"]
+    assert client.get("/api/admin-summary").get_json()["session_id"] == "abc"
+
+
+def test_default_session_id_is_shared_by_workers():
+    """Test workers sharing a store derive the same session id; in-memory ones get their own."""
+    url = "sqlite:///dev/shm/session.db"
+    assert default_session_id(url) == default_session_id(url)
+    assert default_session_id(url) != default_session_id("redis://localhost:6379/0")
+    assert default_session_id("memory") != default_session_id("memory")
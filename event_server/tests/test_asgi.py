@@ -0,0 +1,225 @@
+"""Tests for the ASGI (Quart) app."""
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+
+pytest.importorskip("quart")
+
+from event_server.app import ingest_queue, report_backend, report_jobs, session_data
+from event_server.asgi import _ClosingEvents, app
+from event_server.events import VersionWatcher, stream_events_async
+from event_server.ingest import IngestQueue
+from event_server.llm import report_cache
+from event_server.models import SessionData
+from event_server.reports import INFLIGHT_KEY
+from event_server.store import MemoryStore
+from event_server.tracing import Tracer
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Quart test client over a fresh in-memory session."""
+    monkeypatch.setattr(session_data, "store", MemoryStore())
+    report_cache.clear()
+    return app.test_client()
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_state_etag_not_modified(client):
+    """Test the state endpoint returns 304 for a matching ETag."""
+    async def scenario():
+        first = await client.get("/api/state")
+        etag = first.headers["ETag"]
+        second = await client.get("/api/state", headers={"If-None-Match": etag})
+        return (await first.get_json())["version"], second.status_code
+
+    version, status = _run(scenario())
+    assert version == 0
+    assert status == 304
+
+
+def test_submit_feedback(client):
+    """Test submissions are committed through the ingest queue."""
+    async def scenario():
+        response = await client.post(
+            "/api/submit-feedback", json={"items": [{"question": "Q", "answer": "A"}]}
+        )
+        participant = await client.get("/api/participant-state")
+        return response.status_code, await participant.get_json()
+
+    status, participant = _run(scenario())
+    assert status == 200
+    assert session_data.store.feedback_count() == 1
+    assert "feedback" not in participant
+
+
+def test_submit_feedback_validates(client, monkeypatch):
+    """Test malformed bodies, closed collection and a full queue are refused."""
+    async def scenario():
+        malformed = await client.post("/api/submit-feedback", json={"items": "nope"})
+        monkeypatch.setattr(ingest_queue, "max_pending", 0)
+        busy = await client.post("/api/submit-feedback", json={"items": [{"question": "Q", "answer": "A"}]})
+        session_data.is_collecting = False
+        closed = await client.post("/api/submit-feedback", json={"items": [{"question": "Q", "answer": "A"}]})
+        return malformed.status_code, busy.status_code, busy.headers.get("Retry-After"), closed.status_code
+
+    assert _run(scenario()) == (400, 429, "1", 400)
+
+
+def test_events_stream(client, monkeypatch):
+    """Test the events endpoint serves an SSE stream."""
+    monkeypatch.setenv("SSE_MAX_SECONDS", "0")
+
+    async def scenario():
+        response = await client.get("/api/events")
+        return response.mimetype, await response.get_data(as_text=True)
+
+    mimetype, body = _run(scenario())
+    assert mimetype == "text/event-stream"
+    assert body.startswith("retry: 3000")
+
+
+def test_generate_report_stream(client, monkeypatch):
+    """Test the streaming endpoint sends chunks and saves the full report."""
+    monkeypatch.setattr(report_backend, "stream", lambda feedback, **kwargs: iter(["Part 1. ", "Part 2."]))
+
+    async def scenario():
+        await client.post("/api/submit-feedback", json={"items": [{"question": "Q", "answer": "A"}]})
+        response = await client.post("/api/generate-report/stream")
+        return response.mimetype, await response.get_data(as_text=True)
+
+    mimetype, body = _run(scenario())
+    assert mimetype == "text/event-stream"
+    assert 'event: chunk\ndata: {"text": "Part 1. "}' in body
+    assert "event: done" in body
+    assert session_data.generated_report == "Part 1. Part 2."
+
+
+def test_submission_after_expire_time_is_refused(client):
+    """Test the ASGI handler also closes collection at the deadline before accepting answers."""
+    session_data.expire_time = datetime.now() - timedelta(seconds=1)
+
+    async def scenario():
+        response = await client.post("/api/submit-feedback", json={"items": [{"question": "Q", "answer": "A"}]})
+        return response.status_code
+
+    assert _run(scenario()) == 400
+    assert session_data.store.feedback_count() == 0
+
+
+def test_generate_report_stream_frees_slot(client, monkeypatch):
+    """Test a stream that fails to start frees the slot, as does closing one never read."""
+    def broken(feedback, **kwargs):
+        raise RuntimeError("backend down")
+
+    monkeypatch.setattr(report_backend, "stream", broken)
+
+    async def scenario():
+        await client.post("/api/submit-feedback", json={"items": [{"question": "Q", "answer": "A"}]})
+        return (await client.post("/api/generate-report/stream")).status_code
+
+    assert _run(scenario()) == 500
+    assert session_data.store.get(INFLIGHT_KEY) is None
+
+    closed = []
+
+    async def events():
+        yield "never read"
+
+    _run(_ClosingEvents(events(), lambda: closed.append(True)).aclose())
+    assert closed == [True]
+
+
+def test_generate_report_returns_job(client, monkeypatch):
+    """Test report generation runs as a job that can be polled."""
+    monkeypatch.setattr(report_jobs, "generate", lambda feedback: "Report")
+
+    async def scenario():
+        await client.post("/api/submit-feedback", json={"items": [{"question": "Q", "answer": "A"}]})
+        response = await client.post("/api/generate-report")
+        assert response.status_code == 202
+        job_id = (await response.get_json())["job"]["id"]
+        for _ in range(500):
+            job = (await (await client.get(f"/api/report-jobs/{job_id}")).get_json())["job"]
+            if job["status"] != "running":
+                return job
+            await asyncio.sleep(0.01)
+        pytest.fail("report job did not finish")
+
+    job = _run(scenario())
+    assert job["status"] == "done"
+    assert job["report"] == "Report"
+
+
+def test_wait_async_wakes_on_change():
+    """Test an awaiting stream wakes when the store version changes."""
+    session = SessionData(session_id="test")
+    watcher = VersionWatcher(session, interval=0.01)
+
+    async def scenario():
+        version, _ = await watcher.wait_async(None, 1)
+        waiter = asyncio.create_task(watcher.wait_async(version, 5))
+        await asyncio.sleep(0.05)
+        session.questions = ["Q1"]
+        new_version, snapshot = await waiter
+        timed_out, _ = await watcher.wait_async(new_version, 0.05)
+        return version, new_version, snapshot, timed_out
+
+    version, new_version, snapshot, timed_out = _run(scenario())
+    assert new_version == version + 1
+    assert snapshot["questions"] == ["Q1"]
+    assert timed_out == new_version
+
+
+def test_stream_events_async_matches_sync():
+    """Test the async stream yields the same opening messages."""
+    session = SessionData(session_id="test")
+    session.questions = ["Q1"]
+    watcher = VersionWatcher(session, interval=0.01)
+
+    async def scenario():
+        stream = stream_events_async(watcher, max_seconds=1)
+        messages = [await anext(stream), await anext(stream)]
+        await stream.aclose()
+        return messages
+
+    retry, first = _run(scenario())
+    assert retry == "retry: 3000\n\n"
+    assert "event: questions" in first
+    assert '"Q1"' in first
+
+
+def test_submit_async_commits():
+    """Test awaiting submissions are group committed like threaded ones."""
+    session = SessionData(session_id="test", store=MemoryStore())
+    ingest = IngestQueue(session)
+
+    async def scenario():
+        items = [{"question": "Q", "answer": f"A{n}", "timestamp": "2025-11-05T20:00:00"} for n in range(20)]
+        return await asyncio.gather(*(ingest.submit_async([item]) for item in items))
+
+    assert _run(scenario()) == [True] * 20
+    assert session.store.feedback_count() == 20
+
+
+def test_metrics_endpoint(client):
+    """Test the ASGI app records requests for /metrics too."""
+    async def scenario():
+        await client.get("/api/state")
+        response = await client.get("/metrics")
+        return await response.get_data(as_text=True)
+
+    assert 'event_server_http_requests_total{route="/api/state",method="GET",status="200"}' in _run(scenario())
+
+
+def test_server_timing(client, monkeypatch):
+    """Test the ASGI app returns Server-Timing when tracing is on."""
+    monkeypatch.setattr("event_server.asgi.tracer", Tracer(enabled=True))
+
+    async def scenario():
+        return (await client.get("/api/state")).headers.get("Server-Timing", "")
+
+    assert "total;dur=" in _run(scenario())
@@ -0,0 +1,122 @@
+"""Microbenchmarks for SessionData hot paths (pytest-benchmark).
+
+Skipped unless run with --benchmark-only:
+
+    pytest event_server/tests --benchmark-only --benchmark-save=baseline
+    pytest event_server/tests --benchmark-only --benchmark-compare --benchmark-compare-fail=mean:15%
+
+Timings are saved per machine under .benchmarks/. Allocations (the tracemalloc
+peak of one call) are compared with benchmark_allocations.json next to this
+file, which holds for any machine on the same Python; rewrite it after an
+intended change with BENCHMARK_UPDATE_ALLOCATIONS=1.
+"""
+import json
+import os
+import tracemalloc
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from event_server.app import app
+from event_server.llm import build_prompt
+from event_server.models import SessionData
+from event_server.tests.test_sample_data import SAMPLE_FEEDBACK
+from flask import jsonify
+
+SIZES = [100, 10_000, 100_000]
+ALLOCATIONS_PATH = os.path.join(os.path.dirname(__file__), "benchmark_allocations.json")
+# Peak allocations may grow this much over the stored baseline, plus some
+# slack so calls that allocate almost nothing do not fail on noise
+ALLOCATION_TOLERANCE = 0.25
+ALLOCATION_SLACK = 4096
+QUESTIONS = sorted({item["question"] for item in SAMPLE_FEEDBACK})
+
+
+@pytest.fixture(autouse=True)
+def _only_when_benchmarking(request):
+    if not request.config.getoption("benchmark_only"):
+        pytest.skip("benchmarks run with --benchmark-only")
+
+
+@pytest.fixture(scope="module")
+def allocations():
+    """Stored allocation baselines; written back at the end when updating."""
+    baselines = {}
+    if os.path.exists(ALLOCATIONS_PATH):
+        with open(ALLOCATIONS_PATH) as f:
+            baselines = json.load(f)
+    measured = {}
+    yield baselines, measured
+    if os.environ.get("BENCHMARK_UPDATE_ALLOCATIONS") and measured:
+        with open(ALLOCATIONS_PATH, "w") as f:
+            json.dump({**baselines, **measured}, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+def _session(size: int) -> SessionData:
+    session = SessionData(session_id="bench")
+    session.questions = QUESTIONS
+    items = []
+    for n in range(size):
+        item = SAMPLE_FEEDBACK[n % len(SAMPLE_FEEDBACK)]
+        items.append({**item, "answer": f"{item['answer']} #{n}"})
+    session.store.append_feedback(items)
+    return session
+
+
+def _check_allocations(benchmark, allocations, request, fn) -> None:
+    """Record the peak allocation of one `fn()` call and compare it with the baseline."""
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    benchmark.extra_info["peak_bytes"] = peak
+
+    baselines, measured = allocations
+    name = request.node.name
+    measured[name] = peak
+    if name in baselines and not os.environ.get("BENCHMARK_UPDATE_ALLOCATIONS"):
+        limit = baselines[name] * (1 + ALLOCATION_TOLERANCE) + ALLOCATION_SLACK
+        assert peak <= limit, f"{name} allocated {peak} bytes, baseline {baselines[name]}"
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_add_feedback(benchmark, allocations, request, size):
+    """One participant's submission into a session already holding `size` answers."""
+    session = _session(size)
+    answers = [f"Answer to {question}" for question in QUESTIONS]
+    benchmark.group = "add_feedback"
+    benchmark(session.add_feedback, answers)
+    _check_allocations(benchmark, allocations, request, lambda: session.add_feedback(answers))
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_to_dict(benchmark, allocations, request, size):
+    """The full state, as served by /api/state without ?since."""
+    session = _session(size)
+    benchmark.group = "to_dict"
+    state = benchmark(session.to_dict)
+    assert len(state["feedback"]) == size
+    _check_allocations(benchmark, allocations, request, session.to_dict)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_jsonify_state(benchmark, allocations, request, size):
+    """Serializing the full state to a JSON response."""
+    state = _session(size).to_dict()
+    benchmark.group = "jsonify"
+    with app.app_context():
+        benchmark(jsonify, state)
+        _check_allocations(benchmark, allocations, request, lambda: jsonify(state))
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_build_prompt(benchmark, allocations, request, size):
+    """Joining all feedback into the report prompt."""
+    feedback = _session(size).feedback
+    benchmark.group = "build_prompt"
+    prompt = benchmark(build_prompt, feedback)
+    assert QUESTIONS[0] in prompt
+    _check_allocations(benchmark, allocations, request, lambda: build_prompt(feedback))
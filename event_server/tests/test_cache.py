@@ -0,0 +1,74 @@
+"""Tests for the report caches."""
+import os
+import time
+import pytest
+from event_server.cache import DiskCache, MemoryCache, NullCache, cache_key, create_cache
+
+
+@pytest.fixture(params=["memory", "disk"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        return MemoryCache(ttl=60)
+    return DiskCache(str(tmp_path / "cache"), ttl=60)
+
+
+def test_cache_key_is_stable():
+    """Test keys depend only on content, not dict ordering."""
+    assert cache_key("m", {"a": 1, "b": 2}) == cache_key("m", {"b": 2, "a": 1})
+    assert cache_key("m", [1, 2]) != cache_key("m", [2, 1])
+
+
+def test_roundtrip_and_stats(cache):
+    """Test values are returned and hits and misses are counted."""
+    assert cache.get("k") is None
+    cache.set("k", "value ✓")
+    assert cache.get("k") == "value ✓"
+    assert cache.stats.to_dict() == {"hits": 1, "misses": 1, "evictions": 0}
+    cache.clear()
+    assert cache.get("k") is None
+
+
+def test_ttl_expires_entries(cache):
+    """Test entries older than the TTL are misses."""
+    cache.set("k", "value")
+    cache.ttl = -1
+    assert cache.get("k") is None
+
+
+def test_memory_cache_evicts_least_recently_used():
+    """Test the LRU keeps recently read entries."""
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.stats.evictions == 1
+
+
+def test_disk_cache_evicts_by_size(tmp_path):
+    """Test the disk cache deletes least recently used files over max_bytes."""
+    cache = DiskCache(str(tmp_path), max_bytes=200)
+    cache.set("a", "x" * 100)
+    old = time.time() - 10
+    os.utime(tmp_path / "a.json", (old, old))
+    cache.set("b", "x" * 100)
+    assert cache.get("a") is None
+    assert cache.get("b") == "x" * 100
+    assert cache.stats.evictions == 1
+
+
+def test_disk_cache_is_shared(tmp_path):
+    """Test two instances on one directory see each other's entries, like two workers."""
+    DiskCache(str(tmp_path)).set("k", "value")
+    assert DiskCache(str(tmp_path)).get("k") == "value"
+
+
+def test_create_cache(tmp_path):
+    """Test REPORT_CACHE URLs pick the backend."""
+    assert isinstance(create_cache("memory"), MemoryCache)
+    assert isinstance(create_cache("none"), NullCache)
+    assert isinstance(create_cache(f"disk://{tmp_path}"), DiskCache)
+    with pytest.raises(ValueError):
+        create_cache("s3://bucket")
@@ -0,0 +1,98 @@
+"""Tests for near-duplicate answer merging before the LLM."""
+from unittest.mock import patch
+import pytest
+from event_server import llm
+from event_server.cache import MemoryCache, NullCache
+from event_server.dedup import compress_feedback, near_duplicate_groups
+from event_server.prompts import format_answer
+from event_server.tests.test_llm import FakeAnthropic
+
+pytest.importorskip("numpy")
+
+ANSWERS = [
+    "More time for discussion",
+    "Needed more discussion time",
+    "Audio quality was poor",
+    "Poor audio quality",
+    "Great examples",
+    "ok",
+    "OK",
+]
+
+
+def feedback(answers, question="Q1"):
+    return [
+        {"question": question, "answer": answer, "timestamp": f"2025-11-05T20:00:{i:02d}"}
+        for i, answer in enumerate(answers)
+    ]
+
+
+def test_near_duplicates_share_the_earliest_label():
+    """Test similar answers are grouped under the first of them, others stay alone."""
+    assert near_duplicate_groups(ANSWERS) == [0, 0, 2, 2, 4, 5, 5]
+    assert near_duplicate_groups([]) == []
+
+
+def test_groups_do_not_cross_keys():
+    """Test identical answers to different questions are kept apart."""
+    assert near_duplicate_groups(["Poor audio", "Poor audio"], keys=[0, 1]) == [0, 1]
+
+
+def test_compress_feedback_counts_groups():
+    """Test one item per group in first-seen order, with counts for merged groups."""
+    items = feedback(ANSWERS) + feedback(["Poor audio quality"], question="Q2")
+    compressed = compress_feedback(items)
+    assert [(item["question"], item["answer"], item.get("count")) for item in compressed] == [
+        ("Q1", "More time for discussion", 2),
+        ("Q1", "Audio quality was poor", 2),
+        ("Q1", "Great examples", None),
+        ("Q1", "ok", 2),
+        ("Q2", "Poor audio quality", None),
+    ]
+    assert compressed[0]["timestamp"] == items[0]["timestamp"]
+    assert "count" not in items[0]
+
+
+def test_format_answer_mentions_count():
+    """Test merged items tell the model how many participants they stand for."""
+    item = compress_feedback(feedback(ANSWERS[:2]))[0]
+    assert format_answer(item) == "- More time for discussion (2 similar answers)"
+    assert format_answer(feedback(ANSWERS[:1])[0]) == "- More time for discussion"
+
+
+def test_report_prompt_is_deduplicated_when_enabled():
+    """Test REPORT_DEDUP_THRESHOLD shrinks the prompt and changes the cache key."""
+    items = feedback(ANSWERS * 20)
+    key = llm.report_key(items)
+    client = FakeAnthropic()
+    with patch.object(llm, "DEDUP_THRESHOLD", 0.6):
+        assert llm.report_key(items) != key
+        llm.generate_report(items, client=client, cache=NullCache())
+    prompt = client.prompts[0]
+    assert prompt.count("\n- ") == 4
+    assert "- More time for discussion (40 similar answers)" in prompt
+    assert "- Great examples (20 similar answers)" in prompt
+
+
+def test_merging_keeps_chunk_summaries_reusable():
+    """Test answers are merged within each chunk, so full chunks are not re-summarized."""
+    items = feedback(ANSWERS * 6)
+    client = FakeAnthropic()
+    cache = MemoryCache()
+    with patch.object(llm, "DEDUP_THRESHOLD", 0.6):
+        assert [len(chunk) for chunk in llm.chunk_feedback(items, 40)] == [6] * 7
+        llm.generate_report(items[:35], client=client, cache=cache, chunk_tokens=40)
+        assert len(client.prompts) == 7  # 6 chunks + final
+        llm.generate_report(items, client=client, cache=cache, chunk_tokens=40)
+    # Chunks 1-5 are unchanged; chunk 6 gained an answer and chunk 7 is new
+    assert len(client.prompts) == 10
+    assert "- More time for discussion (2 similar answers)" in client.prompts[0]
+
+
+def test_fold_prompt_is_deduplicated_when_enabled():
+    """Test rolling folds also see each group once, with its count."""
+    client = FakeAnthropic()
+    with patch.object(llm, "DEDUP_THRESHOLD", 0.6):
+        llm.fold_feedback({}, feedback(ANSWERS[:2]), client=client, cache=NullCache())
+    assert "- More time for discussion (2 similar answers)" in client.prompts[0]
+    assert "Needed more" not in client.prompts[0]
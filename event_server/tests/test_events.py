@@ -0,0 +1,71 @@
+"""Tests for the Server-Sent Events channel."""
+import json
+from event_server.app import app
+from event_server.events import VersionWatcher, format_event, stream_events
+from event_server.models import SessionData
+
+
+def _parse(messages):
+    """Return (event, data) pairs from SSE messages, skipping comments and retry."""
+    events = []
+    for message in messages:
+        fields = dict(line.split(": ", 1) for line in message.strip().splitlines() if ": " in line)
+        if "event" in fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_format_event():
+    """Test SSE message framing."""
+    assert format_event("questions", {"questions": []}, 3) == (
+        'event: questions\nid: 3\ndata: {"questions": []}\n\n'
+    )
+
+
+def test_stream_starts_with_current_state():
+    """Test a new stream describes the current questions and closure."""
+    session = SessionData(session_id="test")
+    session.questions = ["Q1"]
+    session.is_collecting = False
+    watcher = VersionWatcher(session, interval=0.01)
+
+    stream = stream_events(watcher, heartbeat=0.05, max_seconds=0.2)
+    assert next(stream) == "retry: 3000\n\n"
+    assert _parse([next(stream), next(stream)]) == [
+        ("questions", {"questions": ["Q1"]}),
+        ("collection-closed", {}),
+    ]
+
+
+def test_stream_pushes_changes():
+    """Test changes made while streaming are pushed, with admin-only events."""
+    session = SessionData(session_id="test")
+    watcher = VersionWatcher(session, interval=0.01)
+    stream = stream_events(watcher, admin=True, heartbeat=0.05, max_seconds=1)
+    next(stream)
+    initial = _parse([next(stream), next(stream)])
+    assert initial == [("questions", {"questions": []}), ("responses", {"response_count": 0})]
+
+    session.add_items([{"question": "Q1", "answer": "A"}])
+    session.generated_report = "Report"
+    events = []
+    for message in stream:
+        events += _parse([message])
+        if ("report-ready", {}) in events:
+            break
+    assert ("responses", {"response_count": 1}) in events
+
+
+def test_stream_sends_heartbeats_and_ends():
+    """Test an idle stream sends keepalive comments and stops at max_seconds."""
+    watcher = VersionWatcher(SessionData(session_id="test"), interval=0.01)
+    messages = list(stream_events(watcher, heartbeat=0.02, max_seconds=0.1))
+    assert ": keepalive\n\n" in messages
+
+
+def test_events_endpoint_is_event_stream():
+    """Test /api/events responds with an SSE stream."""
+    response = app.test_client().get("/api/events", buffered=False)
+    assert response.mimetype == "text/event-stream"
+    assert next(response.response) == b"retry: 3000\n\n"
+    response.close()
@@ -0,0 +1,79 @@
+"""Tests for closing collection at the expire time."""
+import threading
+from datetime import datetime, timedelta
+from event_server.app import app, current_tenant, session_data
+from event_server.expiry import ExpiryScheduler
+from event_server.models import SessionData
+from event_server.reports import ReportJobs
+from event_server.store import MemoryStore
+from event_server.tests.test_reports import make_jobs, wait_for
+from event_server.tests.test_sample_data import SAMPLE_FEEDBACK
+
+
+def test_closes_only_after_expire_time():
+    """Test collection stays open until the deadline and is closed once after it."""
+    session, jobs = make_jobs(lambda feedback: "report")
+    scheduler = ExpiryScheduler(session, jobs)
+    assert not scheduler.step()
+
+    session.expire_time = datetime.now() + timedelta(minutes=5)
+    assert not scheduler.step()
+    assert session.is_collecting
+
+    assert scheduler.step(now=datetime.now() + timedelta(minutes=6))
+    assert not session.is_collecting
+    assert not scheduler.step(now=datetime.now() + timedelta(minutes=7))
+
+
+def test_auto_report_runs_once_across_workers():
+    """Test two workers sharing a store close collection and start the report once."""
+    calls = []
+    gate = threading.Event()
+    session, jobs = make_jobs(lambda feedback: gate.wait() and (calls.append(len(feedback)) or "report"))
+    other = SessionData(session_id="test", store=session.store)
+    schedulers = [
+        ExpiryScheduler(session, jobs, auto_report=True),
+        ExpiryScheduler(other, ReportJobs(other, generate=jobs.generate), auto_report=True),
+    ]
+    session.expire_time = datetime.now() - timedelta(seconds=1)
+
+    assert [scheduler.step() for scheduler in schedulers] == [True, False]
+    job = session.store.get("report_inflight")
+    gate.set()
+    assert wait_for(jobs, job["id"])["report"] == "report"
+    assert calls == [len(SAMPLE_FEEDBACK)]
+
+
+def test_no_report_without_feedback():
+    """Test expiry with no answers closes collection but starts no job."""
+    session = SessionData(session_id="test", store=MemoryStore())
+    jobs = ReportJobs(session, generate=lambda feedback: "report")
+    session.expire_time = datetime.now() - timedelta(seconds=1)
+    assert ExpiryScheduler(session, jobs, auto_report=True).step()
+    assert session.store.get("report_inflight") is None
+
+
+def test_health_reports_heartbeat(monkeypatch):
+    """Test /health carries the time since the last session request and until expiry."""
+    monkeypatch.setattr(session_data, "store", MemoryStore())
+    monkeypatch.setattr(current_tenant(), "activity_noted", 0.0)
+    client = app.test_client()
+    health = client.get("/health").get_json()
+    assert health["expires_in"] is None
+    assert health["idle_seconds"] is None
+
+    client.post("/api/expire-time", json={"minutes": 10})
+    health = client.get("/health").get_json()
+    assert 0 <= health["idle_seconds"] < 5
+    assert 590 < health["expires_in"] <= 600
+
+
+def test_submission_after_expire_time_is_refused(monkeypatch):
+    """Test a submission past the deadline is refused before any scheduler pass closes collection."""
+    monkeypatch.setattr(session_data, "store", MemoryStore())
+    session_data.expire_time = datetime.now() - timedelta(seconds=1)
+    response = app.test_client().post("/api/submit-feedback", json={"items": [{"question": "Q", "answer": "A"}]})
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Data collection is closed"
+    assert session_data.store.feedback_count() == 0
+    assert not session_data.is_collecting
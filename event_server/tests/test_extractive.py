@@ -0,0 +1,71 @@
+"""Tests for the offline extractive summarizer and report backends."""
+import os
+from unittest.mock import patch
+import pytest
+from event_server.backends import AnthropicBackend, ExtractiveBackend, create_backend
+from event_server.extractive import question_themes, summarize, tokenize
+from event_server.tests.test_sample_data import SAMPLE_FEEDBACK
+
+ANSWERS = [
+    "More time for discussion please",
+    "The discussion needed more time",
+    "Discussion time was too short",
+    "Audio quality was poor",
+    "Poor audio, could not hear the speaker",
+    "Hard to hear, audio kept cutting out",
+    "Great examples",
+]
+
+
+def test_tokenize_drops_stopwords_and_short_words():
+    """Test tokens are lowercase content words."""
+    assert tokenize("The Discussion was TOO short, ok?") == ["discussion", "short"]
+
+
+def test_themes_group_similar_answers():
+    """Test answers sharing keywords land in one theme with a member as the quote."""
+    themes = question_themes(ANSWERS, max_themes=2)
+    assert len(themes) == 2
+    by_keyword = {theme.keywords[0]: theme for theme in themes}
+    assert set(by_keyword) == {"discussion", "audio"}
+    assert by_keyword["discussion"].count == 3
+    assert by_keyword["audio"].quote in ANSWERS[3:6]
+
+
+def test_summarize_is_deterministic():
+    """Test the report lists every question and is the same on every run."""
+    feedback = [
+        {"question": "Q1", "answer": answer, "timestamp": "2025-11-05T20:00:00"}
+        for answer in ANSWERS
+    ] + SAMPLE_FEEDBACK
+    report = summarize(feedback)
+    assert report == summarize(feedback)
+    assert "## Q1 (7 answers)" in report
+    assert "## What did you think about the session? (2 answers)" in report
+    assert "(3 answers, 43%)" in report
+
+
+def test_summarize_without_common_words_quotes_answers():
+    """Test questions with no shared keywords fall back to quoting answers."""
+    report = summarize(SAMPLE_FEEDBACK[:1])
+    assert f'- "{SAMPLE_FEEDBACK[0]["answer"]}"' in report
+
+
+def test_create_backend():
+    """Test REPORT_BACKEND selects the backend, and auto falls back offline."""
+    assert isinstance(create_backend("extractive"), ExtractiveBackend)
+    with patch.dict(os.environ, {"REPORT_BACKEND": "auto"}, clear=True):
+        assert isinstance(create_backend(), ExtractiveBackend)
+    with patch.dict(os.environ, {"REPORT_BACKEND": "auto", "ANTHROPIC_API_KEY": "key"}):
+        assert isinstance(create_backend(), AnthropicBackend)
+    with pytest.raises(ValueError):
+        create_backend("gpt")
+
+
+def test_extractive_backend_needs_no_key():
+    """Test the offline backend works with no API key and streams one chunk."""
+    backend = ExtractiveBackend()
+    with patch.dict(os.environ, {}, clear=True):
+        report = backend.generate(SAMPLE_FEEDBACK, rolling=None)
+        assert list(backend.stream(SAMPLE_FEEDBACK)) == [report]
+    assert backend.generate([]) == "No feedback collected yet."
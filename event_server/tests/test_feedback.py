@@ -0,0 +1,47 @@
+"""Tests for the columnar FeedbackLog."""
+import pytest
+from event_server.feedback import FeedbackLog
+from event_server.tests.test_sample_data import SAMPLE_FEEDBACK
+
+
+def test_roundtrips_dict_shape():
+    """Test items come back exactly as they went in."""
+    log = FeedbackLog()
+    log.extend(SAMPLE_FEEDBACK)
+    assert len(log) == 4
+    assert log.to_dicts() == SAMPLE_FEEDBACK
+    assert log.to_dicts(3) == SAMPLE_FEEDBACK[3:]
+    assert log.to_dicts(4) == []
+
+
+def test_questions_are_interned():
+    """Test each distinct question is stored once."""
+    log = FeedbackLog()
+    log.extend(SAMPLE_FEEDBACK)
+    assert log._questions == [
+        "What did you think about the session?",
+        "What improvements would you suggest?",
+    ]
+
+
+def test_record_view():
+    """Test records are slot-based views over the columns."""
+    log = FeedbackLog()
+    log.extend(SAMPLE_FEEDBACK)
+    record = log[-1]
+    assert not hasattr(record, "__dict__")
+    assert record.question == SAMPLE_FEEDBACK[3]["question"]
+    assert record.answer == SAMPLE_FEEDBACK[3]["answer"]
+    assert isinstance(record.timestamp, float)
+    assert record.to_dict() == SAMPLE_FEEDBACK[3]
+    assert [r.answer for r in log] == [item["answer"] for item in SAMPLE_FEEDBACK]
+    with pytest.raises(IndexError):
+        log[4]
+
+
+def test_non_ascii_answers():
+    """Test answers are split correctly in the UTF-8 buffer."""
+    log = FeedbackLog()
+    log.append("Q", "très bien 👍", 0.0)
+    log.append("Q", "ok", 0.0)
+    assert [r.answer for r in log] == ["très bien 👍", "ok"]
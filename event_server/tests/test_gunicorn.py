@@ -0,0 +1,112 @@
+"""Tests that boot the event server under the image's gunicorn config."""
+import contextlib
+import json
+import os
+import signal
+import socket
+import subprocess
+import time
+import urllib.request
+import pytest
+
+pytest.importorskip("gunicorn")
+pytest.importorskip("gevent")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+COMMAND = ["gunicorn", "-c", "gunicorn.conf.py", "event_server.app:app"]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def serve(tmp_path, **settings):
+    """Run a gunicorn server (gevent workers) on a free port; yields a request function.
+
+    `settings` override the environment; None unsets a variable.
+    """
+    port = _free_port()
+    env = {
+        **os.environ,
+        "PORT": str(port),
+        "WEB_CONCURRENCY": "2",
+        "SESSION_ID": "gunicorn-test",
+        "SESSION_STORE": f"sqlite:///{tmp_path}/session.db",
+        "REPORT_BACKEND": "extractive",
+        "REPORT_CACHE": "none",
+        **settings,
+    }
+    env = {key: value for key, value in env.items() if value is not None}
+    env.pop("GUNICORN_WORKER_CLASS", None)
+    with open(tmp_path / "gunicorn.log", "w") as log:
+        process = subprocess.Popen(
+            COMMAND, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT, start_new_session=True
+        )
+
+    def request(path: str, body: dict | None = None) -> tuple[int, dict]:
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(
+            f"http://127.0.0.1:{port}{path}", data=data, headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(req, timeout=5) as response:
+            return response.status, json.loads(response.read())
+
+    try:
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                request("/health")
+                break
+            except OSError:
+                assert time.monotonic() < deadline, (tmp_path / "gunicorn.log").read_text()
+                time.sleep(0.1)
+        yield request
+    finally:
+        # Stop it as `docker stop` would, then make sure nothing is left
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        finally:
+            with contextlib.suppress(ProcessLookupError):
+                os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+
+
+@pytest.fixture
+def server(tmp_path):
+    # No SESSION_ID: the workers must still agree on one session
+    with serve(tmp_path, SESSION_ID=None) as request:
+        yield request
+
+
+def test_report_job_completes(server):
+    """Test a background report job runs to the end in a gevent worker."""
+    assert server("/api/submit-feedback", {"items": [{"question": "Q", "answer": "Great talk"}]})[0] == 200
+    status, body = server("/api/generate-report", {})
+    assert status == 202
+
+    deadline = time.monotonic() + 10
+    while (job := server(f"/api/report-jobs/{body['job']['id']}")[1]["job"])["status"] == "running":
+        assert time.monotonic() < deadline, "report job did not finish"
+        time.sleep(0.1)
+    assert job["status"] == "done"
+    assert len({server("/api/state")[1]["session_id"] for _ in range(10)}) == 1
+    # The worker is still serving
+    assert server("/health")[0] == 200
+
+
+def test_wal_store_runs_one_worker(tmp_path):
+    """Test wal:// runs one worker however many are asked for, and is shredded on stop."""
+    with serve(tmp_path, WEB_CONCURRENCY="4", SESSION_STORE=f"wal://{tmp_path}/wal") as server:
+        for n in range(4):
+            assert server("/api/submit-feedback", {"items": [{"question": "Q", "answer": f"A{n}"}]})[0] == 200
+        assert len(server("/api/state")[1]["feedback"]) == 4
+    log = (tmp_path / "gunicorn.log").read_text()
+    assert log.count("Booting worker") == 1
+    # Stopping the server ends the session: its log is shredded
+    assert "Shredded 1 session write-ahead log(s)" in log
+    assert os.path.getsize(tmp_path / "wal" / "gunicorn-test.wal") == 0
+    assert not os.path.exists(tmp_path / "wal" / "gunicorn-test.snapshot")
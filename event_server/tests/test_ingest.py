@@ -0,0 +1,96 @@
+"""Tests for batched feedback ingestion."""
+import threading
+import pytest
+from event_server.ingest import IngestQueue, QueueFull, SubmissionError, parse_submission
+from event_server.models import SessionData
+from event_server.store import MemoryStore
+
+
+class CountingStore(MemoryStore):
+    """MemoryStore that records the size of every append."""
+
+    def __init__(self, gate=None):
+        super().__init__()
+        self.appends = []
+        self.gate = gate
+
+    def append_feedback(self, items):
+        if self.gate:
+            self.gate.wait()
+        self.appends.append(len(items))
+        return super().append_feedback(items)
+
+
+def test_parse_items_format():
+    """Test items are validated, empty answers skipped and stamped once."""
+    records = parse_submission(
+        {"items": [{"question": "Q1", "answer": "A"}, {"question": "Q2", "answer": ""}]},
+        [],
+        max_items=10,
+    )
+    assert [(r["question"], r["answer"]) for r in records] == [("Q1", "A")]
+    assert "timestamp" in records[0]
+
+
+def test_parse_answers_format_uses_questions():
+    """Test the old answers format pairs answers with the session questions."""
+    records = parse_submission({"answers": ["A1", "A2"]}, ["Q1", "Q2"], max_items=10)
+    assert [(r["question"], r["answer"]) for r in records] == [("Q1", "A1"), ("Q2", "A2")]
+    assert records[0]["timestamp"] == records[1]["timestamp"]
+
+
+@pytest.mark.parametrize("body", [
+    None,
+    {"items": "not a list"},
+    {"items": [{"question": "Q", "answer": 5}]},
+    {"answers": "A1"},
+])
+def test_parse_rejects_malformed(body):
+    """Test malformed bodies raise a 400 SubmissionError."""
+    with pytest.raises(SubmissionError) as exc_info:
+        parse_submission(body, ["Q1"], max_items=10)
+    assert exc_info.value.status == 400
+
+
+def test_parse_rejects_too_many_items():
+    """Test the per-request item limit."""
+    items = [{"question": "Q", "answer": "A"}] * 3
+    with pytest.raises(SubmissionError) as exc_info:
+        parse_submission({"items": items}, [], max_items=2)
+    assert exc_info.value.status == 413
+
+
+def test_concurrent_submissions_are_group_committed():
+    """Test concurrent submissions are stored exactly once, in few batches."""
+    store = CountingStore()
+    ingest = IngestQueue(SessionData(session_id="test", store=store), max_delay=0.05)
+    record = {"question": "Q", "answer": "A", "timestamp": "2025-11-05T20:00:00"}
+
+    threads = [threading.Thread(target=ingest.submit, args=([record] * 2,)) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert store.feedback_count() == 40
+    assert len(store.appends) < 20
+    assert ingest.pending == 0
+
+
+def test_full_queue_raises():
+    """Test backpressure once max_pending items are waiting."""
+    gate = threading.Event()
+    store = CountingStore(gate)
+    ingest = IngestQueue(SessionData(session_id="test", store=store), max_pending=2)
+    record = {"question": "Q", "answer": "A", "timestamp": "2025-11-05T20:00:00"}
+
+    waiting = threading.Thread(target=ingest.submit, args=([record, record],))
+    waiting.start()
+    while ingest.pending < 2:
+        pass
+    with pytest.raises(QueueFull):
+        ingest.submit([record])
+
+    gate.set()
+    waiting.join()
+    assert store.feedback_count() == 2
@@ -1,11 +1,24 @@
 """Tests for LLM report generation."""
 import pytest
 import os
+import threading
+import time
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock
-from event_server.llm import generate_report
+from event_server.cache import MemoryCache
+from event_server.llm_client import reset_clients
+from event_server.llm import cached_report, chunk_feedback, generate_report, report_cache, stream_report
+from event_server.prompts import header_tokens, item_tokens
 from event_server.tests.test_sample_data import SAMPLE_FEEDBACK
 
 
+@pytest.fixture(autouse=True)
+def empty_cache():
+    """Reports and clients are shared per process; start every test afresh."""
+    report_cache.clear()
+    reset_clients()
+
+
 def test_generate_report_no_api_key():
     """Test that generate_report raises error without API key."""
     with patch.dict(os.environ, {}, clear=True):
@@ -20,7 +33,7 @@ def test_generate_report_empty_feedback():
         assert result == "No feedback collected yet."
 
 
-@patch('event_server.llm.Anthropic')
+@patch('event_server.llm_client.Anthropic')
 def test_generate_report_success(mock_anthropic_class):
     """Test successful report generation."""
     # Mock the Anthropic client
@@ -38,8 +51,10 @@ def test_generate_report_success(mock_anthropic_class):
     # Verify the result
     assert result == "This is a test report about the feedback."
     
-    # Verify Anthropic was called correctly
-    mock_anthropic_class.assert_called_once_with(api_key="test-key")
+    # Verify the shared client was built once, with SDK retries off
+    mock_anthropic_class.assert_called_once()
+    assert mock_anthropic_class.call_args.kwargs["api_key"] == "test-key"
+    assert mock_anthropic_class.call_args.kwargs["max_retries"] == 0
     mock_client.messages.create.assert_called_once()
     
     # Verify the model and parameters
@@ -55,7 +70,7 @@ def test_generate_report_success(mock_anthropic_class):
     assert "insightful and engaging" in prompt
 
 
-@patch('event_server.llm.Anthropic')
+@patch('event_server.llm_client.Anthropic')
 def test_generate_report_formats_feedback_correctly(mock_anthropic_class):
     """Test that feedback is formatted correctly in the prompt."""
     mock_client = MagicMock()
@@ -77,6 +92,183 @@ def test_generate_report_formats_feedback_correctly(mock_anthropic_class):
         generate_report(test_feedback)
     
     prompt = mock_client.messages.create.call_args.kwargs["messages"][0]["content"]
-    assert "Q: Test Q?" in prompt
-    assert "A: Test A." in prompt
-    assert "Timestamp: 2025-11-05T10:00:00" in prompt
+    assert "Q: Test Q?\n- Test A." in prompt
+    assert "2025-11-05" not in prompt
+
+
+@patch('event_server.llm_client.Anthropic')
+def test_stream_report_yields_text(mock_anthropic_class):
+    """Test stream_report uses the streaming API and yields text chunks."""
+    mock_client = MagicMock()
+    mock_anthropic_class.return_value = mock_client
+    mock_stream = mock_client.messages.stream.return_value.__enter__.return_value
+    mock_stream.text_stream = iter(["Themes: ", "timing, ", "audio."])
+
+    with patch.dict(os.environ, {"ANTHROPIC_API_KEY": "test-key"}):
+        chunks = list(stream_report(SAMPLE_FEEDBACK))
+
+    assert chunks == ["Themes: ", "timing, ", "audio."]
+    call_kwargs = mock_client.messages.stream.call_args.kwargs
+    assert call_kwargs["model"] == "claude-3-5-haiku-20241022"
+    assert "insightful and engaging" in call_kwargs["messages"][0]["content"]
+
+
+def test_stream_report_checks_api_key_eagerly():
+    """Test a missing API key is raised before any streaming starts."""
+    with patch.dict(os.environ, {}, clear=True):
+        with pytest.raises(ValueError, match="ANTHROPIC_API_KEY"):
+            stream_report(SAMPLE_FEEDBACK)
+
+
+class FakeAnthropic:
+    """Stands in for the Anthropic client: records prompts, answers by prompt kind."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.prompts = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self.messages = self
+
+    def create(self, model, max_tokens, messages):
+        prompt = messages[0]["content"]
+        with self._lock:
+            self.prompts.append(prompt)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        kind = "partial" if "has been split into parts" in prompt else "report"
+        return SimpleNamespace(content=[SimpleNamespace(text=f"{kind} {len(self.prompts)}")])
+
+
+def make_feedback(count):
+    return [
+        {"question": "Q?", "answer": f"Answer number {n} " + "x" * 200, "timestamp": "2025-11-05T20:00:00"}
+        for n in range(count)
+    ]
+
+
+def chunk_budget(feedback, per_chunk):
+    """Budget that fits `per_chunk` items of `make_feedback()` in each chunk."""
+    return header_tokens(feedback[0]["question"]) + item_tokens(feedback[0]) * per_chunk
+
+
+def test_chunk_feedback_respects_budget():
+    """Test chunks stay within the token budget and keep every item in order."""
+    feedback = make_feedback(20)
+    budget = chunk_budget(feedback, 3)
+    chunks = chunk_feedback(feedback, budget)
+    assert [len(chunk) for chunk in chunks] == [3, 3, 3, 3, 3, 3, 2]
+    assert [item for chunk in chunks for item in chunk] == feedback
+    assert chunk_feedback(feedback[:1], budget) == [feedback[:1]]
+
+
+def test_small_session_uses_one_call():
+    """Test feedback within budget is summarized in a single call."""
+    client = FakeAnthropic()
+    assert generate_report(SAMPLE_FEEDBACK, client=client) == "report 1"
+    assert len(client.prompts) == 1
+
+
+def test_map_reduce_large_session():
+    """Test large sessions are summarized per chunk, concurrently, then reduced."""
+    client = FakeAnthropic(delay=0.05)
+    feedback = make_feedback(40)
+    budget = chunk_budget(feedback, 10)
+
+    report = generate_report(feedback, client=client, chunk_tokens=budget, concurrency=2)
+
+    chunk_prompts = [p for p in client.prompts if "has been split into parts" in p]
+    assert len(chunk_prompts) == 4
+    assert all(f"Answer number {n} " in "".join(chunk_prompts) for n in range(40))
+    assert client.max_active == 2
+    final = client.prompts[-1]
+    assert "Summary of part 4 of 4" in final
+    assert report == "report 5"
+
+
+def test_reduce_combines_summaries_that_do_not_fit():
+    """Test summaries are combined in groups when they exceed one prompt."""
+    client = FakeAnthropic()
+    feedback = make_feedback(40)
+    budget = chunk_budget(feedback, 1)
+
+    generate_report(feedback, client=client, chunk_tokens=budget)
+
+    assert sum("has been split into parts" in p for p in client.prompts) == 40
+    assert "Summary of part 40 of 40" not in client.prompts[-1]
+    assert len(client.prompts) > 41
+
+
+def test_stream_report_map_reduce():
+    """Test streaming runs the map step first and streams only the final call."""
+    client = FakeAnthropic()
+    stream = MagicMock()
+    stream.__enter__.return_value.text_stream = iter(["Final"])
+    client.stream = MagicMock(return_value=stream)
+    feedback = make_feedback(6)
+    budget = chunk_budget(feedback, 2)
+
+    assert list(stream_report(feedback, client=client, chunk_tokens=budget)) == ["Final"]
+    assert len(client.prompts) == 3
+    assert "Summary of part 3 of 3" in client.stream.call_args.kwargs["messages"][0]["content"]
+
+
+def test_report_is_cached():
+    """Test the same feedback is served from the cache, with hit and miss counts."""
+    client = FakeAnthropic()
+    cache = MemoryCache()
+    assert cached_report(SAMPLE_FEEDBACK, cache) is None
+    first = generate_report(SAMPLE_FEEDBACK, client=client, cache=cache)
+    assert generate_report(SAMPLE_FEEDBACK, client=client, cache=cache) == first
+    assert cached_report(SAMPLE_FEEDBACK, cache) == first
+    assert len(client.prompts) == 1
+    assert cache.stats.to_dict() == {"hits": 2, "misses": 2, "evictions": 0}
+
+    changed = [dict(SAMPLE_FEEDBACK[0], answer="Different")] + SAMPLE_FEEDBACK[1:]
+    generate_report(changed, client=client, cache=cache)
+    assert len(client.prompts) == 2
+
+
+def test_new_answers_only_resummarize_last_chunk():
+    """Test chunk summaries are reused when answers are appended."""
+    client = FakeAnthropic()
+    cache = MemoryCache()
+    feedback = make_feedback(12)
+    budget = chunk_budget(feedback, 4)
+
+    generate_report(feedback[:10], client=client, cache=cache, chunk_tokens=budget)
+    assert len(client.prompts) == 4  # 3 chunks + final
+    generate_report(feedback, client=client, cache=cache, chunk_tokens=budget)
+    # Chunks 1-2 are unchanged; chunk 3 gained two answers
+    assert len(client.prompts) == 6
+
+
+def test_stream_report_caches_completed_stream():
+    """Test a finished stream is cached and replayed as one chunk."""
+    client = FakeAnthropic()
+    stream = MagicMock()
+    stream.__enter__.return_value.text_stream = iter(["A ", "report"])
+    client.stream = MagicMock(return_value=stream)
+    cache = MemoryCache()
+
+    assert list(stream_report(SAMPLE_FEEDBACK, client=client, cache=cache)) == ["A ", "report"]
+    assert list(stream_report(SAMPLE_FEEDBACK, client=client, cache=cache)) == ["A report"]
+    assert client.stream.call_count == 1
+
+
+@patch('event_server.llm_client.Anthropic')
+def test_client_is_reused_across_reports(mock_anthropic_class):
+    """Test one client (and connection pool) serves every report in the process."""
+    mock_client = mock_anthropic_class.return_value
+    mock_client.messages.create.return_value = MagicMock(content=[MagicMock(text="Report")])
+
+    with patch.dict(os.environ, {"ANTHROPIC_API_KEY": "test-key"}):
+        generate_report(SAMPLE_FEEDBACK)
+        generate_report(SAMPLE_FEEDBACK[:2])
+
+    mock_anthropic_class.assert_called_once()
+    assert mock_client.messages.create.call_count == 2
@@ -0,0 +1,179 @@
+"""Tests for the shared Anthropic client, against a local HTTP stub of the API."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import anthropic
+import pytest
+from event_server.llm_client import CircuitBreaker, CircuitOpen, ResilientClient, create_client
+from event_server.metrics import Metrics
+
+MESSAGE = {
+    "id": "msg_1",
+    "type": "message",
+    "role": "assistant",
+    "model": "claude-3-5-haiku-20241022",
+    "content": [{"type": "text", "text": "Stub report"}],
+    "stop_reason": "end_turn",
+    "stop_sequence": None,
+    "usage": {"input_tokens": 10, "output_tokens": 2},
+}
+
+
+class StubAPI(BaseHTTPRequestHandler):
+    """Answers POST /v1/messages from `server.script`: (status, delay) per request, then 200."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests += 1
+        status, delay = self.server.script.pop(0) if self.server.script else (200, 0)
+        time.sleep(delay)
+        body = json.dumps(MESSAGE if status == 200 else {
+            "type": "error", "error": {"type": "api_error", "message": f"status {status}"},
+        }).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            if status == 429:
+                self.send_header("Retry-After", "0")
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            pass  # the client timed out and hung up
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubAPI)
+    server.script = []
+    server.requests = 0
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(stub, monkeypatch):
+    monkeypatch.setenv("LLM_READ_TIMEOUT", "0.3")
+    monkeypatch.setenv("LLM_BACKOFF_BASE", "0.01")
+    monkeypatch.setenv("LLM_MAX_RETRIES", "2")
+    monkeypatch.setenv("LLM_BREAKER_THRESHOLD", "3")
+    return create_client("test-key", base_url=f"http://127.0.0.1:{stub.server_port}")
+
+
+def create(client):
+    return client.messages.create(
+        model="claude-3-5-haiku-20241022",
+        max_tokens=100,
+        messages=[{"role": "user", "content": "Hi"}],
+    )
+
+
+def test_success(client, stub):
+    """Test a plain call goes through the stub."""
+    assert create(client).content[0].text == "Stub report"
+    assert stub.requests == 1
+
+
+def test_retries_rate_limits_and_server_errors(client, stub):
+    """Test 429 and 5xx responses are retried until one succeeds."""
+    stub.script = [(429, 0), (503, 0)]
+    assert create(client).content[0].text == "Stub report"
+    assert stub.requests == 3
+
+
+def test_client_errors_are_not_retried(client, stub):
+    """Test a 400 is raised at once and does not count against the breaker."""
+    stub.script = [(400, 0)]
+    with pytest.raises(anthropic.BadRequestError):
+        create(client)
+    assert stub.requests == 1
+    assert client.breaker.failures == 0
+
+
+def test_read_timeout(client, stub):
+    """Test a hung upstream times out instead of holding the worker."""
+    stub.script = [(200, 1.0)] * 3
+    started = time.monotonic()
+    with pytest.raises(anthropic.APITimeoutError):
+        create(client)
+    assert time.monotonic() - started < 2.0
+    assert stub.requests == 3
+
+
+def test_breaker_opens_and_fails_fast(client, stub):
+    """Test repeated failures open the circuit, so later calls never reach the stub."""
+    stub.script = [(500, 0)] * 3
+    with pytest.raises(anthropic.InternalServerError):
+        create(client)
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpen):
+        create(client)
+    assert stub.requests == 3
+
+
+def test_breaker_half_open_trial():
+    """Test one trial call is let through after the cool-down."""
+    now = [0.0]
+    breaker = CircuitBreaker(threshold=1, reset_after=10, clock=lambda: now[0])
+    breaker.record_failure()
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    now[0] = 10
+    breaker.before_call()
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()  # only one trial at a time
+    breaker.record_failure()
+    assert breaker.state == "open"
+    now[0] = 20
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_interrupted_trial_lets_the_next_one_through():
+    """Test a trial ended by a BaseException does not leave the circuit stuck open."""
+    now = [0.0]
+    breaker = CircuitBreaker(threshold=1, reset_after=10, clock=lambda: now[0])
+    breaker.record_failure()
+    now[0] = 10
+    resilient = ResilientClient(None, breaker=breaker, sleep=lambda seconds: None)
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        resilient.call(interrupted)
+    assert resilient.call(lambda: "ok") == "ok"
+    assert breaker.state == "closed"
+
+
+def test_backoff_is_jittered_and_capped():
+    """Test delays grow exponentially with full jitter, up to the cap."""
+    client = ResilientClient(None, backoff_base=1, backoff_max=4)
+    error = RuntimeError()
+    delays = [client.backoff(attempt, error) for attempt in range(6) for _ in range(20)]
+    assert all(0 <= d <= 4 for d in delays)
+    assert len(set(delays)) > 1
+
+
+def test_calls_are_recorded_in_metrics(client, stub, monkeypatch):
+    """Test call latency, token usage and failures are exported."""
+    recorded = Metrics()
+    monkeypatch.setattr("event_server.llm_client.metrics", recorded)
+    create(client)
+    stub.script = [(400, 0)]
+    with pytest.raises(anthropic.BadRequestError):
+        create(client)
+
+    text = recorded.render()
+    assert 'event_server_llm_tokens_total{type="input"} 10' in text
+    assert 'event_server_llm_tokens_total{type="output"} 2' in text
+    assert 'event_server_llm_errors_total{kind="create",error="BadRequestError"} 1' in text
+    assert 'event_server_llm_request_duration_seconds_count{kind="create"} 2' in text
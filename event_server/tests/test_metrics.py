@@ -0,0 +1,98 @@
+"""Tests for the Prometheus metrics."""
+import json
+import os
+import pytest
+from event_server.app import app, session_data
+from event_server.cache import CacheStats
+from event_server.llm import report_cache
+from event_server.metrics import Metrics
+from event_server.store import MemoryStore
+
+
+def test_render_counters_and_histograms():
+    """Test the text format: labelled counters, cumulative buckets, sum and count."""
+    metrics = Metrics()
+    metrics.inc("event_server_http_requests_total", ("/api/state", "GET", "200"))
+    metrics.inc("event_server_http_requests_total", ("/api/state", "GET", "200"))
+    metrics.observe("event_server_http_request_duration_seconds", 0.003, ("/api/state",))
+    metrics.observe("event_server_http_request_duration_seconds", 0.2, ("/api/state",))
+    text = metrics.render({"event_server_feedback_items": ("Feedback items", 7)})
+
+    assert "# TYPE event_server_http_requests_total counter" in text
+    assert 'event_server_http_requests_total{route="/api/state",method="GET",status="200"} 2' in text
+    assert 'event_server_http_request_duration_seconds_bucket{route="/api/state",le="0.005"} 1' in text
+    assert 'event_server_http_request_duration_seconds_bucket{route="/api/state",le="0.1"} 1' in text
+    assert 'event_server_http_request_duration_seconds_bucket{route="/api/state",le="0.25"} 2' in text
+    assert 'event_server_http_request_duration_seconds_bucket{route="/api/state",le="+Inf"} 2' in text
+    assert 'event_server_http_request_duration_seconds_sum{route="/api/state"} 0.203' in text
+    assert 'event_server_http_request_duration_seconds_count{route="/api/state"} 2' in text
+    assert "event_server_feedback_items 7" in text
+    assert "process_resident_memory_bytes " in text
+
+
+def test_label_values_are_escaped():
+    """Test quotes and backslashes in label values cannot break the format."""
+    metrics = Metrics()
+    metrics.inc("event_server_llm_errors_total", ("create", 'Bad"Error\\'))
+    assert 'error="Bad\\"Error\\\\"} 1' in metrics.render()
+
+
+def test_workers_are_added_up_through_directory(tmp_path):
+    """Test a scrape reports every worker's counters, and only live workers' memory."""
+    for pid, rss in ((os.getppid(), 1000), (2 ** 22 + 1, 5000)):
+        with open(tmp_path / f"worker-{pid}.json", "w") as f:
+            json.dump({
+                "pid": pid,
+                "rss_bytes": rss,
+                "counters": {"event_server_feedback_ingested_total": [[[], 3]]},
+                "histograms": {},
+            }, f)
+    metrics = Metrics(str(tmp_path))
+    metrics.inc("event_server_feedback_ingested_total", value=4)
+    text = metrics.render()
+
+    assert "event_server_feedback_ingested_total 10" in text
+    assert "event_server_workers 2" in text
+    assert os.path.exists(tmp_path / f"worker-{os.getpid()}.json")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(session_data, "store", MemoryStore())
+    recorded = Metrics()
+    for module in ("event_server.ingest", "event_server.llm_client"):
+        monkeypatch.setattr(f"{module}.metrics", recorded)
+    # `event_server.app` resolves to the Flask app, so patch the module through a function
+    monkeypatch.setitem(app.view_functions["metrics_endpoint"].__globals__, "metrics", recorded)
+    return app.test_client()
+
+
+def test_metrics_endpoint(client):
+    """Test requests, state payload sizes, ingested feedback and the feedback gauge are exported."""
+    client.post("/api/submit-feedback", json={"items": [{"question": "Q", "answer": "A"}]})
+    client.get("/api/state")
+    client.get("/api/missing")
+    response = client.get("/metrics")
+    text = response.get_data(as_text=True)
+
+    assert response.mimetype == "text/plain"
+    assert 'event_server_http_requests_total{route="/api/state",method="GET",status="200"} 1' in text
+    assert 'event_server_http_requests_total{route="unmatched",method="GET",status="404"} 1' in text
+    assert 'event_server_state_payload_bytes_count{route="/api/state"} 1' in text
+    assert "event_server_feedback_ingested_total 1" in text
+    assert "event_server_feedback_items 1" in text
+
+
+def test_report_cache_stats_are_exported(monkeypatch):
+    """Test the report cache's hits, misses and evictions are counters on /metrics."""
+    monkeypatch.setattr(report_cache, "stats", CacheStats())
+    report_cache.clear()
+    report_cache.get("missing")
+    report_cache.set("present", "Report")
+    report_cache.get("present")
+
+    text = app.test_client().get("/metrics").get_data(as_text=True)
+    assert "# TYPE event_server_report_cache_hits_total counter" in text
+    assert "event_server_report_cache_hits_total 1" in text
+    assert "event_server_report_cache_misses_total 1" in text
+    assert "event_server_report_cache_evictions_total 0" in text
@@ -0,0 +1,84 @@
+"""Tests for prompt text building and token budgets."""
+from unittest.mock import patch
+from event_server import llm
+from event_server.cache import NullCache
+from event_server.prompts import (
+    estimate_tokens, feedback_tokens, format_feedback, sample_feedback, truncate,
+)
+from event_server.tests.test_llm import FakeAnthropic
+from event_server.tests.test_sample_data import SAMPLE_FEEDBACK
+
+
+def make_feedback(count, questions=("Q1", "Q2")):
+    return [
+        {
+            "question": questions[n % len(questions)],
+            "answer": f"Answer {n} about the pacing of the session",
+            "timestamp": "2025-11-05T20:00:00",
+        }
+        for n in range(count)
+    ]
+
+
+def test_estimate_tokens_counts_words_and_marks():
+    """Test words, number groups and punctuation count one token each; long words more."""
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("more time, please!") == 6
+    assert estimate_tokens("2025") == 3
+    assert estimate_tokens("internationalization") == 4
+
+
+def test_format_feedback_groups_answers_under_question():
+    """Test each question is written once, answers keep their order, no timestamps."""
+    text = format_feedback(SAMPLE_FEEDBACK)
+    assert text == (
+        "Q: What did you think about the session?\n"
+        f"- {SAMPLE_FEEDBACK[0]['answer']}\n"
+        f"- {SAMPLE_FEEDBACK[2]['answer']}\n\n"
+        "Q: What improvements would you suggest?\n"
+        f"- {SAMPLE_FEEDBACK[1]['answer']}\n"
+        f"- {SAMPLE_FEEDBACK[3]['answer']}"
+    )
+    assert estimate_tokens(text) <= feedback_tokens(SAMPLE_FEEDBACK)
+
+
+def test_truncate_marks_cut():
+    """Test long text is cut within the budget and short text is untouched."""
+    text = "word " * 100
+    cut = truncate(text, 20)
+    assert cut.endswith(" [...]")
+    assert estimate_tokens(cut) <= 20
+    assert truncate("short", 20) == "short"
+
+
+def test_sample_feedback_fits_budget_deterministically():
+    """Test sampling keeps every question, spreads picks evenly and repeats exactly."""
+    feedback = make_feedback(200)
+    budget = feedback_tokens(feedback) // 4
+    sampled = sample_feedback(feedback, budget)
+
+    assert feedback_tokens(sampled) <= budget
+    assert sampled == sample_feedback(feedback, budget)
+    assert {item["question"] for item in sampled} == {"Q1", "Q2"}
+    positions = [feedback.index(item) for item in sampled]
+    assert positions == sorted(positions)
+    assert positions[0] < 10 and positions[-1] > 180
+    assert sample_feedback(feedback, feedback_tokens(feedback)) is feedback
+
+
+def test_sample_feedback_keeps_one_answer_per_question():
+    """Test an impossible budget still leaves one answer for each question."""
+    sampled = sample_feedback(make_feedback(50, questions=("Q1", "Q2", "Q3")), 1)
+    assert [item["question"] for item in sampled] == ["Q1", "Q2", "Q3"]
+
+
+def test_report_respects_token_budget():
+    """Test REPORT_TOKEN_BUDGET samples the prompt and says how many answers there were."""
+    feedback = make_feedback(400)
+    client = FakeAnthropic()
+    with patch.object(llm, "TOKEN_BUDGET", 500):
+        llm.generate_report(feedback, client=client, cache=NullCache())
+    prompt = client.prompts[0]
+    assert len(client.prompts) == 1
+    assert "Q: Q1 (sampled from 200 answers)" in prompt
+    assert prompt.count("\n- ") < 100
@@ -0,0 +1,127 @@
+"""Tests for background report jobs."""
+import threading
+import time
+from event_server.models import SessionData
+from event_server.reports import INFLIGHT_KEY, ReportJobs
+from event_server.rolling import RollingSummarizer
+from event_server.store import MemoryStore
+from event_server.tests.test_sample_data import SAMPLE_FEEDBACK
+
+
+def make_jobs(generate, **kwargs):
+    session = SessionData(session_id="test", store=MemoryStore())
+    session.store.append_feedback(SAMPLE_FEEDBACK)
+    return session, ReportJobs(session, generate=generate, **kwargs)
+
+
+def wait_for(jobs, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while jobs.get(job_id)["status"] == "running":
+        assert time.monotonic() < deadline, "job did not finish"
+        time.sleep(0.01)
+    return jobs.get(job_id)
+
+
+def test_job_runs_in_background():
+    """Test submit returns at once and the job later holds the report."""
+    gate = threading.Event()
+    session, jobs = make_jobs(lambda feedback: gate.wait() and f"{len(feedback)} answers")
+
+    job = jobs.submit()
+    assert job["status"] == "running"
+    assert jobs.get(job["id"])["status"] == "running"
+
+    gate.set()
+    done = wait_for(jobs, job["id"])
+    assert done["status"] == "done"
+    assert done["report"] == "4 answers"
+    assert session.generated_report == "4 answers"
+    assert session.store.get(INFLIGHT_KEY) is None
+
+
+def test_concurrent_submits_share_one_call():
+    """Test concurrent requests for the same feedback make one LLM call."""
+    gate = threading.Event()
+    calls = []
+
+    def generate(feedback):
+        calls.append(len(feedback))
+        gate.wait()
+        return "Report"
+
+    session, jobs = make_jobs(generate)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(jobs.submit())) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len({job["id"] for job in results}) == 1
+    gate.set()
+    wait_for(jobs, results[0]["id"])
+    assert calls == [4]
+
+
+def test_new_feedback_starts_a_new_job():
+    """Test a different feedback snapshot is not collapsed into the running job."""
+    gate = threading.Event()
+    session, jobs = make_jobs(lambda feedback: gate.wait() and "Report")
+    first = jobs.submit()
+    session.store.append_feedback(SAMPLE_FEEDBACK[:1])
+    second = jobs.submit()
+    assert second["id"] != first["id"]
+    assert second["feedback_count"] == 5
+    gate.set()
+    wait_for(jobs, first["id"])
+    wait_for(jobs, second["id"])
+
+
+def test_late_job_does_not_replace_newer_report():
+    """Test a job for less feedback finishing last keeps the newer report."""
+    session = SessionData(session_id="test", store=MemoryStore())
+    jobs = ReportJobs(session, generate=lambda feedback: "unused")
+    session.store.append_feedback(SAMPLE_FEEDBACK[:1])
+    old, _ = jobs.claim()
+    session.store.append_feedback(SAMPLE_FEEDBACK[1:2])
+    new, _ = jobs.claim()
+
+    jobs.finish(new, "report of 2")
+    jobs.finish(old, "report of 1")
+    assert session.generated_report == "report of 2"
+    assert jobs.get(old["id"])["report"] == "report of 1"
+    assert jobs.get(new["id"])["status"] == "done"
+
+
+def test_failed_job_records_error():
+    """Test a failing LLM call marks the job failed and frees the slot."""
+    def generate(feedback):
+        raise RuntimeError("API down")
+
+    session, jobs = make_jobs(generate)
+    failed = wait_for(jobs, jobs.submit()["id"])
+    assert failed["status"] == "failed"
+    assert "API down" in failed["error"]
+    assert session.generated_report is None
+    assert jobs.claim()[1] is True
+
+
+def test_stale_claim_is_replaced():
+    """Test a claim left by a dead worker does not block new jobs forever."""
+    session, jobs = make_jobs(lambda feedback: "Report", stale_after=0)
+    session.store.set(**{INFLIGHT_KEY: {
+        "id": "dead", "status": "running", "feedback_count": 4, "created_at": 0,
+    }})
+    job, created = jobs.claim()
+    assert created
+    assert job["id"] != "dead"
+
+
+def test_job_starts_from_rolling_state():
+    """Test jobs pass the rolling summary state to the generator."""
+    seen = []
+    session, jobs = make_jobs(lambda feedback, rolling: seen.append(rolling) or "Report")
+    jobs.rolling = RollingSummarizer(session, fold=lambda summaries, feedback: {"Q": "summary"})
+    jobs.rolling.step()
+    wait_for(jobs, jobs.submit()["id"])
+    assert seen == [{"feedback_count": 4, "summaries": {"Q": "summary"}}]
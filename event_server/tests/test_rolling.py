@@ -0,0 +1,92 @@
+"""Tests for rolling summaries while collection is open."""
+from event_server.llm import fold_feedback, generate_report
+from event_server.models import SessionData
+from event_server.rolling import LEASE_NAME, ROLLING_KEY, RollingSummarizer
+from event_server.store import MemoryStore
+from event_server.cache import MemoryCache
+from event_server.tests.test_llm import FakeAnthropic
+from event_server.tests.test_sample_data import SAMPLE_FEEDBACK
+
+
+def make_session():
+    return SessionData(session_id="test", store=MemoryStore())
+
+
+def fake_fold(summaries, feedback):
+    folded = dict(summaries)
+    for item in feedback:
+        folded[item["question"]] = folded.get(item["question"], "") + item["answer"][:5] + ";"
+    return folded
+
+
+def test_step_folds_only_new_feedback():
+    """Test each step folds the feedback added since the last one."""
+    session = make_session()
+    folds = []
+    summarizer = RollingSummarizer(session, fold=lambda s, f: folds.append(len(f)) or fake_fold(s, f))
+
+    assert not summarizer.step()
+    session.store.append_feedback(SAMPLE_FEEDBACK[:3])
+    assert summarizer.step()
+    session.store.append_feedback(SAMPLE_FEEDBACK[3:])
+    assert summarizer.step()
+    assert not summarizer.step()
+
+    assert folds == [3, 1]
+    state = summarizer.state()
+    assert state["feedback_count"] == 4
+    assert state["summaries"]["What improvements would you suggest?"] == "Maybe;Would;"
+
+
+def test_step_waits_for_min_new_and_stops_when_closed():
+    """Test min_new batches folds and nothing is folded after collection closes."""
+    session = make_session()
+    summarizer = RollingSummarizer(session, min_new=3, fold=fake_fold)
+    session.store.append_feedback(SAMPLE_FEEDBACK[:2])
+    assert not summarizer.step()
+    session.is_collecting = False
+    session.store.append_feedback(SAMPLE_FEEDBACK[2:])
+    assert not summarizer.step()
+    assert session.store.get(ROLLING_KEY) is None
+
+
+def test_only_lease_holder_folds():
+    """Test two workers on one store do not fold the same batch twice."""
+    session = make_session()
+    first = RollingSummarizer(session, fold=fake_fold)
+    second = RollingSummarizer(SessionData(session_id="test", store=session.store), fold=fake_fold)
+    session.store.append_feedback(SAMPLE_FEEDBACK)
+    assert first.step()
+    session.store.append_feedback(SAMPLE_FEEDBACK[:1])
+    assert not second.step()
+    assert first.step()
+    assert not session.store.acquire_lease(LEASE_NAME, second._owner, 60)
+
+
+def test_idle_steps_leave_version_alone():
+    """Test steps with nothing to fold write nothing, so ETags and streams stay quiet."""
+    session = make_session()
+    summarizer = RollingSummarizer(session, fold=fake_fold)
+    session.store.append_feedback(SAMPLE_FEEDBACK)
+    assert summarizer.step()
+    version = session.version
+    for _ in range(3):
+        assert not summarizer.step()
+    assert session.version == version
+
+
+def test_final_report_uses_rolling_state():
+    """Test the final report folds only the remaining answers, then synthesizes once."""
+    client = FakeAnthropic()
+    cache = MemoryCache()
+    summaries = fold_feedback({}, SAMPLE_FEEDBACK[:3], client=client, cache=cache)
+    assert len(client.prompts) == 2  # one per question
+    rolling = {"feedback_count": 3, "summaries": summaries}
+
+    generate_report(SAMPLE_FEEDBACK, client=client, cache=cache, rolling=rolling)
+
+    fold_prompt, final_prompt = client.prompts[2:]
+    assert SAMPLE_FEEDBACK[3]["answer"] in fold_prompt
+    assert SAMPLE_FEEDBACK[0]["answer"] not in fold_prompt
+    assert "were summarized as they arrived" in final_prompt
+    assert "Question: What did you think about the session?" in final_prompt
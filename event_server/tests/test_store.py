@@ -0,0 +1,175 @@
+"""Tests for session state storage backends."""
+import multiprocessing
+import time
+import pytest
+from event_server.models import SessionData
+from event_server.store import MemoryStore, RedisStore, SQLiteStore, WALStore, create_store
+
+
+@pytest.fixture(params=["memory", "wal", "sqlite", "redis"])
+def store(request, tmp_path):
+    """Each backend, freshly created."""
+    if request.param == "memory":
+        return MemoryStore()
+    if request.param == "wal":
+        store = WALStore(str(tmp_path / "wal"), "test-session")
+        request.addfinalizer(store.wal.close)
+        return store
+    if request.param == "sqlite":
+        return SQLiteStore(str(tmp_path / "session.db"), "test-session")
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisStore(fakeredis.FakeRedis(), "test-session")
+
+
+def _item(n):
+    return {"question": "Q", "answer": f"Answer {n}", "timestamp": "2025-11-05T20:00:00"}
+
+
+def test_fields_roundtrip(store):
+    """Test fields can be set, read back and default when unset."""
+    assert store.get("questions", []) == []
+    store.set(questions=["Q1", "Q2"], is_collecting=False)
+    assert store.get("questions") == ["Q1", "Q2"]
+    assert store.get_many(["questions", "is_collecting", "missing"]) == {
+        "questions": ["Q1", "Q2"],
+        "is_collecting": False,
+    }
+
+
+def test_feedback_append_and_read(store):
+    """Test feedback is appended in order and readable from an offset."""
+    store.append_feedback([_item(1), _item(2)])
+    store.append_feedback([_item(3)])
+    assert store.feedback_count() == 3
+    assert [item["answer"] for item in store.read_feedback()] == ["Answer 1", "Answer 2", "Answer 3"]
+    assert store.read_feedback(2) == [_item(3)]
+
+
+def test_clear(store):
+    """Test clear removes fields and feedback."""
+    store.set(questions=["Q1"])
+    store.append_feedback([_item(1)])
+    store.clear()
+    assert store.get("questions") is None
+    assert store.feedback_count() == 0
+
+
+def test_session_data_uses_store(store):
+    """Test SessionData reads and writes through its store."""
+    session = SessionData(session_id="test-session", store=store)
+    session.questions = ["Q1", "Q2"]
+    session.is_collecting = False
+    session.add_feedback(["Answer 1", "Answer 2"])
+
+    other = SessionData(session_id="test-session", store=store)
+    assert other.questions == ["Q1", "Q2"]
+    assert other.is_collecting is False
+    assert len(other.feedback) == 2
+    assert other.to_dict()["feedback"][1]["answer"] == "Answer 2"
+
+
+def _submit_from_worker(path, worker, count):
+    store = SQLiteStore(path, "test-session")
+    for n in range(count):
+        store.append_feedback([_item(f"{worker}-{n}")])
+
+
+def test_sqlite_store_shared_across_processes(tmp_path):
+    """Test concurrent workers neither lose nor duplicate feedback."""
+    path = str(tmp_path / "session.db")
+    SQLiteStore(path, "test-session")
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_submit_from_worker, args=(path, w, 50)) for w in range(4)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join()
+
+    answers = [item["answer"] for item in SQLiteStore(path, "test-session").read_feedback()]
+    assert len(answers) == 200
+    assert len(set(answers)) == 200
+
+
+def test_sqlite_store_isolates_sessions(tmp_path):
+    """Test two sessions in one database do not see each other's data."""
+    path = str(tmp_path / "session.db")
+    SQLiteStore(path, "a").append_feedback([_item(1)])
+    assert SQLiteStore(path, "b").feedback_count() == 0
+
+
+def test_create_store(tmp_path):
+    """Test store selection from a SESSION_STORE URL."""
+    assert isinstance(create_store("memory", "s"), MemoryStore)
+    assert isinstance(create_store(f"sqlite://{tmp_path}/s.db", "s"), SQLiteStore)
+    assert isinstance(create_store(f"wal://{tmp_path}/wal", "s"), WALStore)
+    with pytest.raises(ValueError, match="Unsupported SESSION_STORE"):
+        create_store("postgres://localhost", "s")
+
+
+def test_version_bumps_on_every_write(store):
+    """Test each write bumps the version and empty appends do not."""
+    assert store.version() == 0
+    assert store.set(questions=["Q1"]) == 1
+    assert store.append_feedback([_item(1)]) == 2
+    assert store.append_feedback([]) == 2
+    assert store.version() == 2
+
+
+def test_compare_and_set(store):
+    """Test compare_and_set writes only when the current value matches."""
+    assert store.compare_and_set("owner", None, {"id": "a"}) == 1
+    assert store.compare_and_set("owner", None, {"id": "b"}) is None
+    assert store.get("owner") == {"id": "a"}
+    assert store.compare_and_set("owner", {"id": "a"}, None) == 2
+    assert store.get("owner") is None
+    assert store.changes_since(1).fields == {"owner": None}
+
+
+def test_leases_are_unversioned(store):
+    """Test a lease excludes other owners until it expires, and bumps no version."""
+    assert store.acquire_lease("fold", "a", 60)
+    assert store.acquire_lease("fold", "a", 60)
+    assert not store.acquire_lease("fold", "b", 60)
+    assert store.acquire_lease("other", "b", 60)
+    assert store.version() == 0
+    assert store.changes_since(0).fields == {}
+
+    assert store.acquire_lease("expiring", "a", 0.001)
+    time.sleep(0.01)
+    assert store.acquire_lease("expiring", "b", 60)
+
+
+def test_activity_is_unversioned(store):
+    """Test the last activity time is kept without bumping the version."""
+    assert store.last_activity() is None
+    store.record_activity(1000.0)
+    store.record_activity(2000.5)
+    assert store.last_activity() == 2000.5
+    assert store.version() == 0
+
+
+def test_changes_since(store):
+    """Test changes_since returns only fields and feedback written after a version."""
+    store.set(questions=["Q1"], is_collecting=True)
+    store.append_feedback([_item(1), _item(2)])
+    version = store.version()
+    store.append_feedback([_item(3)])
+    store.set(is_collecting=False)
+
+    changes = store.changes_since(version)
+    assert changes.version == version + 2
+    assert changes.fields == {"is_collecting": False}
+    assert changes.feedback == [_item(3)]
+
+    everything = store.changes_since(0)
+    assert everything.fields == {"questions": ["Q1"], "is_collecting": False}
+    assert len(everything.feedback) == 3
+    assert store.changes_since(changes.version).feedback == []
+
+
+def test_counts_track_appends(store):
+    """Test total and per-question counts are maintained on append."""
+    store.append_feedback([_item(1), {**_item(2), "question": "Other"}])
+    store.append_feedback([_item(3)])
+    assert store.feedback_count() == 3
+    assert store.question_counts() == {"Q": 2, "Other": 1}
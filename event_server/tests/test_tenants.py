@@ -0,0 +1,79 @@
+"""Tests for hosting many sessions in one process."""
+import pytest
+from event_server.app import app, report_backend
+from event_server.tenants import SessionLimit, SessionRegistry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """A fresh registry, served by the app in multi-tenant mode."""
+    registry = SessionRegistry(report_backend, max_sessions=2)
+    # `event_server.app` resolves to the Flask app, so patch the module through a function
+    module_globals = app.view_functions["get_state"].__globals__
+    monkeypatch.setitem(module_globals, "sessions", registry)
+    monkeypatch.setitem(module_globals, "MULTI_TENANT", True)
+    yield registry
+    for tenant in registry.tenants():
+        registry.remove(tenant.session.session_id)
+
+
+def test_create_validates_ids_and_limit(registry):
+    """Test ids must be well-formed and unique, and the registry stops at max_sessions."""
+    assert registry.create("alpha").session.session_id == "alpha"
+    with pytest.raises(ValueError):
+        registry.create("alpha")
+    with pytest.raises(ValueError):
+        registry.create("../etc")
+    registry.create()
+    with pytest.raises(SessionLimit):
+        registry.create("gamma")
+    assert len(registry) == 2
+
+
+def test_evict_idle_closes_sessions(registry):
+    """Test idle sessions are dropped with their data, and used ones are kept."""
+    stale = registry.create("stale")
+    stale.session.store.append_feedback([{"question": "Q", "answer": "A", "timestamp": "2026-01-01T00:00:00"}])
+    fresh = registry.create("fresh")
+    stale.last_seen -= 10_000
+    registry.idle_seconds = 60
+
+    assert registry.evict_idle() == ["stale"]
+    assert registry.get("stale") is None
+    assert registry.get("fresh") is fresh
+    assert stale.session.store.feedback_count() == 0
+
+
+def test_sessions_are_isolated(registry):
+    """Test each session's routes see only that session's data."""
+    registry.create("alpha")
+    registry.create("beta")
+    client = app.test_client()
+
+    client.post("/s/alpha/api/questions", json={"questions": ["Only alpha"]})
+    assert client.get("/s/alpha/api/state").get_json()["questions"] == ["Only alpha"]
+    assert client.get("/s/beta/api/state").get_json()["questions"] != ["Only alpha"]
+    assert client.get("/s/missing/api/state").status_code == 404
+
+
+def test_multi_tenant_has_no_default_session(registry):
+    """Test unprefixed session routes are 404, while health and metrics stay up."""
+    client = app.test_client()
+    assert client.get("/api/state").status_code == 404
+    assert client.get("/health").status_code == 200
+    registry.create("alpha")
+    assert "event_server_sessions 1" in client.get("/metrics").get_data(as_text=True)
+
+
+def test_pages_link_within_session(registry):
+    """Test the admin page calls its session's API, not the root one."""
+    registry.create("alpha")
+    page = app.test_client().get("/s/alpha/").get_data(as_text=True)
+    assert 'const BASE_PATH = "/s/alpha";' in page
+
+
+def test_single_session_has_no_prefix():
+    """Test a single-session server serves no /s/ routes."""
+    client = app.test_client()
+    assert client.get("/s/alpha/api/state").status_code == 404
+    assert 'const BASE_PATH = "";' in client.get("/").get_data(as_text=True)
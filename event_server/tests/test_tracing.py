@@ -0,0 +1,125 @@
+"""Tests for request tracing and profiling."""
+import sys
+import time
+import pytest
+from event_server.app import app, session_data
+from event_server.store import MemoryStore
+from event_server.tracing import _NULL_SPAN, Sampler, Tracer, collapse
+
+
+@pytest.fixture
+def use_tracer(monkeypatch):
+    """Install a tracer in every module that records into one."""
+    monkeypatch.setattr(session_data, "store", MemoryStore())
+
+    def install(tracer: Tracer) -> Tracer:
+        for module in ("event_server.reports", "event_server.llm_client"):
+            monkeypatch.setattr(f"{module}.tracer", tracer)
+        # `event_server.app` resolves to the Flask app, so patch the module through a function
+        monkeypatch.setitem(app.view_functions["get_state"].__globals__, "tracer", tracer)
+        return tracer
+
+    return install
+
+
+def test_disabled_tracer_records_nothing():
+    """Test a disabled tracer hands out the shared no-op span and finishes no trace."""
+    tracer = Tracer()
+    tracer.start("GET /api/state")
+    assert tracer.span("store") is _NULL_SPAN
+    assert tracer.finish() is None
+
+
+def test_spans_are_totalled():
+    """Test repeated spans add up, and the summary counts them."""
+    tracer = Tracer(enabled=True)
+    tracer.start("POST /api/submit-feedback")
+    for _ in range(2):
+        with tracer.span("store"):
+            pass
+    trace = tracer.finish()
+
+    assert trace.spans["store"][1] == 2
+    assert trace.server_timing().startswith("store;dur=")
+    assert "store=" in trace.summary() and "x2" in trace.summary()
+    assert tracer.span("store") is _NULL_SPAN
+
+
+def test_server_timing_header(use_tracer):
+    """Test traced requests report their spans in Server-Timing."""
+    use_tracer(Tracer(enabled=True))
+    client = app.test_client()
+    client.post("/api/submit-feedback", json={"items": [{"question": "Q", "answer": "A"}]})
+    response = client.get("/api/state")
+
+    timing = response.headers["Server-Timing"]
+    assert "store;dur=" in timing
+    assert "serialize;dur=" in timing
+    assert "total;dur=" in timing
+
+
+def test_no_header_when_disabled(use_tracer):
+    """Test untraced requests carry no Server-Timing header."""
+    use_tracer(Tracer())
+    assert "Server-Timing" not in app.test_client().get("/api/state").headers
+
+
+def test_slow_trace_writes_profile(tmp_path):
+    """Test a trace slower than the threshold writes its stacks in the collapsed format."""
+    tracer = Tracer(slow_ms=20, profile_dir=str(tmp_path), sampler=Sampler(interval=0.001))
+    tracer.start("GET /slow")
+    deadline = time.perf_counter() + 0.1
+    while time.perf_counter() < deadline:
+        pass
+    tracer.finish()
+
+    [profile] = tmp_path.iterdir()
+    assert profile.suffix == ".folded" and "GET__slow" in profile.name
+    lines = profile.read_text().splitlines()
+    assert lines
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("test_slow_trace_writes_profile" in line for line in lines)
+
+
+def test_fast_trace_writes_nothing(tmp_path):
+    """Test a trace under the threshold leaves no profile."""
+    tracer = Tracer(slow_ms=10_000, profile_dir=str(tmp_path), sampler=Sampler(interval=0.001))
+    tracer.start("GET /fast")
+    tracer.finish()
+    assert not tmp_path.exists() or not list(tmp_path.iterdir())
+
+
+def test_collapse_orders_outermost_first():
+    """Test stacks read from the outermost frame to the innermost."""
+    def inner():
+        return collapse(sys._getframe())
+
+    stack = inner().split(";")
+    assert stack[-1].startswith("inner (tests/test_tracing.py:")
+    assert stack[-2].startswith("test_collapse_orders_outermost_first ")
+
+
+def test_debug_profile_needs_token(monkeypatch):
+    """Test /debug/profile is hidden without DEBUG_TOKEN and refuses a wrong token."""
+    client = app.test_client()
+    monkeypatch.delenv("DEBUG_TOKEN", raising=False)
+    assert client.get("/debug/profile").status_code == 404
+
+    monkeypatch.setenv("DEBUG_TOKEN", "secret")
+    assert client.get("/debug/profile").status_code == 403
+    assert client.get("/debug/profile", headers={"Authorization": "Bearer wrong"}).status_code == 403
+    assert client.get("/debug/profile", headers={"Authorization": "secret"}).status_code == 403
+
+
+def test_debug_profile_returns_stacks(monkeypatch, use_tracer):
+    """Test /debug/profile samples the worker's threads for the requested time."""
+    use_tracer(Tracer(sampler=Sampler(interval=0.001)))
+    monkeypatch.setenv("DEBUG_TOKEN", "secret")
+    response = app.test_client().get(
+        "/debug/profile?seconds=0.2", headers={"Authorization": "Bearer secret"}
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    # The request's own thread was sleeping in the profile
+    assert "profile (event_server/tracing.py:" in response.get_data(as_text=True)
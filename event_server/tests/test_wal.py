@@ -0,0 +1,193 @@
+"""Tests for the write-ahead logged in-process store."""
+import multiprocessing
+import os
+import shutil
+import threading
+import pytest
+from event_server.app import app, report_backend
+from event_server.store import MemoryStore, WALStore
+from event_server.tenants import Tenant
+from event_server.wal import WriteAheadLog, destroy_directory
+
+
+def _item(n):
+    return {"question": "Q", "answer": f"Answer {n}", "timestamp": "2025-11-05T20:00:00"}
+
+
+def _reopen(store, directory, **kwargs):
+    store.wal.close()
+    return WALStore(directory, "test-session", **kwargs)
+
+
+def test_recovers_fields_feedback_and_versions(tmp_path):
+    """Test a new store on the same directory continues exactly where the last one stopped."""
+    directory = str(tmp_path)
+    store = WALStore(directory, "test-session")
+    store.set(questions=["Q1"], is_collecting=True)
+    store.append_feedback([_item(1), _item(2)])
+    store.compare_and_set("owner", None, "a")
+    store.set(is_collecting=False)
+
+    recovered = _reopen(store, directory)
+    assert recovered.version() == 4
+    assert recovered.get_many(["questions", "is_collecting", "owner"]) == {
+        "questions": ["Q1"], "is_collecting": False, "owner": "a",
+    }
+    assert recovered.read_feedback() == [_item(1), _item(2)]
+    assert recovered.question_counts() == {"Q": 2}
+    assert recovered.changes_since(2).fields == {"owner": "a", "is_collecting": False}
+    assert recovered.append_feedback([_item(3)]) == 5
+
+
+def test_torn_record_is_discarded(tmp_path):
+    """Test a partly written last record is cut off and later writes still replay."""
+    directory = str(tmp_path)
+    store = WALStore(directory, "test-session")
+    store.append_feedback([_item(1)])
+    store.wal.close()
+    with open(tmp_path / "test-session.wal", "ab") as f:
+        f.write(b"\x40\x00\x00\x00\x12\x34\x56\x78{\"op\":")
+
+    store = WALStore(directory, "test-session")
+    assert store.read_feedback() == [_item(1)]
+    store.append_feedback([_item(2)])
+    assert _reopen(store, directory).read_feedback() == [_item(1), _item(2)]
+
+
+def test_snapshot_compacts_log(tmp_path):
+    """Test the log restarts after a snapshot and recovery reads both."""
+    directory = str(tmp_path)
+    store = WALStore(directory, "test-session", snapshot_bytes=1024)
+    store.set(questions=["Q1"])
+    for n in range(50):
+        store.append_feedback([_item(n)])
+
+    assert os.path.getsize(tmp_path / "test-session.wal") < 1024
+    assert os.path.exists(tmp_path / "test-session.snapshot")
+    recovered = _reopen(store, directory)
+    assert recovered.version() == 51
+    assert [item["answer"] for item in recovered.read_feedback()] == [f"Answer {n}" for n in range(50)]
+    assert len(recovered.changes_since(49).feedback) == 2
+
+
+def test_records_already_in_snapshot_are_skipped(tmp_path):
+    """Test a crash between writing a snapshot and emptying the log replays nothing twice."""
+    directory = str(tmp_path)
+    store = WALStore(directory, "test-session")
+    store.append_feedback([_item(1)])
+    store.set(questions=["Q1"])
+    shutil.copy(tmp_path / "test-session.wal", tmp_path / "old.wal")
+    store.wal.snapshot(store._snapshot())
+    store.wal.close()
+    shutil.copy(tmp_path / "old.wal", tmp_path / "test-session.wal")
+
+    recovered = WALStore(directory, "test-session")
+    assert recovered.version() == 2
+    assert recovered.read_feedback() == [_item(1)]
+
+
+def test_clear_overwrites_files(tmp_path):
+    """Test clear leaves no session data on disk and nothing to recover."""
+    directory = str(tmp_path)
+    store = WALStore(directory, "test-session", snapshot_bytes=512)
+    for n in range(20):
+        store.append_feedback([_item(n)])
+    store.clear()
+
+    assert not os.path.exists(tmp_path / "test-session.snapshot")
+    assert os.path.getsize(tmp_path / "test-session.wal") == 0
+    recovered = _reopen(store, directory)
+    assert recovered.version() == 0
+    assert recovered.feedback_count() == 0
+
+
+def test_end_session_shreds_the_log(tmp_path, monkeypatch):
+    """Test ending the container's session zero-fills a wal:// store, and leaves others alone."""
+    module = app.view_functions["get_state"].__globals__
+    store = WALStore(str(tmp_path), "test-session", snapshot_bytes=512)
+    for n in range(20):
+        store.append_feedback([_item(n)])
+    monkeypatch.setitem(module, "default_tenant", Tenant.create("test-session", store, report_backend))
+    module["end_session"]()
+    assert not os.path.exists(tmp_path / "test-session.snapshot")
+    assert os.path.getsize(tmp_path / "test-session.wal") == 0
+
+    memory = MemoryStore()
+    memory.append_feedback([_item(1)])
+    monkeypatch.setitem(module, "default_tenant", Tenant.create("test-session", memory, report_backend))
+    module["end_session"]()
+    assert memory.feedback_count() == 1
+
+
+def test_destroy_directory_shreds_every_session(tmp_path):
+    """Test every session's files in the directory are zero-filled, and open logs are refused."""
+    directory = str(tmp_path)
+    for name in ("session-a", "session-b"):
+        store = WALStore(directory, name, snapshot_bytes=512)
+        for n in range(20):
+            store.append_feedback([_item(n)])
+        store.wal.close()
+
+    assert destroy_directory(directory) == 2
+    assert sorted(os.listdir(tmp_path)) == ["session-a.wal", "session-b.wal"]
+    assert all(os.path.getsize(tmp_path / name) == 0 for name in os.listdir(tmp_path))
+    assert destroy_directory(str(tmp_path / "missing")) == 0
+
+    store = WALStore(directory, "session-a")
+    with pytest.raises(RuntimeError, match="in use"):
+        destroy_directory(directory)
+    store.wal.close()
+
+
+def test_log_is_locked_to_one_process(tmp_path):
+    """Test a second writer for the same session is refused."""
+    store = WALStore(str(tmp_path), "test-session")
+    with pytest.raises(RuntimeError, match="in use"):
+        WriteAheadLog(str(tmp_path), "test-session", lock_timeout=0)
+    store.wal.close()
+
+
+def _write_and_crash(directory):
+    store = WALStore(directory, "test-session")
+    store.set(questions=["Q1"])
+    store.append_feedback([_item(1)])
+    # No close, no flush of Python state: the process just dies
+    os._exit(0)
+
+
+def test_acknowledged_writes_survive_process_crash(tmp_path):
+    """Test writes that returned are recovered after the process dies abruptly."""
+    ctx = multiprocessing.get_context("fork")
+    process = ctx.Process(target=_write_and_crash, args=(str(tmp_path),))
+    process.start()
+    process.join()
+
+    store = WALStore(str(tmp_path), "test-session")
+    assert store.get("questions") == ["Q1"]
+    assert store.read_feedback() == [_item(1)]
+
+
+def test_concurrent_writers_share_fsyncs(tmp_path, monkeypatch):
+    """Test group commit: writers waiting on one fsync are covered by it."""
+    store = WALStore(str(tmp_path), "test-session")
+    calls = []
+    real_fsync = os.fsync
+
+    def slow_fsync(fd):
+        calls.append(fd)
+        threading.Event().wait(0.01)
+        real_fsync(fd)
+
+    monkeypatch.setattr("event_server.wal.os.fsync", slow_fsync)
+    threads = [
+        threading.Thread(target=lambda w=w: [store.append_feedback([_item(f"{w}-{n}")]) for n in range(10)])
+        for w in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.feedback_count() == 80
+    assert len(calls) < 80
+    assert _reopen(store, str(tmp_path)).feedback_count() == 80
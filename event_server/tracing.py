@@ -0,0 +1,261 @@
+"""Opt-in request tracing and sampling profiles of slow requests.
+
+Everything is off by default; a disabled `span()` returns a shared no-op
+context manager, so the instrumented code pays one attribute check.
+
+- `TRACE_REQUESTS=1`: each request records spans (parse, store, serialize,
+  llm) and returns them in a `Server-Timing` header, which browser dev
+  tools show per request. Report jobs are traced the same way and logged.
+- `PROFILE_SLOW_MS=N`: a sampler thread records the stacks running on each
+  request's thread; requests slower than N ms are logged and their stacks
+  written to `PROFILE_DIR` in the collapsed format ("frame;frame;frame
+  count" per line) that flamegraph.pl, speedscope and inferno read.
+- `DEBUG_TOKEN`: enables `/debug/profile?seconds=N`, which samples every
+  thread of the worker for N seconds and returns collapsed stacks.
+
+The sampler is a real OS thread even under gevent. gevent runs every
+greenlet on one thread, so there a slow request's profile also shows the
+other requests that held the worker while it waited, which is usually
+the point.
+"""
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Iterator
+
+try:
+    from gevent.monkey import get_original
+except ImportError:  # gevent is optional
+    def get_original(module: str, name: str) -> Any:
+        return getattr(__import__(module), name)
+
+logger = logging.getLogger(__name__)
+
+_NULL_SPAN = nullcontext()
+# The OS-level primitives, not gevent's patched ones: the sampler must run
+# while greenlets hold the CPU
+_start_thread = get_original("_thread", "start_new_thread")
+_allocate_lock = get_original("_thread", "allocate_lock")
+_thread_ident = get_original("_thread", "get_ident")
+_sleep = get_original("time", "sleep")
+
+
+class Trace:
+    """Span timings (and optionally stack samples) for one request or job."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        # span name -> [seconds, count]
+        self.spans: dict[str, list[float]] = {}
+        self.samples: Counter[str] | None = None
+        self.thread = _thread_ident()
+
+    def add(self, name: str, seconds: float) -> None:
+        totals = self.spans.setdefault(name, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += 1
+
+    def server_timing(self) -> str:
+        """The spans as a Server-Timing header value, in milliseconds."""
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, (seconds, _) in self.spans.items()]
+        return ", ".join([*parts, f"total;dur={self.duration * 1000:.1f}"])
+
+    def summary(self) -> str:
+        spans = " ".join(
+            f"{name}={seconds * 1000:.1f}ms" + (f"x{count}" if count > 1 else "")
+            for name, (seconds, count) in self.spans.items()
+        )
+        return f"{self.name} {self.duration * 1000:.1f}ms {spans}".rstrip()
+
+
+class Sampler:
+    """Samples thread stacks every `interval` seconds on a native thread."""
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self._lock = _allocate_lock()
+        # thread ident (None: every thread) -> counters receiving its stacks
+        self._targets: dict[int | None, list[Counter[str]]] = {}
+        self._pid: int | None = None
+
+    def watch(self, thread: int | None, samples: Counter[str]) -> None:
+        self._ensure_running()
+        with self._lock:
+            self._targets.setdefault(thread, []).append(samples)
+
+    def unwatch(self, thread: int | None, samples: Counter[str]) -> None:
+        with self._lock:
+            targets = self._targets.get(thread, [])
+            if samples in targets:
+                targets.remove(samples)
+            if not targets:
+                self._targets.pop(thread, None)
+
+    def _ensure_running(self) -> None:
+        # Started lazily so each gunicorn worker gets its own thread after fork
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        _start_thread(self._run, ())
+
+    def _run(self) -> None:
+        me = _thread_ident()
+        while True:
+            _sleep(self.interval)
+            # Held for the whole pass, so unwatch() returns only once nothing
+            # is writing to the caller's counter any more
+            with self._lock:
+                if not self._targets:
+                    continue
+                everything = self._targets.get(None, [])
+                for thread, frame in sys._current_frames().items():
+                    counters = self._targets.get(thread, []) + everything
+                    if counters and thread != me:
+                        stack = collapse(frame)
+                        for samples in counters:
+                            samples[stack] += 1
+
+
+class Tracer:
+    """Starts and finishes traces; `span()` times a block within the current one.
+
+    Args:
+        enabled: Record spans (TRACE_REQUESTS)
+        slow_ms: Profile requests and write out those slower than this (PROFILE_SLOW_MS)
+        profile_dir: Where slow-request profiles go (PROFILE_DIR)
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        slow_ms: float | None = None,
+        profile_dir: str = "/tmp/event-server-profiles",
+        sampler: Sampler | None = None,
+    ) -> None:
+        self.enabled = enabled or slow_ms is not None
+        self.slow_ms = slow_ms
+        self.profile_dir = profile_dir
+        self.sampler = sampler or Sampler()
+        self._current: ContextVar[Trace | None] = ContextVar("trace", default=None)
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        slow_ms = os.environ.get("PROFILE_SLOW_MS")
+        return cls(
+            enabled=os.environ.get("TRACE_REQUESTS", "") not in ("", "0"),
+            slow_ms=float(slow_ms) if slow_ms else None,
+            profile_dir=os.environ.get("PROFILE_DIR", "/tmp/event-server-profiles"),
+        )
+
+    def start(self, name: str) -> None:
+        """Begin a trace for the current request (a no-op when disabled)."""
+        if not self.enabled:
+            return
+        # A request that raised skips finish(); stop sampling for it here
+        abandoned = self._current.get()
+        if abandoned is not None and abandoned.samples is not None:
+            self.sampler.unwatch(abandoned.thread, abandoned.samples)
+        trace = Trace(name)
+        if self.slow_ms is not None:
+            trace.samples = Counter()
+            self.sampler.watch(trace.thread, trace.samples)
+        self._current.set(trace)
+
+    def finish(self) -> Trace | None:
+        """End the current trace; profile it if it was slow. Returns it, or None."""
+        if not self.enabled:
+            return None
+        trace = self._current.get()
+        if trace is None:
+            return None
+        self._current.set(None)
+        trace.duration = time.perf_counter() - trace.started
+        if trace.samples is not None:
+            self.sampler.unwatch(trace.thread, trace.samples)
+            if trace.duration * 1000 >= self.slow_ms:
+                path = self._write_profile(trace)
+                logger.warning("Slow: %s, profile in %s", trace.summary(), path)
+        return trace
+
+    @contextmanager
+    def trace(self, name: str) -> Iterator[None]:
+        """Trace a block outside a request, such as a report job, and log it."""
+        if not self.enabled:
+            yield
+            return
+        self.start(name)
+        try:
+            yield
+        finally:
+            trace = self.finish()
+            if trace is not None:
+                logger.info("Trace: %s", trace.summary())
+
+    def span(self, name: str):
+        """Context manager timing a block as `name` in the current trace."""
+        if not self.enabled:
+            return _NULL_SPAN
+        trace = self._current.get()
+        if trace is None:
+            return _NULL_SPAN
+        return _Span(trace, name)
+
+    def profile(self, seconds: float) -> str:
+        """Sample every thread for `seconds` and return collapsed stacks."""
+        samples: Counter[str] = Counter()
+        self.sampler.watch(None, samples)
+        try:
+            time.sleep(seconds)
+        finally:
+            self.sampler.unwatch(None, samples)
+        return format_collapsed(samples)
+
+    def _write_profile(self, trace: Trace) -> str:
+        os.makedirs(self.profile_dir, exist_ok=True)
+        label = "".join(c if c.isalnum() else "_" for c in trace.name).strip("_")
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        path = os.path.join(self.profile_dir, f"{stamp}-{label}-{trace.duration * 1000:.0f}ms.folded")
+        with open(path, "w") as f:
+            f.write(format_collapsed(trace.samples))
+        return path
+
+
+class _Span:
+    __slots__ = ("trace", "name", "started")
+
+    def __init__(self, trace: Trace, name: str) -> None:
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.trace.add(self.name, time.perf_counter() - self.started)
+
+
+def collapse(frame: Any) -> str:
+    """A stack as "outermost;...;innermost", each frame as "function (file:line)"."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        path = code.co_filename.replace(os.sep, "/").split("/")
+        names.append(f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def format_collapsed(samples: Counter[str]) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+# One per process; app.py, reports.py and llm_client.py record into it
+tracer = Tracer.from_env()
@@ -0,0 +1,220 @@
+"""Append-only write-ahead log with snapshots, for the in-process store.
+
+`MemoryStore` loses everything when its worker restarts. `WALStore` (in
+`event_server/store.py`) writes every mutation here first, so a restarted
+worker replays the log and carries on.
+
+Files, per session, in the log directory:
+
+    <session>.wal       Records: 4-byte length, 4-byte CRC32, JSON payload
+    <session>.snapshot  Full state as JSON, replaced atomically
+
+Writers append under the store's lock and then call `sync()` outside it:
+whoever fsyncs first covers every record appended so far, so concurrent
+writers share one fsync (group commit). When the log grows past
+`snapshot_bytes`, the state is written to a new snapshot and the log
+starts over, so recovery reads one snapshot plus a bounded log.
+
+A record cut short by a crash fails its length or CRC check; replay stops
+there and the partial tail is discarded. `destroy()` overwrites the log and
+snapshot with zeros before emptying or deleting them; `destroy_directory()`
+does so for every session in a directory once the server stops.
+"""
+import fcntl
+import json
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Iterator
+
+_HEADER = struct.Struct("<II")
+
+
+class WriteAheadLog:
+    """Log and snapshot files for one session.
+
+    Args:
+        directory: Where to keep the files; a tmpfs path keeps the
+            "dies with the container" model while surviving worker restarts
+        name: Session id, used in the file names
+        snapshot_bytes: Log size that triggers a snapshot
+        lock_timeout: Seconds to wait for another process to release the log,
+            such as a worker that is still exiting while its replacement starts
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        name: str,
+        snapshot_bytes: int = 16 * 1024 * 1024,
+        lock_timeout: float = 2.0,
+    ) -> None:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        safe = re.sub(r"[^\w.-]", "_", name)
+        self.directory = directory
+        self.log_path = os.path.join(directory, f"{safe}.wal")
+        self.snapshot_path = os.path.join(directory, f"{safe}.snapshot")
+        self.snapshot_bytes = snapshot_bytes
+        self._file = os.fdopen(os.open(self.log_path, os.O_RDWR | os.O_CREAT, 0o600), "r+b")
+        self._lock_file(lock_timeout)
+        self._size = self._file.seek(0, os.SEEK_END)
+        # Bumped when the log restarts after a snapshot; offsets are per generation
+        self._generation = 0
+        self._synced = (0, self._size)
+        self._sync_lock = threading.Lock()
+
+    def _lock_file(self, timeout: float) -> None:
+        # The log belongs to one process; a second writer would interleave records
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    self._file.close()
+                    raise RuntimeError(
+                        f"Session log {self.log_path} is in use by another process. "
+                        "SESSION_STORE=wal:// serves one worker: set WEB_CONCURRENCY=1, "
+                        "or use sqlite:// or redis:// to share the session between workers"
+                    )
+                time.sleep(0.1)
+
+    def load(self) -> tuple[dict[str, Any] | None, Iterator[dict[str, Any]]]:
+        """Return the snapshot (or None) and an iterator over the log's records.
+
+        Reads each file once. A torn record at the end of the log is cut off
+        once the iterator is exhausted.
+        """
+        snapshot = None
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as f:
+                snapshot = json.loads(f.read())
+        return snapshot, self._records()
+
+    def _records(self) -> Iterator[dict[str, Any]]:
+        self._file.seek(0)
+        data = self._file.read()
+        offset = 0
+        while offset + _HEADER.size <= len(data):
+            length, crc = _HEADER.unpack_from(data, offset)
+            payload = data[offset + _HEADER.size:offset + _HEADER.size + length]
+            # A zero length is what destroy() leaves if it was interrupted
+            if not length or len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            yield json.loads(payload)
+            offset += _HEADER.size + length
+        if offset < len(data):
+            self._file.truncate(offset)
+            self._size = offset
+            self._synced = (self._generation, offset)
+
+    def append(self, record: dict[str, Any]) -> tuple[int, int]:
+        """Write `record` to the log (not yet fsynced). Returns a position for `sync()`.
+
+        Callers serialize appends; the store does so under its lock.
+        """
+        payload = json.dumps(record, separators=(",", ":")).encode()
+        self._file.seek(self._size)
+        self._file.write(_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        self._file.flush()
+        self._size += _HEADER.size + len(payload)
+        return self._generation, self._size
+
+    def sync(self, position: tuple[int, int]) -> None:
+        """Return once everything up to `position` is on disk."""
+        with self._sync_lock:
+            if self._synced >= position:
+                return
+            # Covers every record appended so far, not just this caller's
+            target = (self._generation, self._size)
+            os.fsync(self._file.fileno())
+            self._synced = max(self._synced, target)
+
+    @property
+    def needs_snapshot(self) -> bool:
+        return self._size >= self.snapshot_bytes
+
+    def snapshot(self, state: dict[str, Any]) -> None:
+        """Durably replace the snapshot with `state` and empty the log.
+
+        `state` must include everything logged so far; callers hold their
+        lock so no record is appended meanwhile.
+        """
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(json.dumps(state, separators=(",", ":")).encode())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.snapshot_path)
+        self._sync_directory()
+        with self._sync_lock:
+            self._file.truncate(0)
+            self._file.seek(0)
+            os.fsync(self._file.fileno())
+            self._generation += 1
+            self._size = 0
+            # Everything before this generation is in the snapshot
+            self._synced = (self._generation, 0)
+
+    def destroy(self) -> None:
+        """Overwrite the log and snapshot with zeros; empty the log, delete the snapshot.
+
+        Best effort on copy-on-write or wear-levelled storage, where old
+        blocks may survive an overwrite; tmpfs does not have that problem.
+        """
+        with self._sync_lock:
+            for path in (self.snapshot_path, self.snapshot_path + ".tmp"):
+                if os.path.exists(path):
+                    _shred(path)
+            self._file.seek(0)
+            self._file.write(bytes(self._size))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.truncate(0)
+            os.fsync(self._file.fileno())
+            self._generation += 1
+            self._size = 0
+            self._synced = (self._generation, 0)
+        self._sync_directory()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def _sync_directory(self) -> None:
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def destroy_directory(directory: str) -> int:
+    """Shred every session's log and snapshot in `directory`; returns how many logs.
+
+    For when the server stops and its sessions end with it. Each log is
+    locked first, so this fails instead of shredding one a process still
+    writes. Needs only this module, so a process that never loaded the app
+    (gunicorn's master) can call it.
+    """
+    if not os.path.isdir(directory):
+        return 0
+    names = sorted(name[:-len(".wal")] for name in os.listdir(directory) if name.endswith(".wal"))
+    for name in names:
+        wal = WriteAheadLog(directory, name, lock_timeout=0)
+        try:
+            wal.destroy()
+        finally:
+            wal.close()
+    return len(names)
+
+
+def _shred(path: str) -> None:
+    with open(path, "r+b") as f:
+        f.write(bytes(os.fstat(f.fileno()).st_size))
+        f.flush()
+        os.fsync(f.fileno())
+    os.unlink(path)
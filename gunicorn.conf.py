@@ -0,0 +1,42 @@
+"""gunicorn settings for the event server.
+
+Uses gevent workers so idle /api/events streams cost a greenlet, not a whole
+sync worker. Every setting can be overridden from the environment.
+
+This file lives outside the `event_server` package and is loaded by path
+(`gunicorn -c gunicorn.conf.py`), so the master never imports the app: each
+worker imports it after gevent has patched threading. Importing it as
+`python:event_server.gunicorn_conf` would build the app's locks and threads
+unpatched in the master, and gevent workers would hang on them.
+"""
+import importlib.util
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "4"))
+# wal:// keeps the session in one process and locks its log; a second worker
+# would fail to start, so run one (gevent still serves requests concurrently)
+if os.environ.get("SESSION_STORE", "").startswith("wal://"):
+    workers = 1
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gevent")
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "1000"))
+# Report generation can take a while; streams end on their own (SSE_MAX_SECONDS)
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+# Import the app in each worker, after gevent's monkey-patching, never in the master
+preload_app = False
+
+
+def on_exit(server):
+    # The session ends with the server. A wal:// log outlives worker restarts
+    # on purpose, so it is shredded here, after the last worker has exited.
+    # wal.py is loaded by path: importing the event_server package would
+    # import the app, whose store would replay the whole log first
+    store_url = os.environ.get("SESSION_STORE", "")
+    if not store_url.startswith("wal://"):
+        return
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "event_server", "wal.py")
+    spec = importlib.util.spec_from_file_location("session_wal", path)
+    wal = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(wal)
+    shredded = wal.destroy_directory(store_url[len("wal://"):])
+    server.log.info("Shredded %d session write-ahead log(s)", shredded)
@@ -1,5 +1,10 @@
-from flask import Flask, render_template_string, redirect, request
+from flask import Flask, Response, render_template_string, redirect, request
+from landing_page.pool import WarmPool, run_session_container
+from landing_page.ports import NoFreePort, PortAllocator
+from landing_page.reaper import Reaper
+from event_server.tenants import SessionLimit
 import docker
+import functools
 import uuid
 import logging
 import os
@@ -11,6 +16,30 @@ logger = logging.getLogger(__name__)
 # Get public IP from environment or use default
 PUBLIC_IP = os.environ.get('PUBLIC_IP', '18.232.152.144')
 
+# Host ports for session containers, kept in step with Docker events
+ports = PortAllocator.from_env()
+
+# Booted session containers waiting to be claimed (WARM_POOL_SIZE, off by default)
+pool = WarmPool.from_env(ports)
+
+# Stops and removes exited, idle and long-expired session containers (REAPER_IDLE_SECONDS)
+reaper = Reaper.from_env(ports, host=pool.host, keep=pool.idle_names)
+
+# MULTI_TENANT=1: host sessions in this process, served under /live/s/<id>/,
+# instead of starting a container per session (see event_server/tenants.py)
+MULTI_TENANT = os.environ.get('MULTI_TENANT', '') not in ('', '0')
+PUBLIC_URL = os.environ.get('PUBLIC_URL', 'https://struct.lol')
+sessions = None
+if MULTI_TENANT:
+    from event_server.app import app as session_app, sessions
+    from werkzeug.middleware.dispatcher import DispatcherMiddleware
+    app.wsgi_app = DispatcherMiddleware(app.wsgi_app, {'/live': session_app.wsgi_app})
+
+
+@functools.cache
+def docker_client():
+    return docker.from_env()
+
 landing_html = """
 <!DOCTYPE html>
 <html>
@@ -429,43 +458,32 @@ def create_session():
         # Generate unique session ID
         session_id = str(uuid.uuid4())[:8]
         
-        # Connect to Docker
-        client = docker.from_env()
-        
-        # Find an available port (starting from 8000)
-        used_ports = set()
-        for container in client.containers.list():
-            for port_bindings in container.attrs['NetworkSettings']['Ports'].values():
-                if port_bindings:
-                    for binding in port_bindings:
-                        used_ports.add(int(binding['HostPort']))
-        
-        # Find next available port
-        port = 8000
-        while port in used_ports:
-            port += 1
-        
-        logger.info(f"Creating session {session_id} on port {port}")
-        
-        # Spawn event server container
-        container = client.containers.run(
-            "session-server:latest",
-            name=f"session-{session_id}",
-            ports={'5000/tcp': port},
-            volumes={
-                '/home/ubuntu/quartz': {'bind': '/home/ubuntu/quartz', 'mode': 'rw'},
-                '/home/ubuntu/.ssh': {'bind': '/root/.ssh', 'mode': 'ro'}
-            },
-            environment={
-                'SESSION_ID': session_id,
-                'PORT': '5000',
-                'ANTHROPIC_API_KEY': os.environ.get('ANTHROPIC_API_KEY', ''),
-            },
-            detach=True,
-            remove=False
-        )
-        
-        logger.info(f"Container {container.id} created for session {session_id}")
+        if MULTI_TENANT:
+            sessions.create(session_id)
+            logger.info(f"Created in-process session {session_id}")
+            return render_template_string(
+                confirmation_html,
+                session_id=session_id,
+                admin_url=f"{PUBLIC_URL}/live/s/{session_id}/"
+            )
+        
+        client = docker_client()
+        ports.ensure_watching(client)
+        pool.ensure_running(client)
+        reaper.ensure_running(client)
+        
+        # A booted container from the warm pool if one is ready, else start one now
+        port = pool.claim(session_id)
+        if port is None:
+            name = f"session-{session_id}"
+            port = ports.allocate(name)
+            logger.info(f"Creating session {session_id} on port {port}")
+            try:
+                container = run_session_container(client, name, port, {'SESSION_ID': session_id})
+            except Exception:
+                ports.release(port, name)
+                raise
+            logger.info(f"Container {container.id} created for session {session_id}")
         
         # Construct admin URL using public IP
         admin_url = f"https://struct.lol:{port + 1000}/"
@@ -476,6 +494,12 @@ def create_session():
             admin_url=admin_url
         )
         
+    except (NoFreePort, SessionLimit) as e:
+        logger.error(str(e))
+        return render_template_string(
+            error_html,
+            error_message="No room for another session right now. Please try again later."
+        ), 503
     except docker.errors.ImageNotFound:
         logger.error("session-server:latest image not found")
         return render_template_string(
@@ -489,9 +513,25 @@ def create_session():
             error_message=f"Failed to create session: {str(e)}"
         ), 500
 
+@app.before_request
+def start_background():
+    # Fill the pool and start reaping from the first request (usually a health
+    # check), not the first session, so a restarted landing page cleans up too
+    if (pool.size or reaper.enabled) and not MULTI_TENANT:
+        client = docker_client()
+        ports.ensure_watching(client)
+        pool.ensure_running(client)
+        reaper.ensure_running(client)
+
 @app.route("/health")
 def health():
     return {"status": "ok"}
 
+@app.route("/metrics")
+def metrics():
+    """Warm pool hits, misses and size, and reaped containers, in the Prometheus text format."""
+    body = pool.render_metrics() + reaper.render_metrics()
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=False)
@@ -0,0 +1,246 @@
+"""Warm pool of booted, unclaimed session containers.
+
+Starting a session container and booting gunicorn takes seconds. With
+`WARM_POOL_SIZE=K`, K containers are started ahead of time with no session;
+`create_session()` hands one to the new session with a single `/api/claim`
+call and a background thread starts a replacement. When the pool is empty
+the session starts cold, as before.
+"""
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from landing_page.ports import PortAllocator
+
+logger = logging.getLogger(__name__)
+
+IMAGE = "session-server:latest"
+# Seconds between refill passes when nothing wakes the refill thread sooner
+REFILL_INTERVAL = 5.0
+
+# (method, url, body, headers) -> HTTP status, 0 if the request failed
+Transport = Callable[[str, str, bytes | None, dict[str, str]], int]
+
+
+def run_session_container(client: Any, name: str, port: int, environment: dict[str, str]) -> Any:
+    """Start a session-server container publishing port 5000 on host `port`."""
+    return client.containers.run(
+        IMAGE,
+        name=name,
+        ports={'5000/tcp': port},
+        volumes={
+            '/home/ubuntu/quartz': {'bind': '/home/ubuntu/quartz', 'mode': 'rw'},
+            '/home/ubuntu/.ssh': {'bind': '/root/.ssh', 'mode': 'ro'}
+        },
+        environment={
+            'PORT': '5000',
+            'ANTHROPIC_API_KEY': os.environ.get('ANTHROPIC_API_KEY', ''),
+            **environment,
+        },
+        detach=True,
+        remove=False
+    )
+
+
+def http_status(method: str, url: str, body: bytes | None, headers: dict[str, str]) -> int:
+    request = urllib.request.Request(url, data=body, headers=headers, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+
+@dataclass
+class WarmContainer:
+    name: str
+    port: int
+    claim_token: str
+    container: Any
+
+
+class WarmPool:
+    """Keeps `size` session containers booted and unclaimed.
+
+    Args:
+        ports: Allocator the containers' host ports come from
+        size: Idle containers to keep (0: no pool, every session starts cold)
+        host: Where the containers' published ports are reachable from here
+        boot_timeout: Seconds a new container gets to answer /health
+        transport: Makes HTTP requests to containers (tests pass a fake)
+    """
+
+    def __init__(
+        self,
+        ports: PortAllocator,
+        size: int = 0,
+        host: str = "127.0.0.1",
+        boot_timeout: float = 60.0,
+        transport: Transport = http_status,
+    ) -> None:
+        self.ports = ports
+        self.size = size
+        self.host = host
+        self.boot_timeout = boot_timeout
+        self.transport = transport
+        self.client: Any = None
+        self.hits = 0
+        self.misses = 0
+        self.boot_failures = 0
+        self._lock = threading.Lock()
+        self._idle: deque[WarmContainer] = deque()
+        self._starting = 0
+        self._wake = threading.Event()
+        self._pid: int | None = None
+
+    @classmethod
+    def from_env(cls, ports: PortAllocator) -> "WarmPool":
+        return cls(
+            ports,
+            size=int(os.environ.get("WARM_POOL_SIZE", 0)),
+            host=os.environ.get("WARM_POOL_HOST", "127.0.0.1"),
+            boot_timeout=float(os.environ.get("WARM_POOL_BOOT_TIMEOUT", 60)),
+        )
+
+    def ensure_running(self, client: Any) -> None:
+        """Start this process's refill thread, if the pool is on and it is not running."""
+        if not self.size or self._pid == os.getpid():
+            return
+        with self._lock:
+            # Started lazily so each gunicorn worker gets its own thread after fork
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.client = client
+        threading.Thread(target=self._refill, name="warm-pool", daemon=True).start()
+
+    def claim(self, session_id: str) -> int | None:
+        """Hand an idle container to `session_id`; its host port, or None if none is ready."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    self.misses += 1
+                    return None
+                warm = self._idle.popleft()
+            self._wake.set()
+            status = self._request(
+                warm, "POST", "/api/claim", {"session_id": session_id}, token=warm.claim_token
+            )
+            if status == 200:
+                with self._lock:
+                    self.hits += 1
+                logger.info("Session %s claimed warm container %s", session_id, warm.name)
+                return warm.port
+            logger.warning("Claiming %s failed with status %s, discarding it", warm.name, status)
+            # 409: it already serves a session, so leave it running
+            if status != 409:
+                self._discard(warm)
+
+    def idle_names(self) -> set[str]:
+        """Names of the containers waiting to be claimed."""
+        with self._lock:
+            return {warm.name for warm in self._idle}
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "starting": self._starting,
+                "hits": self.hits,
+                "misses": self.misses,
+                "boot_failures": self.boot_failures,
+            }
+
+    def render_metrics(self) -> str:
+        """The pool's numbers in the Prometheus text format."""
+        stats = self.stats()
+        return "\n".join([
+            "# HELP landing_warm_pool_claims_total Sessions created, by whether one was warm",
+            "# TYPE landing_warm_pool_claims_total counter",
+            f'landing_warm_pool_claims_total{{result="hit"}} {stats["hits"]}',
+            f'landing_warm_pool_claims_total{{result="miss"}} {stats["misses"]}',
+            "# HELP landing_warm_pool_boot_failures_total Warm containers that failed to boot",
+            "# TYPE landing_warm_pool_boot_failures_total counter",
+            f"landing_warm_pool_boot_failures_total {stats['boot_failures']}",
+            "# HELP landing_warm_pool_idle Booted containers waiting for a session",
+            "# TYPE landing_warm_pool_idle gauge",
+            f"landing_warm_pool_idle {stats['idle']}",
+            "# HELP landing_warm_pool_starting Containers booting into the pool",
+            "# TYPE landing_warm_pool_starting gauge",
+            f"landing_warm_pool_starting {stats['starting']}",
+            "# HELP landing_warm_pool_size Idle containers the pool aims to keep",
+            "# TYPE landing_warm_pool_size gauge",
+            f"landing_warm_pool_size {stats['size']}",
+        ]) + "\n"
+
+    def _refill(self) -> None:
+        while True:
+            with self._lock:
+                missing = self.size - len(self._idle) - self._starting
+                self._starting += max(missing, 0)
+            for _ in range(missing):
+                threading.Thread(target=self._boot, name="warm-pool-boot", daemon=True).start()
+            self._wake.wait(REFILL_INTERVAL)
+            self._wake.clear()
+
+    def _boot(self) -> None:
+        """Start one container and add it to the pool once it answers /health."""
+        name = f"session-warm-{secrets.token_hex(4)}"
+        warm = None
+        try:
+            port = self.ports.allocate(name)
+            token = secrets.token_urlsafe(24)
+            try:
+                container = run_session_container(
+                    self.client, name, port, {"SESSION_ID": name, "CLAIM_TOKEN": token}
+                )
+            except Exception:
+                self.ports.release(port, name)
+                raise
+            warm = WarmContainer(name, port, token, container)
+            deadline = time.monotonic() + self.boot_timeout
+            while self._request(warm, "GET", "/health") != 200:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"no answer on port {port} after {self.boot_timeout:.0f}s")
+                time.sleep(0.5)
+        except Exception as e:
+            logger.warning("Could not boot a warm container: %s", e)
+            if warm is not None:
+                self._discard(warm)
+            with self._lock:
+                self._starting -= 1
+                self.boot_failures += 1
+            return
+        with self._lock:
+            self._starting -= 1
+            self._idle.append(warm)
+        logger.info("Warm container %s ready on port %s", name, warm.port)
+
+    def _discard(self, warm: WarmContainer) -> None:
+        try:
+            warm.container.remove(force=True)
+        except Exception as e:
+            logger.warning("Could not remove %s: %s", warm.name, e)
+        # The die event may have returned the port already
+        self.ports.release(warm.port, warm.name)
+
+    def _request(
+        self, warm: WarmContainer, method: str, path: str, payload: dict | None = None,
+        token: str | None = None,
+    ) -> int:
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        body = json.dumps(payload).encode() if payload is not None else None
+        return self.transport(method, f"http://{self.host}:{warm.port}{path}", body, headers)
@@ -0,0 +1,166 @@
+"""Host port allocation for session containers.
+
+The allocator keeps the free ports of its range in a queue, so handing one
+out takes no Docker call and is O(1), and a lock makes two concurrent
+`create_session()` calls get different ports. It learns about containers
+it did not start, and about containers exiting, from Docker's event
+stream: a port comes back when the container holding it dies. Whenever
+the stream (re)connects, the allocator is rebuilt from the running
+containers, so missed events cannot leak ports for long.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Iterable
+
+logger = logging.getLogger(__name__)
+
+# A port handed out but not yet seen running is kept this long before a
+# reconcile may give it away again (the container failed to start)
+PENDING_SECONDS = 120
+
+
+class NoFreePort(Exception):
+    """Every port in the range is taken."""
+
+
+class PortAllocator:
+    """Hands out host ports in `[start, start + count)`, one owner (container name) each.
+
+    Args:
+        start: First port of the range
+        count: Ports in the range
+    """
+
+    def __init__(self, start: int = 8000, count: int = 1000) -> None:
+        self.start = start
+        self.count = count
+        self._lock = threading.Lock()
+        # May hold ports that were taken since they were queued; allocate() skips them
+        self._free: deque[int] = deque(range(start, start + count))
+        # port -> owning container name
+        self._owners: dict[int, str] = {}
+        # container name -> when allocate() handed it a port, until it is seen running
+        self._pending: dict[str, float] = {}
+        self._pid: int | None = None
+
+    @classmethod
+    def from_env(cls) -> "PortAllocator":
+        return cls(
+            start=int(os.environ.get("SESSION_PORT_START", 8000)),
+            count=int(os.environ.get("SESSION_PORT_COUNT", 1000)),
+        )
+
+    def allocate(self, owner: str) -> int:
+        """Take a free port for the container `owner` is about to become."""
+        with self._lock:
+            while self._free:
+                port = self._free.popleft()
+                if port not in self._owners:
+                    self._owners[port] = owner
+                    self._pending[owner] = time.monotonic()
+                    return port
+        raise NoFreePort(f"All {self.count} ports from {self.start} are in use")
+
+    def release(self, port: int, owner: str) -> None:
+        """Give back `owner`'s `port`, e.g. when starting its container failed."""
+        with self._lock:
+            if self._owners.get(port) == owner:
+                del self._owners[port]
+                self._pending.pop(owner, None)
+                self._free.append(port)
+
+    def in_use(self) -> dict[int, str]:
+        with self._lock:
+            return dict(self._owners)
+
+    def reconcile(self, containers: Iterable[Any]) -> None:
+        """Rebuild from the running `containers`, keeping recent allocations not yet started."""
+        now = time.monotonic()
+        with self._lock:
+            owners = {
+                port: owner
+                for port, owner in self._owners.items()
+                if now - self._pending.get(owner, float("-inf")) < PENDING_SECONDS
+            }
+            for container in containers:
+                for port in self.ports_of(container.attrs):
+                    owners[port] = container.name
+            self._pending = {
+                owner: self._pending[owner] for owner in owners.values() if owner in self._pending
+            }
+            self._owners = owners
+            self._free = deque(p for p in range(self.start, self.start + self.count) if p not in owners)
+
+    def handle_event(self, event: dict[str, Any], client: Any) -> None:
+        """Apply one Docker container event (from `client.events(decode=True)`)."""
+        action = event.get("Action") or event.get("status")
+        actor = event.get("Actor", {})
+        name = actor.get("Attributes", {}).get("name", "")
+        if action == "start":
+            with self._lock:
+                if self._pending.pop(name, None) is not None:
+                    return
+            # Started by someone else: find out which ports it holds
+            try:
+                container = client.containers.get(actor.get("ID") or event.get("id"))
+            except Exception as e:
+                logger.warning("Could not inspect started container %s: %s", name, e)
+                return
+            with self._lock:
+                for port in self.ports_of(container.attrs):
+                    self._owners[port] = container.name
+        elif action in ("die", "destroy"):
+            with self._lock:
+                for port, owner in list(self._owners.items()):
+                    if owner == name:
+                        del self._owners[port]
+                        self._free.append(port)
+
+    def ensure_watching(self, client: Any) -> None:
+        """Start following Docker events in this process, if not already."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            # Started lazily so each gunicorn worker gets its own thread after fork
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        events = self._subscribe(client)
+        threading.Thread(
+            target=self._watch, args=(client, events), name="port-events", daemon=True
+        ).start()
+
+    def _subscribe(self, client: Any) -> Iterable[dict[str, Any]]:
+        # Subscribe before listing, so nothing that starts in between is missed
+        filters = {"type": "container", "event": ["start", "die", "destroy"]}
+        events = client.events(decode=True, filters=filters)
+        self.reconcile(client.containers.list())
+        return events
+
+    def _watch(self, client: Any, events: Iterable[dict[str, Any]]) -> None:
+        while True:
+            try:
+                for event in events:
+                    self.handle_event(event, client)
+                logger.warning("Docker event stream ended, reconnecting")
+            except Exception as e:
+                logger.warning("Docker event stream failed, reconnecting: %s", e)
+            time.sleep(1)
+            try:
+                events = self._subscribe(client)
+            except Exception as e:
+                logger.warning("Could not reconnect to Docker events: %s", e)
+                events = ()
+
+    def ports_of(self, attrs: dict[str, Any]) -> list[int]:
+        """Host ports in this range published by a container, from its `attrs`."""
+        ports = []
+        for bindings in (attrs.get("NetworkSettings", {}).get("Ports") or {}).values():
+            for binding in bindings or ():
+                port = int(binding["HostPort"])
+                if self.start <= port < self.start + self.count:
+                    ports.append(port)
+        return ports
@@ -0,0 +1,179 @@
+"""Stopping and removing session containers nobody uses any more.
+
+Session containers are started with `remove=False`, and nothing else stops
+them, so abandoned sessions would keep their memory and ports forever. A
+`Reaper` thread looks at every `session-*` container each
+`REAPER_INTERVAL_SECONDS`:
+
+- exited (or dead) containers are removed; ones being created, restarted
+  or paused are left alone
+- running ones are asked for their heartbeat (`GET /health`, see
+  `event_server.app.heartbeat()`). A session with no request for
+  `REAPER_IDLE_SECONDS`, or whose expire time passed more than
+  `REAPER_EXPIRED_GRACE_SECONDS` ago, is stopped and removed. A container
+  that does not answer, or has never had a request, counts as idle since
+  the reaper first saw it (or last heard of a request).
+
+Warm pool containers still waiting for a session are left alone. A reaped
+container's port comes back to the allocator with its die event.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from collections import Counter
+from typing import Any, Callable, Iterable
+
+from landing_page.ports import PortAllocator
+
+logger = logging.getLogger(__name__)
+
+# url -> decoded JSON body, None if the request failed
+Fetch = Callable[[str], dict[str, Any] | None]
+
+
+def http_json(url: str) -> dict[str, Any] | None:
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return json.loads(response.read())
+    except (OSError, ValueError):
+        return None
+
+
+class Reaper:
+    """Removes session containers that are exited, idle or long expired.
+
+    Args:
+        ports: Allocator whose range the containers' ports are in
+        idle_seconds: Reap a session with no request for this long (0: reaper off)
+        expired_grace: Reap a session this many seconds after its expire time
+        interval: Seconds between passes
+        host: Where the containers' published ports are reachable from here
+        fetch: Reads a container's /health (tests pass a fake)
+        keep: Names of containers not to touch (the warm pool's idle ones)
+    """
+
+    def __init__(
+        self,
+        ports: PortAllocator,
+        idle_seconds: float = 4 * 3600,
+        expired_grace: float = 3600,
+        interval: float = 60,
+        host: str = "127.0.0.1",
+        fetch: Fetch = http_json,
+        keep: Callable[[], Iterable[str]] = lambda: (),
+    ) -> None:
+        self.ports = ports
+        self.idle_seconds = idle_seconds
+        self.expired_grace = expired_grace
+        self.interval = interval
+        self.host = host
+        self.fetch = fetch
+        self.keep = keep
+        self.reaped: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        # container name -> when (monotonic) its session was last known to be used
+        self._last_active: dict[str, float] = {}
+        self._pid: int | None = None
+
+    @classmethod
+    def from_env(cls, ports: PortAllocator, host: str, keep: Callable[[], Iterable[str]]) -> "Reaper":
+        return cls(
+            ports,
+            idle_seconds=float(os.environ.get("REAPER_IDLE_SECONDS", 4 * 3600)),
+            expired_grace=float(os.environ.get("REAPER_EXPIRED_GRACE_SECONDS", 3600)),
+            interval=float(os.environ.get("REAPER_INTERVAL_SECONDS", 60)),
+            host=host,
+            keep=keep,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.idle_seconds > 0
+
+    def ensure_running(self, client: Any) -> None:
+        """Start this process's reaper thread, if reaping is on and it is not running."""
+        if not self.enabled or self._pid == os.getpid():
+            return
+        with self._lock:
+            # Started lazily so each gunicorn worker gets its own thread after fork
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, args=(client,), name="reaper", daemon=True).start()
+
+    def sweep(self, client: Any, now: float | None = None) -> dict[str, str]:
+        """Reap what is due now; returns the reaped containers' names and why."""
+        now = time.monotonic() if now is None else now
+        keep = set(self.keep())
+        containers = [
+            c for c in client.containers.list(all=True, filters={"name": "session-"})
+            if c.name.startswith("session-") and c.name not in keep
+        ]
+        # Forget containers that are gone, or that went back to waiting in the pool
+        names = {c.name for c in containers}
+        self._last_active = {name: t for name, t in self._last_active.items() if name in names}
+
+        reaped = {}
+        for container in containers:
+            reason = self._reason(container, now)
+            if reason is not None and self._reap(container, reason):
+                reaped[container.name] = reason
+        return reaped
+
+    def render_metrics(self) -> str:
+        """Containers reaped so far, by reason, in the Prometheus text format."""
+        with self._lock:
+            reaped = dict(self.reaped)
+        return "\n".join([
+            "# HELP landing_reaped_containers_total Session containers removed by the reaper",
+            "# TYPE landing_reaped_containers_total counter",
+            *(
+                f'landing_reaped_containers_total{{reason="{reason}"}} {reaped.get(reason, 0)}'
+                for reason in ("exited", "idle", "expired")
+            ),
+        ]) + "\n"
+
+    def _reason(self, container: Any, now: float) -> str | None:
+        """Why `container` should go ("exited", "idle", "expired"), or None to keep it."""
+        if container.status in ("exited", "dead"):
+            return "exited"
+        if container.status != "running":
+            # created, restarting, paused: possibly create_session() mid-start
+            return None
+        ports = self.ports.ports_of(container.attrs)
+        heartbeat = self.fetch(f"http://{self.host}:{ports[0]}/health") if ports else None
+        heartbeat = heartbeat or {}
+        if heartbeat.get("idle_seconds") is not None:
+            self._last_active[container.name] = now - heartbeat["idle_seconds"]
+        last_active = self._last_active.setdefault(container.name, now)
+        expires_in = heartbeat.get("expires_in")
+        if expires_in is not None and expires_in < -self.expired_grace:
+            return "expired"
+        if now - last_active >= self.idle_seconds:
+            return "idle"
+        return None
+
+    def _reap(self, container: Any, reason: str) -> bool:
+        try:
+            if container.status not in ("exited", "dead"):
+                container.stop(timeout=10)
+            container.remove()
+        except Exception as e:
+            logger.warning("Could not reap %s: %s", container.name, e)
+            return False
+        self._last_active.pop(container.name, None)
+        with self._lock:
+            self.reaped[reason] += 1
+        logger.info("Reaped %s container %s", reason, container.name)
+        return True
+
+    def _run(self, client: Any) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.sweep(client)
+            except Exception:
+                logger.exception("Reaping session containers failed")
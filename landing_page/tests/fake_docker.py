@@ -0,0 +1,142 @@
+"""An in-memory stand-in for the parts of docker.DockerClient the landing page uses.
+
+`FakeDocker.transport` answers HTTP requests to the containers' published
+ports the way a session server would, for `WarmPool(transport=...)`, and
+`FakeDocker.fetch` serves their /health heartbeat, for `Reaper(fetch=...)`.
+"""
+import json
+import queue
+import uuid
+from typing import Any, Iterator
+
+import docker
+
+
+class FakeContainer:
+    def __init__(self, client: "FakeDocker", name: str, ports: dict[str, int], environment: dict) -> None:
+        self.client = client
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.environment = environment
+        self.status = "running"
+        self.claimed_session: str | None = None
+        # What /health reports
+        self.idle_seconds: float | None = None
+        self.expires_in: float | None = None
+        self.attrs = {
+            "NetworkSettings": {
+                "Ports": {inner: [{"HostIp": "0.0.0.0", "HostPort": str(port)}] for inner, port in ports.items()}
+            }
+        }
+
+    def stop(self, timeout: int = 10) -> None:
+        if self.status == "running":
+            self.status = "exited"
+            self.client.emit("die", self)
+
+    def remove(self, force: bool = False) -> None:
+        if force:
+            self.stop()
+        self.client.containers.by_id.pop(self.id, None)
+        self.client.emit("destroy", self)
+
+
+class FakeContainers:
+    def __init__(self, client: "FakeDocker") -> None:
+        self.client = client
+        self.by_id: dict[str, FakeContainer] = {}
+        self.run_calls = 0
+
+    def run(self, image: str, name: str, ports: dict | None = None, environment: dict | None = None,
+            **kwargs: Any) -> FakeContainer:
+        self.run_calls += 1
+        if self.client.fail_runs:
+            raise docker.errors.APIError("run failed")
+        container = FakeContainer(self.client, name, ports or {}, environment or {})
+        self.by_id[container.id] = container
+        self.client.emit("start", container)
+        return container
+
+    def get(self, container_id: str) -> FakeContainer:
+        for container in self.by_id.values():
+            if container_id in (container.id, container.name):
+                return container
+        raise docker.errors.NotFound(container_id)
+
+    def list(self, all: bool = False, filters: dict | None = None) -> list[FakeContainer]:
+        return [c for c in self.by_id.values() if all or c.status == "running"]
+
+
+class FakeDocker:
+    """Containers "start" at once; their events go to every open `events()` stream."""
+
+    def __init__(self) -> None:
+        self.containers = FakeContainers(self)
+        self.fail_runs = False
+        # Containers answer /health once they are this many health checks old
+        self.boot_checks = 0
+        self.requests: list[tuple[str, str]] = []
+        self._health_checks: dict[str, int] = {}
+        self._streams: list[queue.Queue] = []
+
+    def events(self, decode: bool = False, filters: dict | None = None) -> Iterator[dict]:
+        stream: queue.Queue = queue.Queue()
+        self._streams.append(stream)
+
+        def generate() -> Iterator[dict]:
+            while (event := stream.get()) is not None:
+                yield event
+
+        return generate()
+
+    def emit(self, action: str, container: FakeContainer) -> None:
+        event = {
+            "Type": "container",
+            "Action": action,
+            "Actor": {"ID": container.id, "Attributes": {"name": container.name}},
+        }
+        for stream in self._streams:
+            stream.put(event)
+
+    def transport(self, method: str, url: str, body: bytes | None, headers: dict[str, str]) -> int:
+        container, path = self._route(url)
+        self.requests.append((method, "/" + path))
+        if container is None:
+            return 0
+        if path == "health":
+            checks = self._health_checks[container.id] = self._health_checks.get(container.id, 0) + 1
+            return 200 if checks > self.boot_checks else 0
+        if path == "api/claim":
+            token = container.environment.get("CLAIM_TOKEN")
+            if not token:
+                return 404
+            if headers.get("Authorization") != f"Bearer {token}":
+                return 403
+            if container.claimed_session is not None:
+                return 409
+            container.claimed_session = json.loads(body)["session_id"]
+            return 200
+        return 404
+
+    def fetch(self, url: str) -> dict | None:
+        container, path = self._route(url)
+        if container is None or path != "health":
+            return None
+        return {"status": "ok", "idle_seconds": container.idle_seconds, "expires_in": container.expires_in}
+
+    def _route(self, url: str) -> tuple[FakeContainer | None, str]:
+        """The running container publishing the URL's port, and the path without its slash."""
+        host_port, path = url.removeprefix("http://").split("/", 1)
+        port = host_port.rsplit(":", 1)[1]
+        container = next(
+            (c for c in self.containers.list()
+             for bindings in c.attrs["NetworkSettings"]["Ports"].values()
+             if any(b["HostPort"] == port for b in bindings)),
+            None,
+        )
+        return container, path
+
+    def close_events(self) -> None:
+        for stream in self._streams:
+            stream.put(None)
+        self._streams.clear()
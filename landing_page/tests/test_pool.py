@@ -0,0 +1,97 @@
+"""Tests for the warm pool of session containers."""
+import sys
+import time
+import pytest
+from landing_page.pool import WarmPool
+from landing_page.ports import PortAllocator
+from landing_page.tests.fake_docker import FakeDocker
+
+# `landing_page.app` resolves to the Flask app, so reach the module directly
+landing = sys.modules["landing_page.app"]
+
+
+def _wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def docker_client():
+    client = FakeDocker()
+    yield client
+    client.close_events()
+
+
+def _pool(client: FakeDocker, size: int, count: int = 10) -> WarmPool:
+    ports = PortAllocator(start=8000, count=count)
+    ports.ensure_watching(client)
+    pool = WarmPool(ports, size=size, boot_timeout=1, transport=client.transport)
+    pool.ensure_running(client)
+    return pool
+
+
+def test_pool_fills_and_refills(docker_client):
+    """Test the pool boots K containers and replaces each one claimed."""
+    docker_client.boot_checks = 2
+    pool = _pool(docker_client, size=2)
+    _wait_for(lambda: pool.stats()["idle"] == 2)
+    for container in docker_client.containers.list():
+        assert container.environment["CLAIM_TOKEN"]
+
+    port = pool.claim("abc")
+    [claimed] = [c for c in docker_client.containers.list() if c.claimed_session == "abc"]
+    assert claimed.attrs["NetworkSettings"]["Ports"]["5000/tcp"][0]["HostPort"] == str(port)
+    _wait_for(lambda: pool.stats()["idle"] == 2)
+    assert len(docker_client.containers.list()) == 3
+    assert pool.stats()["hits"] == 1
+
+
+def test_empty_pool_misses(docker_client):
+    """Test a claim with nothing booted is a miss, counted in the metrics."""
+    pool = WarmPool(PortAllocator(), size=1, transport=docker_client.transport)
+    assert pool.claim("abc") is None
+    assert 'landing_warm_pool_claims_total{result="miss"} 1' in pool.render_metrics()
+
+
+def test_dead_container_is_discarded(docker_client):
+    """Test an idle container that stopped answering is removed and its port reused."""
+    pool = _pool(docker_client, size=1)
+    _wait_for(lambda: pool.stats()["idle"] == 1)
+    [dead] = docker_client.containers.list()
+    dead.status = "exited"
+    # Hold the replacement back until the claim has missed
+    docker_client.boot_checks = 10 ** 6
+
+    assert pool.claim("abc") is None
+    assert dead.id not in docker_client.containers.by_id
+    docker_client.boot_checks = 0
+    _wait_for(lambda: pool.stats()["idle"] == 1)
+    assert pool.stats()["misses"] == 1
+
+
+def test_failed_boot_releases_port(docker_client):
+    """Test containers that never answer /health are removed and counted."""
+    docker_client.boot_checks = 10 ** 6
+    pool = _pool(docker_client, size=1)
+    _wait_for(lambda: pool.stats()["boot_failures"] == 1)
+    assert pool.ports.in_use() == {}
+    assert docker_client.containers.list() == []
+    assert pool.stats()["idle"] == 0
+
+
+def test_create_session_claims_warm_container(docker_client, monkeypatch):
+    """Test a session takes a warm container instead of starting one."""
+    pool = _pool(docker_client, size=1)
+    monkeypatch.setattr(landing, "docker_client", lambda: docker_client)
+    monkeypatch.setattr(landing, "ports", pool.ports)
+    monkeypatch.setattr(landing, "pool", pool)
+    _wait_for(lambda: pool.stats()["idle"] == 1)
+
+    http = landing.app.test_client()
+    page = http.post("/create-session").get_data(as_text=True)
+    [claimed] = [c for c in docker_client.containers.list() if c.claimed_session]
+    assert claimed.name.startswith("session-warm-")
+    assert claimed.claimed_session in page
+    assert 'landing_warm_pool_claims_total{result="hit"} 1' in http.get("/metrics").get_data(as_text=True)
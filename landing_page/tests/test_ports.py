@@ -0,0 +1,126 @@
+"""Tests for host port allocation."""
+import sys
+import threading
+import time
+import pytest
+from landing_page.ports import NoFreePort, PortAllocator
+from landing_page.tests.fake_docker import FakeDocker
+
+# `landing_page.app` resolves to the Flask app, so reach the module directly
+landing = sys.modules["landing_page.app"]
+
+
+def _wait_for(condition, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_concurrent_allocations_are_distinct():
+    """Test racing callers never share a port, and the range runs out cleanly."""
+    allocator = PortAllocator(start=8000, count=100)
+    taken = []
+
+    def take():
+        for n in range(20):
+            try:
+                taken.append(allocator.allocate(f"session-{threading.get_ident()}-{n}"))
+            except NoFreePort:
+                return
+
+    threads = [threading.Thread(target=take) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(taken) == list(range(8000, 8100))
+    with pytest.raises(NoFreePort):
+        allocator.allocate("one-too-many")
+
+
+def test_release_returns_port():
+    """Test a released port can be handed out again."""
+    allocator = PortAllocator(start=8000, count=1)
+    port = allocator.allocate("session-a")
+    allocator.release(port, "session-b")
+    assert allocator.in_use() == {port: "session-a"}
+    allocator.release(port, "session-a")
+    assert allocator.allocate("session-b") == port
+
+
+def test_reconcile_skips_running_containers():
+    """Test ports bound by running containers are not handed out."""
+    client = FakeDocker()
+    client.containers.run("other", name="other", ports={"80/tcp": 8000})
+    client.containers.run("other", name="outside", ports={"80/tcp": 9999})
+    allocator = PortAllocator(start=8000, count=3)
+    allocator.reconcile(client.containers.list())
+
+    assert allocator.in_use() == {8000: "other"}
+    assert allocator.allocate("session-a") == 8001
+
+
+def test_events_track_containers():
+    """Test containers started elsewhere hold their ports, and exiting ones give theirs back."""
+    client = FakeDocker()
+    allocator = PortAllocator(start=8000, count=3)
+    allocator.ensure_watching(client)
+    try:
+        port = allocator.allocate("session-a")
+        ours = client.containers.run("session-server:latest", name="session-a", ports={"5000/tcp": port})
+        client.containers.run("other", name="other", ports={"80/tcp": 8002})
+        _wait_for(lambda: 8002 in allocator.in_use())
+
+        ours.stop()
+        _wait_for(lambda: port not in allocator.in_use())
+        assert allocator.allocate("session-b") == 8001
+        assert allocator.allocate("session-c") == port
+    finally:
+        client.close_events()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    docker_client = FakeDocker()
+    monkeypatch.setattr(landing, "docker_client", lambda: docker_client)
+    monkeypatch.setattr(landing, "ports", PortAllocator(start=8000, count=2))
+    yield docker_client, landing.app.test_client()
+    docker_client.close_events()
+
+
+def test_create_session_uses_allocator(client):
+    """Test sessions get distinct ports, and a full range is refused."""
+    docker_client, http = client
+    assert "struct.lol:9000" in http.post("/create-session").get_data(as_text=True)
+    assert "struct.lol:9001" in http.post("/create-session").get_data(as_text=True)
+    assert http.post("/create-session").status_code == 503
+    assert docker_client.containers.run_calls == 2
+
+
+def test_failed_start_releases_port(client):
+    """Test a container that fails to start does not keep its port."""
+    docker_client, http = client
+    docker_client.fail_runs = True
+    assert http.post("/create-session").status_code == 500
+    assert landing.ports.in_use() == {}
+
+
+def test_multi_tenant_creates_in_process(client, monkeypatch):
+    """Test MULTI_TENANT sessions are hosted by this process, with no container."""
+    from event_server.app import report_backend
+    from event_server.tenants import SessionRegistry
+
+    docker_client, http = client
+    registry = SessionRegistry(report_backend, max_sessions=1)
+    monkeypatch.setattr(landing, "MULTI_TENANT", True)
+    monkeypatch.setattr(landing, "sessions", registry)
+    try:
+        page = http.post("/create-session").get_data(as_text=True)
+        [tenant] = registry.tenants()
+        assert f"https://struct.lol/live/s/{tenant.session.session_id}/" in page
+        assert http.post("/create-session").status_code == 503
+        assert docker_client.containers.run_calls == 0
+    finally:
+        registry.remove(tenant.session.session_id)
@@ -0,0 +1,85 @@
+"""Tests for reaping unused session containers."""
+import time
+import pytest
+from landing_page.ports import PortAllocator
+from landing_page.reaper import Reaper
+from landing_page.tests.fake_docker import FakeDocker
+
+
+@pytest.fixture
+def docker_client():
+    client = FakeDocker()
+    yield client
+    client.close_events()
+
+
+def _start(client: FakeDocker, ports: PortAllocator, name: str):
+    return client.containers.run("session-server:latest", name=name, ports={"5000/tcp": ports.allocate(name)})
+
+
+def _reaper(client: FakeDocker, ports: PortAllocator, **kwargs) -> Reaper:
+    return Reaper(ports, idle_seconds=100, expired_grace=10, fetch=client.fetch, **kwargs)
+
+
+def test_idle_sessions_are_reaped(docker_client):
+    """Test sessions without requests for idle_seconds are removed, and used ones are kept."""
+    ports = PortAllocator(start=8000, count=10)
+    unused = _start(docker_client, ports, "session-unused")
+    stale = _start(docker_client, ports, "session-stale")
+    stale.idle_seconds = 150
+    busy = _start(docker_client, ports, "session-busy")
+    busy.idle_seconds = 0
+    reaper = _reaper(docker_client, ports)
+
+    assert reaper.sweep(docker_client, now=0) == {"session-stale": "idle"}
+    busy.idle_seconds = 5
+    assert reaper.sweep(docker_client, now=60) == {}
+    # Never used: idle since the reaper first saw it
+    assert reaper.sweep(docker_client, now=100) == {"session-unused": "idle"}
+    assert unused.id not in docker_client.containers.by_id
+    assert busy.id in docker_client.containers.by_id
+    assert 'landing_reaped_containers_total{reason="idle"} 2' in reaper.render_metrics()
+
+
+def test_expired_sessions_are_reaped_after_grace(docker_client):
+    """Test a session is kept for the grace period after its expire time, then removed."""
+    ports = PortAllocator(start=8000, count=10)
+    session = _start(docker_client, ports, "session-a")
+    reaper = _reaper(docker_client, ports)
+
+    session.expires_in = -5
+    assert reaper.sweep(docker_client, now=0) == {}
+    session.expires_in = -11
+    assert reaper.sweep(docker_client, now=1) == {"session-a": "expired"}
+
+
+def test_exited_removed_and_pool_kept(docker_client):
+    """Test exited containers are removed; starting, warm and other containers are not."""
+    ports = PortAllocator(start=8000, count=10)
+    exited = _start(docker_client, ports, "session-exited")
+    exited.stop()
+    starting = _start(docker_client, ports, "session-starting")
+    starting.status = "created"
+    warm = _start(docker_client, ports, "session-warm-1")
+    other = docker_client.containers.run("nginx", name="nginx-ssl")
+    reaper = _reaper(docker_client, ports, keep=lambda: {"session-warm-1"})
+
+    assert reaper.sweep(docker_client, now=0) == {"session-exited": "exited"}
+    assert reaper.sweep(docker_client, now=1000) == {}
+    assert warm.id in docker_client.containers.by_id
+    assert starting.id in docker_client.containers.by_id
+    assert other.id in docker_client.containers.by_id
+
+
+def test_reaped_port_is_reused(docker_client):
+    """Test the port of a reaped container goes back to the allocator."""
+    ports = PortAllocator(start=8000, count=1)
+    ports.ensure_watching(docker_client)
+    _start(docker_client, ports, "session-a").expires_in = -60
+    assert _reaper(docker_client, ports).sweep(docker_client) == {"session-a": "expired"}
+
+    deadline = time.monotonic() + 2
+    while ports.in_use():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+    assert ports.allocate("session-b") == 8000
@@ -40,14 +40,27 @@ curl -s -X POST http://localhost:5001/api/submit-feedback \
 # Test 4: Check state
 echo ""
 echo "4️⃣ Checking session state..."
-curl -s http://localhost:5001/api/state | jq '.feedback | length'
+curl -s http://localhost:5001/api/admin-summary | jq '.response_count'
 echo " feedback items collected"
 
 # Test 5: Generate report
 echo ""
 echo "5️⃣ Generating report..."
-curl -s -X POST http://localhost:5001/api/generate-report \
-  -H "Content-Type: application/json" | jq -r '.report'
+REPORT_RESPONSE=$(curl -s -X POST http://localhost:5001/api/generate-report \
+  -H "Content-Type: application/json")
+if [ "$(echo "$REPORT_RESPONSE" | jq -r '.cached // false')" = "true" ]; then
+  echo "$REPORT_RESPONSE" | jq -r '.report'
+else
+  JOB_ID=$(echo "$REPORT_RESPONSE" | jq -r '.job.id // empty')
+  if [ -z "$JOB_ID" ]; then
+    echo "$REPORT_RESPONSE" | jq .
+  else
+    while [ "$(curl -s http://localhost:5001/api/report-jobs/$JOB_ID | jq -r '.job.status')" = "running" ]; do
+      sleep 1
+    done
+    curl -s http://localhost:5001/api/report-jobs/$JOB_ID | jq -r '.job.report // .job.error'
+  fi
+fi
 
 # Cleanup
 echo ""